@@ -0,0 +1,125 @@
+"""Control de admisión adaptativo por worker.
+
+Cada petición entra con una prioridad:
+
+- ``probe``: sondas de Kubernetes, /metrics y administración. Se admiten
+  siempre, así que un pico de tráfico no deja el pod como no disponible.
+- ``cheap``: rutas baratas (estáticos, assets). No dependen del límite
+  adaptativo ni de la cola de las ``normal``: se admiten mientras haya menos
+  de ``max_cheap`` en curso (varias a la vez, como las que pide un navegador
+  al cargar la página).
+- ``bulk``: importaciones y exportaciones masivas. Tardan segundos o
+  minutos por diseño, así que tienen su propio cupo (``max_bulk``, sin cola)
+  y su duración no cuenta para el límite adaptativo.
+- ``normal``: el resto. Se admiten mientras haya menos de ``limit`` en
+  curso; si no, esperan en una cola corta (``max_queue`` peticiones durante
+  ``queue_timeout`` segundos como mucho) y si no consiguen hueco se rechazan.
+
+``limit`` se adapta con AIMD a la latencia de las peticiones ``normal``: si
+una supera ``target_latency`` se reduce un 10% (como mucho una vez por
+``cooldown`` segundos) y cada petición rápida lo sube en ``1/limit``, de
+modo que con las dependencias lentas el pod acepta menos trabajo a la vez y
+rechaza pronto el que no podría atender a tiempo.
+
+Los cupos suman menos que los hilos del worker, de modo que siempre queda
+un hilo libre para las sondas.
+"""
+import threading
+import time
+
+PROBE = 'probe'
+CHEAP = 'cheap'
+BULK = 'bulk'
+NORMAL = 'normal'
+PRIORITIES = (PROBE, CHEAP, BULK, NORMAL)
+
+BACKOFF = 0.9
+
+
+class AdmissionController:
+    def __init__(self, max_inflight=4, min_inflight=1, max_queue=2, queue_timeout=0.1,
+                 max_cheap=4, max_bulk=2, target_latency=0.5, cooldown=1.0):
+        if not 1 <= min_inflight <= max_inflight:
+            raise ValueError('Límites de admisión inválidos')
+
+        self.max_inflight = max_inflight
+        self.min_inflight = min_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_cheap = max_cheap
+        self.max_bulk = max_bulk
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+
+        self.limit = float(max_inflight)
+        self._cond = threading.Condition()
+        self._last_decrease = 0.0
+
+        # Contadores expuestos como métricas
+        self.inflight = dict.fromkeys(PRIORITIES, 0)
+        self.waiting = 0
+        self.admitted_total = dict.fromkeys(PRIORITIES, 0)
+        self.shed_total = {}
+
+    def _shed(self, priority, reason):
+        # Requiere el lock
+        key = (priority, reason)
+        self.shed_total[key] = self.shed_total.get(key, 0) + 1
+        return False
+
+    def _admit(self, priority):
+        # Requiere el lock
+        self.inflight[priority] += 1
+        self.admitted_total[priority] += 1
+        return True
+
+    def acquire(self, priority):
+        """Devuelve (admitida, segundos esperando en la cola)."""
+        with self._cond:
+            if priority == PROBE:
+                return self._admit(priority), 0.0
+
+            if priority == CHEAP:
+                if self.inflight[CHEAP] >= self.max_cheap:
+                    return self._shed(priority, 'cheap_limit'), 0.0
+                return self._admit(priority), 0.0
+
+            if priority == BULK:
+                if self.inflight[BULK] >= self.max_bulk:
+                    return self._shed(priority, 'bulk_limit'), 0.0
+                return self._admit(priority), 0.0
+
+            if self.inflight[NORMAL] < int(self.limit) and not self.waiting:
+                return self._admit(priority), 0.0
+            if self.waiting >= self.max_queue:
+                return self._shed(priority, 'queue_full'), 0.0
+
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            self.waiting += 1
+            try:
+                while self.inflight[NORMAL] >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._shed(priority, 'queue_timeout'), time.monotonic() - started
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            return self._admit(priority), time.monotonic() - started
+
+    def release(self, priority, latency=None):
+        """Libera el hueco; ``latency`` (segundos) ajusta el límite de las ``normal``."""
+        with self._cond:
+            self.inflight[priority] -= 1
+            if priority == NORMAL and latency is not None:
+                now = time.monotonic()
+                if latency > self.target_latency:
+                    if now - self._last_decrease >= self.cooldown:
+                        self.limit = max(float(self.min_inflight), self.limit * BACKOFF)
+                        self._last_decrease = now
+                else:
+                    self.limit = min(float(self.max_inflight), self.limit + 1.0 / self.limit)
+            # Despierta a tantas peticiones en cola como huecos haya (el límite pudo crecer)
+            free = int(self.limit) - self.inflight[NORMAL]
+            if free > 0:
+                self._cond.notify(free)
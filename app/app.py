@@ -1,15 +1,49 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
+from flask import (Flask, Response, render_template, jsonify, request, redirect, url_for, flash, session,
+                   g, has_request_context)
 from werkzeug.middleware.proxy_fix import ProxyFix
 import psycopg2
 import redis
 import os
 import sys
+import base64
+import gzip
+import hashlib
+import hmac
+import inspect
 import json
+import atexit
+import math
+import mimetypes
+import random
+import time
+import threading
+import uuid
+from functools import wraps
+from contextlib import contextmanager
 from datetime import datetime
-import boto3
-from botocore.exceptions import ClientError
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 from prometheus_flask_exporter import PrometheusMetrics
 
+import admission
+import car_export
+import car_import
+import cars_search
+import cars_stats
+from batch_writer import BatchWriter
+from cache_codec import get_codec
+from cars_cache import CarsCache, member_for
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from db_pool import ConnectionPool, PoolTimeout
+import health_logs
+from health_monitor import HealthMonitor
+from instrumentation import DependencyMetrics
+from local_cache import LRUCache
+from profiler import ProfilerBusyError, SamplingProfiler
+from read_replicas import Replica, ReplicaSet, parse_hosts
+from redis_batch import RedisBatch, is_connection_error
+import startup
+
 app = Flask(__name__)
 metrics = PrometheusMetrics(app)
 metrics.info('app_info', 'Application info', version='1.0.0')
@@ -35,15 +69,83 @@ except KeyError as e:
 # Variables no críticas (pueden tener fallback)
 DB_PORT = os.getenv('DB_PORT', '5432')
 
+# Pool de conexiones a Postgres (uno por worker de gunicorn)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+DB_POOL_VALIDATE_AFTER = float(os.getenv('DB_POOL_VALIDATE_AFTER', '30'))
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '3'))
+# Límite por sentencia para que una BD degradada no bloquee los workers
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '10000'))
+
 if ENV == 'pro':
     REDIS_HOST = os.getenv('REDIS_HOST', 'redis')
 else:
     REDIS_HOST = None
 
 REDIS_PORT = os.getenv('REDIS_PORT', '6379')
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', '1'))
 REDIS_MESSAGE_KEY = os.getenv('REDIS_MESSAGE_KEY', 'app:message')
 CARS_CACHE_KEY = os.getenv('CARS_CACHE_KEY', 'app:cars')
-CARS_CACHE_TTL = int(os.getenv('CARS_CACHE_TTL', '300'))
+# Las altas y bajas parchean la caché: la reconstrucción completa por TTL es
+# solo una red de seguridad (los cambios masivos la marcan como no fresca)
+CARS_CACHE_TTL = int(os.getenv('CARS_CACHE_TTL', '86400'))
+# La estructura de caché se sigue sirviendo (stale) hasta este TTL mientras se reconstruye
+CARS_CACHE_STALE_TTL = int(os.getenv('CARS_CACHE_STALE_TTL', '604800'))
+# Lease para que solo un proceso recalcule la caché a la vez (se renueva con cada bloque)
+CARS_CACHE_LOCK_TTL = int(os.getenv('CARS_CACHE_LOCK_TTL', '10'))
+CARS_CACHE_REBUILD_CHUNK = int(os.getenv('CARS_CACHE_REBUILD_CHUNK', '2000'))
+# Paginación por cursor (keyset) del listado de coches
+CARS_PAGE_SIZE = int(os.getenv('CARS_PAGE_SIZE', '20'))
+CARS_PAGE_MAX_SIZE = int(os.getenv('CARS_PAGE_MAX_SIZE', '100'))
+# Resultados de búsqueda cacheados en Redis (la clave incluye la versión de datos)
+CARS_SEARCH_CACHE_TTL = int(os.getenv('CARS_SEARCH_CACHE_TTL', '60'))
+CARS_STATS_CACHE_TTL = int(os.getenv('CARS_STATS_CACHE_TTL', '300'))
+# Sondas de salud en segundo plano (una por worker)
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '10'))
+HEALTH_MAX_STALENESS = float(os.getenv('HEALTH_MAX_STALENESS', '30'))
+
+# Réplicas de lectura opcionales (host[:puerto] separados por comas)
+DB_READ_HOSTS = parse_hosts(os.getenv('DB_READ_HOSTS'), DB_PORT)
+DB_READ_POOL_MAX = int(os.getenv('DB_READ_POOL_MAX', str(DB_POOL_MAX)))
+# Retraso máximo admitido; el monitor de salud lo mide cada HEALTH_CHECK_INTERVAL
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '5'))
+# Tras añadir o eliminar un coche, la sesión lee del primario durante este tiempo
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv(
+    'DB_READ_YOUR_WRITES_SECONDS', str(DB_REPLICA_MAX_LAG + HEALTH_CHECK_INTERVAL)))
+
+# Escritura por lotes de health_logs
+HEALTH_LOG_BATCH_SIZE = int(os.getenv('HEALTH_LOG_BATCH_SIZE', '100'))
+HEALTH_LOG_FLUSH_INTERVAL = float(os.getenv('HEALTH_LOG_FLUSH_INTERVAL', '5'))
+HEALTH_LOG_QUEUE_MAX = int(os.getenv('HEALTH_LOG_QUEUE_MAX', '10000'))
+
+# Particiones diarias de health_logs y retención
+HEALTH_LOGS_RETENTION_DAYS = int(os.getenv('HEALTH_LOGS_RETENTION_DAYS', '7'))
+HEALTH_LOGS_PREMAKE_DAYS = int(os.getenv('HEALTH_LOGS_PREMAKE_DAYS', '3'))
+HEALTH_LOGS_MAINTENANCE_INTERVAL = float(os.getenv('HEALTH_LOGS_MAINTENANCE_INTERVAL', '3600'))
+
+# Advisory lock con el que los pods serializan la inicialización del esquema
+SCHEMA_LOCK_NAME = os.getenv('SCHEMA_LOCK_NAME', 'app:init_schema')
+
+# Importación masiva de coches (filas validadas por bloque antes de cada COPY)
+BULK_IMPORT_CHUNK_SIZE = int(os.getenv('BULK_IMPORT_CHUNK_SIZE', '5000'))
+
+# Exportación en streaming: filas por FETCH del cursor del servidor y
+# exportaciones simultáneas por worker (cada una ocupa una conexión)
+CARS_EXPORT_ITERSIZE = int(os.getenv('CARS_EXPORT_ITERSIZE', '2000'))
+CARS_EXPORT_MAX_CONCURRENT = int(os.getenv('CARS_EXPORT_MAX_CONCURRENT', '2'))
+
+# Caché L1 en memoria por worker delante de Redis (solo con Redis habilitado,
+# que es quien propaga las invalidaciones entre pods vía pub/sub)
+LOCAL_CACHE_MAXSIZE = int(os.getenv('LOCAL_CACHE_MAXSIZE', '512'))
+LOCAL_CACHE_TTL = float(os.getenv('LOCAL_CACHE_TTL', '30'))
+LOCAL_CACHE_MESSAGE_TTL = float(os.getenv('LOCAL_CACHE_MESSAGE_TTL', '5'))
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'app:cache-invalidate')
+# Factor beta del refresco anticipado probabilístico (0 lo desactiva)
+CARS_CACHE_EARLY_REFRESH_BETA = float(os.getenv('CARS_CACHE_EARLY_REFRESH_BETA', '1.0'))
+# Formato de las filas en Redis (json o compact); los pods leen ambos
+CARS_CACHE_CODEC = get_codec(os.getenv('CARS_CACHE_CODEC', 'json'))
 REDIS_ENABLED = REDIS_HOST is not None
 
 # MinIO Config
@@ -51,25 +153,468 @@ MINIO_ENDPOINT = os.getenv('MINIO_ENDPOINT', 'minio-service:9000')
 MINIO_ACCESS_KEY = os.getenv('MINIO_ACCESS_KEY')
 MINIO_SECRET_KEY = os.getenv('MINIO_SECRET_KEY')
 MINIO_BUCKET = os.getenv('MINIO_BUCKET', 'assets')
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', '20'))
+
+# Assets servidos desde MinIO con caché en memoria por worker
+ASSET_CACHE_MAX_BYTES = int(os.getenv('ASSET_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+ASSET_CACHE_MAX_OBJECT_BYTES = int(os.getenv('ASSET_CACHE_MAX_OBJECT_BYTES', str(1024 * 1024)))
+ASSET_REVALIDATE_SECONDS = float(os.getenv('ASSET_REVALIDATE_SECONDS', '60'))
+ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', '3600'))
+ASSET_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Caché del HTML renderizado de la página principal (por versión de datos)
+PAGE_CACHE_MAX_BYTES = int(os.getenv('PAGE_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+PAGE_CACHE_TTL = float(os.getenv('PAGE_CACHE_TTL', str(LOCAL_CACHE_TTL)))
+# Las respuestas HTML por debajo de este tamaño no se comprimen
+GZIP_MIN_BYTES = int(os.getenv('GZIP_MIN_BYTES', '1024'))
+
+# Circuit breakers de Postgres, Redis y MinIO
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '15'))
+
+# Operaciones contra dependencias que superan este umbral se registran en el log (0 lo desactiva)
+SLOW_OPERATION_THRESHOLD_MS = float(os.getenv('SLOW_OPERATION_THRESHOLD_MS', '250'))
+
+# Endpoints de administración (/admin/...): deshabilitados si no hay token
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '300'))
+PROFILER_MAX_HZ = int(os.getenv('PROFILER_MAX_HZ', '1000'))
+
+# Control de admisión por worker (ADMISSION_MAX_INFLIGHT=0 lo desactiva).
+# Con workers gthread los cupos deben sumar menos que GUNICORN_THREADS para
+# que siempre quede un hilo para las sondas.
+ADMISSION_MAX_INFLIGHT = int(os.getenv('ADMISSION_MAX_INFLIGHT', '4'))
+ADMISSION_MIN_INFLIGHT = int(os.getenv('ADMISSION_MIN_INFLIGHT', '1'))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '2'))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', '100'))
+ADMISSION_MAX_CHEAP = int(os.getenv('ADMISSION_MAX_CHEAP', '4'))
+ADMISSION_MAX_BULK = int(os.getenv('ADMISSION_MAX_BULK', '2'))
+ADMISSION_TARGET_LATENCY_MS = float(os.getenv('ADMISSION_TARGET_LATENCY_MS', '500'))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '1'))
+# Sondas, métricas y administración se admiten siempre; estáticos y assets tienen
+# cupo propio, al margen del límite adaptativo y de la cola de las normales
+ADMISSION_PROBE_ENDPOINTS = {'livez', 'readyz', 'health', 'prometheus_metrics', 'admin_profile'}
+ADMISSION_CHEAP_ENDPOINTS = {'static', 'asset', 'favicon', None}
+# Importación y exportación masivas: cupo propio y fuera de la señal de latencia
+ADMISSION_BULK_ENDPOINTS = {'import_cars', 'export_cars'}
 
 _redis_client = None
+_redis_client_pid = None
+_db_pool = None
+_db_pool_pid = None
+_read_replicas = None
+_read_replicas_pid = None
+_cars_cache = None
+_local_cache = LRUCache(LOCAL_CACHE_MAXSIZE, LOCAL_CACHE_TTL)
+# Las entradas no caducan: pasado ASSET_REVALIDATE_SECONDS se revalidan por ETag
+_asset_cache = LRUCache(maxsize=1024, ttl=float('inf'), max_bytes=ASSET_CACHE_MAX_BYTES)
+_page_cache = LRUCache(maxsize=256, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_MAX_BYTES)
+_export_slots = threading.BoundedSemaphore(CARS_EXPORT_MAX_CONCURRENT)
+_minio_client = None
+_minio_client_pid = None
+_minio_client_lock = threading.Lock()
+_invalidation_listener_pid = None
+_invalidation_listener_lock = threading.Lock()
+_health_monitor = None
+_health_monitor_pid = None
+_health_monitor_lock = threading.Lock()
+_health_log_writer = None
+_health_log_writer_pid = None
+_health_log_writer_lock = threading.Lock()
+_health_logs_maintained_at = None
+# Circuit breakers por dependencia (compartidos con el modo ASGI de asgi.py)
+db_breaker = CircuitBreaker('database', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+redis_breaker = CircuitBreaker('redis', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+s3_breaker = CircuitBreaker('minio', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+HEALTH_LOG_FLUSH_SECONDS = Histogram(
+    'app_health_log_flush_duration_seconds',
+    'Duración de cada escritura por lotes en health_logs',
+    registry=metrics.registry
+)
+
+# Latencia y errores por dependencia y operación (Postgres, Redis, MinIO, render)
+dependency_metrics = DependencyMetrics(metrics.registry, SLOW_OPERATION_THRESHOLD_MS / 1000.0)
+track = dependency_metrics.track
+
+ADMISSION_QUEUE_SECONDS = Histogram(
+    'app_admission_queue_seconds',
+    'Espera de las peticiones en la cola de admisión del worker',
+    ['priority'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+    registry=metrics.registry
+)
+
+admission_controller = admission.AdmissionController(
+    max_inflight=ADMISSION_MAX_INFLIGHT,
+    min_inflight=ADMISSION_MIN_INFLIGHT,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT_MS / 1000.0,
+    max_cheap=ADMISSION_MAX_CHEAP,
+    max_bulk=ADMISSION_MAX_BULK,
+    target_latency=ADMISSION_TARGET_LATENCY_MS / 1000.0
+) if ADMISSION_MAX_INFLIGHT > 0 else None
+
+# Profiler por muestreo bajo demanda (uno por worker, desarmado por defecto)
+profiler = SamplingProfiler(max_seconds=PROFILER_MAX_SECONDS)
+
+CARS_READS = Counter(
+    'app_cars_reads',
+    'Lecturas del listado de coches por origen (cache o database)',
+    ['operation', 'source'],
+    registry=metrics.registry
+)
+CARS_ROWS = Histogram(
+    'app_cars_rows',
+    'Coches devueltos por lectura del listado',
+    ['operation', 'source'],
+    buckets=(0, 1, 5, 10, 20, 50, 100, 500, 1000, 5000, 10000, 50000),
+    registry=metrics.registry
+)
+CARS_CACHE_PAYLOAD_BYTES = Histogram(
+    'app_cars_cache_payload_bytes',
+    'Bytes de filas serializadas leídos de la caché de coches en Redis',
+    ['operation'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    registry=metrics.registry
+)
+
+
+def get_db_pool():
+    """Devuelve el pool de conexiones del worker actual.
+
+    Se crea de forma perezosa y se recrea tras un fork, ya que las conexiones
+    de libpq no pueden compartirse entre procesos.
+    """
+    global _db_pool, _db_pool_pid
+
+    if _db_pool is None or _db_pool_pid != os.getpid():
+        _db_pool = ConnectionPool(
+            DB_POOL_MIN,
+            DB_POOL_MAX,
+            max_lifetime=DB_POOL_MAX_LIFETIME,
+            validate_after=DB_POOL_VALIDATE_AFTER,
+            timeout=DB_POOL_TIMEOUT,
+            host=DB_HOST,
+            port=DB_PORT,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            connect_timeout=DB_CONNECT_TIMEOUT,
+            options=f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+        )
+        _db_pool_pid = os.getpid()
+
+    return _db_pool
+
+
+def _is_db_outage(exc):
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+def _is_pool_wait(exc):
+    # La llamada no llegó a Postgres: no había conexiones libres en el pool
+    return isinstance(exc, PoolTimeout)
+
+
+def get_read_replicas():
+    """Réplicas de lectura del worker actual, o None si no hay DB_READ_HOSTS."""
+    global _read_replicas, _read_replicas_pid
+
+    if not DB_READ_HOSTS:
+        return None
+
+    if _read_replicas is None or _read_replicas_pid != os.getpid():
+        _read_replicas = ReplicaSet(
+            [
+                Replica(
+                    f'{host}:{port}',
+                    ConnectionPool(
+                        0,
+                        DB_READ_POOL_MAX,
+                        max_lifetime=DB_POOL_MAX_LIFETIME,
+                        validate_after=DB_POOL_VALIDATE_AFTER,
+                        timeout=DB_POOL_TIMEOUT,
+                        host=host,
+                        port=port,
+                        database=DB_NAME,
+                        user=DB_USER,
+                        password=DB_PASSWORD,
+                        connect_timeout=DB_CONNECT_TIMEOUT,
+                        options=f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+                    ),
+                    CircuitBreaker(f'replica {host}:{port}', CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+                )
+                for host, port in DB_READ_HOSTS
+            ],
+            max_lag=DB_REPLICA_MAX_LAG,
+            max_check_age=HEALTH_MAX_STALENESS
+        )
+        _read_replicas_pid = os.getpid()
+
+    return _read_replicas
+
+
+def _is_replica_failure(exc):
+    """Fallos de la réplica tras los que la lectura se repite en el primario."""
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError,
+                            psycopg2.extensions.TransactionRollbackError,
+                            CircuitOpenError, PoolTimeout))
+
+
+def mark_session_write():
+    """La sesión actual leerá del primario un tiempo (read-your-writes)."""
+    if DB_READ_HOSTS and has_request_context():
+        session['read_primary_until'] = time.time() + DB_READ_YOUR_WRITES_SECONDS
+
+
+def _session_reads_primary():
+    return has_request_context() and session.get('read_primary_until', 0) > time.time()
+
+
+def run_read(operation, query, replica=True):
+    """Ejecuta ``query(cur)`` en una réplica de lectura y devuelve su resultado.
+
+    Va al primario si no hay réplicas elegibles, si la sesión acaba de escribir
+    o con ``replica=False`` (lecturas que alimentan cachés compartidas, que no
+    deben guardar datos atrasados). Si la réplica falla se repite en el primario.
+    """
+    replicas = get_read_replicas() if replica else None
+    chosen = replicas.choose() if replicas and not _session_reads_primary() else None
+    if chosen is not None:
+        try:
+            with chosen.connection(_is_db_outage) as conn, track('postgres_replica', operation):
+                cur = conn.cursor()
+                result = query(cur)
+                cur.close()
+            return result
+        except Exception as exc:
+            if not _is_replica_failure(exc):
+                raise
+            replicas.fallbacks_total += 1
+            print(f"Réplica {chosen.name} no disponible, se lee del primario: {exc}")
+
+    with db_connection() as conn, track('postgres', operation):
+        cur = conn.cursor()
+        result = query(cur)
+        cur.close()
+    return result
+
+
+@contextmanager
+def db_connection():
+    """Presta una conexión del pool y la devuelve al terminar.
+
+    Con el circuito de Postgres abierto falla al instante (CircuitOpenError)
+    en lugar de esperar al timeout de conexión.
+    """
+    pool = get_db_pool()
+    with db_breaker.guard(_is_db_outage, _is_pool_wait):
+        with track('postgres', 'connect'):
+            conn = pool.getconn()
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Conexión probablemente rota: no devolverla al pool
+            discard = True
+            raise
+        finally:
+            pool.putconn(conn, discard=discard)
+
+
+class DbPoolCollector:
+    """Exporta el estado del pool de Postgres en /metrics."""
+
+    def collect(self):
+        pool = _db_pool if _db_pool_pid == os.getpid() else None
+
+        connections = GaugeMetricFamily(
+            'app_db_pool_connections', 'Conexiones del pool por estado', labels=['state'])
+        connections.add_metric(['in_use'], pool.in_use if pool else 0)
+        connections.add_metric(['idle'], pool.idle if pool else 0)
+        yield connections
+
+        yield GaugeMetricFamily(
+            'app_db_pool_max_connections', 'Tamaño máximo del pool', value=DB_POOL_MAX)
+        yield GaugeMetricFamily(
+            'app_db_pool_waiting', 'Peticiones esperando conexión',
+            value=pool.waiting if pool else 0)
+
+        events = CounterMetricFamily(
+            'app_db_pool_events', 'Eventos del ciclo de vida de las conexiones', labels=['event'])
+        events.add_metric(['created'], pool.created_total if pool else 0)
+        events.add_metric(['recycled'], pool.recycled_total if pool else 0)
+        events.add_metric(['discarded'], pool.discarded_total if pool else 0)
+        events.add_metric(['timeout'], pool.timeouts_total if pool else 0)
+        yield events
+
+
+class AdmissionCollector:
+    """Exporta el estado del control de admisión en /metrics."""
+
+    def collect(self):
+        controller = admission_controller
+        if controller is None:
+            return
+
+        inflight = GaugeMetricFamily(
+            'app_admission_inflight', 'Peticiones en curso por prioridad', labels=['priority'])
+        admitted = CounterMetricFamily(
+            'app_admission_admitted', 'Peticiones admitidas por prioridad', labels=['priority'])
+        for priority in admission.PRIORITIES:
+            inflight.add_metric([priority], controller.inflight[priority])
+            admitted.add_metric([priority], controller.admitted_total[priority])
+        yield inflight
+        yield admitted
+
+        yield GaugeMetricFamily(
+            'app_admission_limit', 'Límite adaptativo de peticiones normales en curso', value=controller.limit)
+        yield GaugeMetricFamily(
+            'app_admission_max_inflight', 'Límite máximo de peticiones normales en curso',
+            value=controller.max_inflight)
+        yield GaugeMetricFamily(
+            'app_admission_queue_waiting', 'Peticiones esperando hueco en la cola de admisión',
+            value=controller.waiting)
+
+        shed = CounterMetricFamily(
+            'app_admission_shed', 'Peticiones rechazadas con 503 por prioridad y motivo',
+            labels=['priority', 'reason'])
+        for (priority, reason), count in list(controller.shed_total.items()):
+            shed.add_metric([priority, reason], count)
+        yield shed
+
+
+class LocalCacheCollector:
+    """Exporta el uso de la caché L1 en /metrics."""
+
+    def collect(self):
+        yield GaugeMetricFamily(
+            'app_local_cache_entries', 'Entradas en la caché L1', value=len(_local_cache))
+        requests_total = CounterMetricFamily(
+            'app_local_cache_requests', 'Lecturas de la caché L1', labels=['result'])
+        requests_total.add_metric(['hit'], _local_cache.hits)
+        requests_total.add_metric(['miss'], _local_cache.misses)
+        yield requests_total
+
+
+class PageCacheCollector:
+    """Exporta el uso de la caché de páginas renderizadas en /metrics."""
+
+    def collect(self):
+        yield GaugeMetricFamily(
+            'app_page_cache_entries', 'Páginas renderizadas en caché', value=len(_page_cache))
+        yield GaugeMetricFamily(
+            'app_page_cache_bytes', 'Bytes ocupados por la caché de páginas', value=_page_cache.size_bytes)
+        requests_total = CounterMetricFamily(
+            'app_page_cache_requests', 'Lecturas de la caché de páginas', labels=['result'])
+        requests_total.add_metric(['hit'], _page_cache.hits)
+        requests_total.add_metric(['miss'], _page_cache.misses)
+        yield requests_total
+
+
+class HealthLogWriterCollector:
+    """Exporta el estado del buffer de escritura de health_logs en /metrics."""
+
+    def collect(self):
+        writer = _health_log_writer if _health_log_writer_pid == os.getpid() else None
+
+        yield GaugeMetricFamily(
+            'app_health_log_queue_depth', 'Registros pendientes de escribir en health_logs',
+            value=writer.depth if writer else 0)
+
+        records = CounterMetricFamily(
+            'app_health_log_records', 'Registros de health_logs por resultado', labels=['result'])
+        records.add_metric(['written'], writer.written_total if writer else 0)
+        records.add_metric(['failed'], writer.failed_total if writer else 0)
+        records.add_metric(['dropped'], writer.dropped_total if writer else 0)
+        yield records
+
+
+class ReadReplicaCollector:
+    """Exporta el estado de las réplicas de lectura en /metrics."""
+
+    def collect(self):
+        replicas = _read_replicas if _read_replicas_pid == os.getpid() else None
+
+        lag = GaugeMetricFamily(
+            'app_db_replica_lag_seconds', 'Último retraso de replicación medido', labels=['replica'])
+        eligible = GaugeMetricFamily(
+            'app_db_replica_eligible', 'La réplica recibe lecturas (1) o no (0)', labels=['replica'])
+        connections = GaugeMetricFamily(
+            'app_db_replica_pool_connections', 'Conexiones del pool de la réplica por estado',
+            labels=['replica', 'state'])
+        for replica in (replicas.replicas if replicas else []):
+            if replica.lag is not None:
+                lag.add_metric([replica.name], replica.lag)
+            eligible.add_metric([replica.name], 1 if replicas.is_eligible(replica) else 0)
+            connections.add_metric([replica.name, 'in_use'], replica.pool.in_use)
+            connections.add_metric([replica.name, 'idle'], replica.pool.idle)
+        yield lag
+        yield eligible
+        yield connections
+
+        yield CounterMetricFamily(
+            'app_db_replica_fallbacks', 'Lecturas repetidas en el primario por fallo de la réplica',
+            value=replicas.fallbacks_total if replicas else 0)
+
+
+class CircuitBreakerCollector:
+    """Exporta el estado de los circuit breakers en /metrics."""
+
+    _STATE_VALUES = {
+        CircuitBreaker.CLOSED: 0,
+        CircuitBreaker.HALF_OPEN: 1,
+        CircuitBreaker.OPEN: 2
+    }
+
+    def collect(self):
+        replicas = _read_replicas.replicas if _read_replicas and _read_replicas_pid == os.getpid() else []
+        breakers = (db_breaker, redis_breaker, s3_breaker, *(replica.breaker for replica in replicas))
+
+        state = GaugeMetricFamily(
+            'app_circuit_breaker_state',
+            'Estado del circuito (0 cerrado, 1 semiabierto, 2 abierto)', labels=['dependency'])
+        for breaker in breakers:
+            state.add_metric([breaker.name], self._STATE_VALUES[breaker.state])
+        yield state
+
+        events = CounterMetricFamily(
+            'app_circuit_breaker_events', 'Eventos de los circuit breakers', labels=['dependency', 'event'])
+        for breaker in breakers:
+            events.add_metric([breaker.name, 'failure'], breaker.failures_total)
+            events.add_metric([breaker.name, 'opened'], breaker.opened_total)
+            events.add_metric([breaker.name, 'rejected'], breaker.rejected_total)
+        yield events
+
+
+metrics.registry.register(CircuitBreakerCollector())
+metrics.registry.register(DbPoolCollector())
+metrics.registry.register(HealthLogWriterCollector())
+metrics.registry.register(LocalCacheCollector())
+metrics.registry.register(PageCacheCollector())
+metrics.registry.register(ReadReplicaCollector())
+metrics.registry.register(startup.StartupCollector())
+metrics.registry.register(AdmissionCollector())
 
 
 def get_redis_client():
-    """Devuelve una instancia reutilizable de Redis cuando está habilitado."""
-    global _redis_client
+    """Devuelve una instancia reutilizable de Redis cuando está habilitado (una por worker)."""
+    global _redis_client, _redis_client_pid
 
     if not REDIS_ENABLED:
         return None
 
-    if _redis_client is None:
+    if _redis_client is None or _redis_client_pid != os.getpid():
         try:
             _redis_client = redis.Redis(
                 host=REDIS_HOST,
                 port=int(REDIS_PORT),
                 socket_connect_timeout=3,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
                 decode_responses=True
             )
+            _redis_client_pid = os.getpid()
         except Exception as exc:  # pragma: no cover - logging auxiliar
             print(f"No se pudo inicializar Redis: {exc}")
             _redis_client = None
@@ -77,32 +622,146 @@ def get_redis_client():
     return _redis_client
 
 
-def invalidate_cars_cache():
-    """Elimina la caché de coches para forzar su recálculo."""
-    if not REDIS_ENABLED:
-        return
+def new_redis_batch():
+    """Lote de comandos de Redis para una petición, o None si Redis no está disponible."""
+    client = get_redis_client() if REDIS_ENABLED else None
+    return RedisBatch(client, breaker=redis_breaker, track=track) if client else None
+
+
+def queue_redis_steps(*steps):
+    """Encola varios pasos y envía el lote en un único viaje de ida y vuelta a Redis.
+
+    Cada paso recibe el lote (None sin Redis), encola lo que necesite y
+    devuelve una función que, tras ejecutar el lote, da su resultado. Se
+    devuelven esas funciones: quien llama puede no pedir algún resultado.
+    """
+    batch = new_redis_batch()
+    finishers = [step(batch) for step in steps]
+    if batch is not None:
+        batch.execute()
+    return finishers
+
 
-    client = get_redis_client()
+def run_redis_steps(*steps):
+    """Ejecuta varios pasos compartiendo un único viaje y devuelve sus resultados."""
+    return [finish() for finish in queue_redis_steps(*steps)]
+
+
+def _listen_cache_invalidations():
+    """Aplica en la caché L1 las invalidaciones publicadas por cualquier pod."""
+    # Cliente propio sin socket_timeout: la suscripción pasa largos ratos sin mensajes
+    client = redis.Redis(
+        host=REDIS_HOST,
+        port=int(REDIS_PORT),
+        socket_connect_timeout=3,
+        socket_keepalive=True,
+        decode_responses=True
+    )
+    while True:
+        pubsub = None
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+            # Durante la reconexión se pudieron perder mensajes
+            _local_cache.clear()
+            for message in pubsub.listen():
+                if message.get('type') == 'message':
+                    _local_cache.delete_prefix(message['data'])
+        except Exception as exc:  # pragma: no cover - logging auxiliar
+            print(f"Suscripción de invalidaciones interrumpida: {exc}")
+        finally:
+            _local_cache.clear()
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+        time.sleep(1)
+
+
+def get_local_cache():
+    """Devuelve la caché L1 del worker, o None si Redis no está habilitado.
+
+    Arranca (una vez por proceso) el hilo que escucha las invalidaciones.
+    """
+    global _invalidation_listener_pid
+
+    if not REDIS_ENABLED or not get_redis_client():
+        return None
+
+    if _invalidation_listener_pid != os.getpid():
+        with _invalidation_listener_lock:
+            if _invalidation_listener_pid != os.getpid():
+                # Tras un fork la caché heredada no recibe invalidaciones
+                _local_cache.clear()
+                threading.Thread(
+                    target=_listen_cache_invalidations,
+                    name='cache-invalidation-listener',
+                    daemon=True
+                ).start()
+                _invalidation_listener_pid = os.getpid()
+
+    return _local_cache
+
+
+def get_cars_cache():
+    """Estructura incremental de coches en Redis, o None si Redis no está habilitado."""
+    global _cars_cache
+
+    client = get_redis_client() if REDIS_ENABLED else None
     if not client:
+        return None
+
+    if _cars_cache is None or _cars_cache.client is not client:
+        _cars_cache = CarsCache(
+            client,
+            CARS_CACHE_KEY,
+            ttl=CARS_CACHE_TTL,
+            stale_ttl=CARS_CACHE_STALE_TTL,
+            lock_ttl=CARS_CACHE_LOCK_TTL,
+            track=track,
+            codec=CARS_CACHE_CODEC
+        )
+    return _cars_cache
+
+
+def _publish_cars_change(apply):
+    """Aplica un cambio a la caché de coches y avisa al resto de workers.
+
+    ``apply(cache, pipe)`` encola las operaciones; todo viaja en un único
+    pipeline junto con el mensaje de invalidación de la caché L1.
+    """
+    _local_cache.delete_prefix(CARS_CACHE_KEY)
+
+    cache = get_cars_cache()
+    if not cache:
         return
 
     try:
-        client.delete(CARS_CACHE_KEY)
+        with redis_breaker.guard(is_connection_error), track('redis', 'publish_cars_change', is_connection_error):
+            pipe = cache.client.pipeline(transaction=False)
+            apply(cache, pipe)
+            pipe.publish(CACHE_INVALIDATION_CHANNEL, CARS_CACHE_KEY)
+            pipe.execute()
     except Exception as exc:  # pragma: no cover - logging auxiliar
-        print(f"No se pudo invalidar la caché de coches: {exc}")
+        print(f"No se pudo actualizar la caché de coches: {exc}")
+
+
+def invalidate_cars_cache():
+    """Marca la caché de coches como no fresca para forzar su recálculo.
+
+    La estructura se sigue sirviendo mientras un único proceso la reconstruye.
+    Se usa tras cambios masivos; las altas y bajas sueltas la parchean.
+    """
+    _publish_cars_change(lambda cache, pipe: cache.invalidate(pipe))
 
 # Verifica conexión con Postgres
 def check_database():
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            connect_timeout=3
-        )
-        conn.close()
+        with db_connection() as conn, track('postgres', 'select_1'):
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
         return {
             'status': 'connected',
             'message': 'PostgreSQL conectado correctamente',
@@ -116,359 +775,1016 @@ def check_database():
         }
 
 # Verifica conexión con Redis
-def check_redis():
+def _check_redis_step(batch):
     if not REDIS_ENABLED:
-        return None
+        return lambda: None
 
-    client = get_redis_client()
-    if not client:
-        return {
+    if batch is None:
+        return lambda: {
             'status': 'disconnected',
             'message': 'No se pudo inicializar la conexión con Redis',
             'healthy': False
         }
 
-    try:
-        client.ping()
-        return {
-            'status': 'connected',
-            'message': 'Redis conectado correctamente',
-            'healthy': True
-        }
-    except Exception as exc:
-        return {
-            'status': 'disconnected',
-            'message': f'Error: {str(exc)}',
-            'healthy': False
-        }
+    ping = batch.ping()
 
-# Inicializa la base de datos con una tabla de ejemplo"""
-def init_database():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
+    def finish():
+        try:
+            ping.result()
+            return {
+                'status': 'connected',
+                'message': 'Redis conectado correctamente',
+                'healthy': True
+            }
+        except Exception as exc:
+            return {
+                'status': 'disconnected',
+                'message': f'Error: {str(exc)}',
+                'healthy': False
+            }
+
+    return finish
+
+
+# Crea (o migra) las tablas e índices de la aplicación; todo es idempotente
+def _create_schema(cur):
+    # Crear (o migrar) health_logs particionada por día
+    health_logs.ensure_schema(cur)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cars (
+            id SERIAL PRIMARY KEY,
+            brand VARCHAR(100) NOT NULL,
+            model VARCHAR(100) NOT NULL,
+            year INTEGER NOT NULL CHECK (year >= 1886),
+            created_at TIMESTAMP NOT NULL DEFAULT NOW()
         )
-        cur = conn.cursor()
+    """)
 
-        # Crear tabla si no existe
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS health_logs (
-                id SERIAL PRIMARY KEY,
-                timestamp TIMESTAMP,
-                status VARCHAR(50)
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS cars (
-                id SERIAL PRIMARY KEY,
-                brand VARCHAR(100) NOT NULL,
-                model VARCHAR(100) NOT NULL,
-                year INTEGER NOT NULL CHECK (year >= 1886),
-                created_at TIMESTAMP NOT NULL DEFAULT NOW()
-            )
-        """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_brand_model_year
+        ON cars (brand, model, year)
+    """)
 
-        cur.execute("""
-            CREATE UNIQUE INDEX IF NOT EXISTS idx_cars_brand_model_year
-            ON cars (brand, model, year)
-        """)
+    # Índice para la paginación por cursor (created_at, id)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cars_created_at_id
+        ON cars (created_at DESC, id DESC)
+    """)
 
-        conn.commit()
-        cur.close()
-        conn.close()
+    # Índices de la búsqueda por marca, modelo y año
+    cars_search.ensure_indexes(cur)
+
+    # Agregados por marca y año mantenidos por triggers
+    cars_stats.ensure_schema(cur)
+
+
+def _schema_fingerprint():
+    """Huella del código que define el esquema: cambia con cada migración desplegada."""
+    sources = [inspect.getsource(_create_schema)]
+    sources.extend(inspect.getsource(module) for module in (health_logs, cars_search, cars_stats))
+    return hashlib.sha1('\n'.join(sources).encode()).hexdigest()
+
+# Inicializa la base de datos una vez por versión del esquema.
+# Los pods que arrancan a la vez se serializan con un advisory lock: el primero
+# aplica el esquema y el resto, al obtener el lock, ve su versión ya registrada.
+def init_database():
+    try:
+        fingerprint = _schema_fingerprint()
+        with db_connection() as conn, track('postgres', 'init_schema'):
+            cur = conn.cursor()
+            # DDL y migraciones: sin el statement_timeout de las peticiones
+            cur.execute("SET LOCAL statement_timeout = 0")
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (SCHEMA_LOCK_NAME,))
+
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_versions (
+                    fingerprint VARCHAR(40) PRIMARY KEY,
+                    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+            """)
+            cur.execute("SELECT 1 FROM schema_versions WHERE fingerprint = %s", (fingerprint,))
+            if cur.fetchone() is None:
+                _create_schema(cur)
+                cur.execute("INSERT INTO schema_versions (fingerprint) VALUES (%s)", (fingerprint,))
+                print(f"Esquema aplicado (versión {fingerprint[:12]})")
+            else:
+                print(f"Esquema ya aplicado (versión {fingerprint[:12]})")
+
+            conn.commit()
+            cur.close()
+        maintain_health_logs()
         return True
     except Exception as e:
         print(f"Error inicializando base de datos: {e}")
         return False
 
-# Registra el healthcheck en la base de datos"""
-def log_health_check():
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-
-        cur.execute(
-            "INSERT INTO health_logs (timestamp, status) VALUES (%s, %s)",
-            (datetime.now(), 'healthy')
-        )
 
+def release_connections():
+    """Cierra las conexiones del proceso actual.
+
+    La usa el maestro de gunicorn tras inicializar el esquema: así los workers
+    no heredan sockets abiertos (compartir una conexión de libpq o de Redis
+    entre procesos corrompe el protocolo).
+    """
+    global _db_pool, _db_pool_pid, _read_replicas, _read_replicas_pid, _redis_client, _redis_client_pid
+
+    if _db_pool is not None:
+        _db_pool.closeall()
+    if _read_replicas is not None:
+        _read_replicas.closeall()
+    if _redis_client is not None:
+        _redis_client.close()
+    _db_pool = _db_pool_pid = None
+    _read_replicas = _read_replicas_pid = None
+    _redis_client = _redis_client_pid = None
+
+
+def init_worker():
+    """Prepara un worker recién creado antes de que reciba peticiones.
+
+    Abre el pool de Postgres y arranca el monitor de salud, de modo que
+    /readyz tiene resultado cuanto antes. El cliente S3 (y la importación
+    de boto3) se crea en segundo plano, fuera del camino de arranque.
+    """
+    _page_cache.clear()
+    get_db_pool()
+    get_local_cache()
+    get_health_monitor()
+    threading.Thread(target=get_minio_client, name='minio-client-init', daemon=True).start()
+
+# Escribe un lote de registros de health_logs con un único INSERT multi-fila
+def _write_health_logs(records):
+    with db_connection() as conn, track('postgres', 'insert_health_logs'):
+        cur = conn.cursor()
+        health_logs.insert(cur, records)
         conn.commit()
         cur.close()
-        conn.close()
-    except Exception as e:
-        print(f"Error logging health check: {e}")
 
-# Uso de caché con redis
-def get_cached_data():
-    if not REDIS_ENABLED:
-        return None
 
+# Crea las particiones de los próximos días y elimina las que superan la retención
+def maintain_health_logs():
+    global _health_logs_maintained_at
+
+    _health_logs_maintained_at = time.monotonic()
     try:
-        client = get_redis_client()
-        if not client:
+        with db_connection() as conn, track('postgres', 'maintain_health_logs'):
+            cur = conn.cursor()
+            cur.execute("SET LOCAL statement_timeout = 0")
+            result = health_logs.maintain(
+                cur, HEALTH_LOGS_RETENTION_DAYS, HEALTH_LOGS_PREMAKE_DAYS)
+            conn.commit()
+            cur.close()
+        if result and (result['created'] or result['dropped']):
+            print(f"Mantenimiento de health_logs: creadas {result['created']}, "
+                  f"eliminadas {result['dropped']}")
+        return result
+    except Exception as e:
+        print(f"Error en el mantenimiento de health_logs: {e}")
+        return None
+
+
+def _maybe_maintain_health_logs():
+    if (_health_logs_maintained_at is None
+            or time.monotonic() - _health_logs_maintained_at >= HEALTH_LOGS_MAINTENANCE_INTERVAL):
+        maintain_health_logs()
+
+
+def _observe_health_log_flush(duration, _size):
+    HEALTH_LOG_FLUSH_SECONDS.observe(duration)
+
+
+def get_health_log_writer():
+    """Devuelve el buffer de escritura de health_logs del worker actual."""
+    global _health_log_writer, _health_log_writer_pid
+
+    if _health_log_writer_pid != os.getpid():
+        with _health_log_writer_lock:
+            if _health_log_writer_pid != os.getpid():
+                _health_log_writer = BatchWriter(
+                    _write_health_logs,
+                    max_batch=HEALTH_LOG_BATCH_SIZE,
+                    flush_interval=HEALTH_LOG_FLUSH_INTERVAL,
+                    max_queue=HEALTH_LOG_QUEUE_MAX,
+                    on_flush=_observe_health_log_flush,
+                    name='health-log-writer'
+                )
+                _health_log_writer.start()
+                _health_log_writer_pid = os.getpid()
+
+    return _health_log_writer
+
+
+@atexit.register
+def _flush_health_logs_on_exit():
+    """Vacía el buffer al terminar el worker para no perder registros."""
+    if _health_log_writer is not None and _health_log_writer_pid == os.getpid():
+        _health_log_writer.close()
+
+
+# Registra el healthcheck en la base de datos (de forma asíncrona, por lotes)
+def log_health_check(status='healthy'):
+    if not get_health_log_writer().submit((datetime.now(), status)):
+        print("Buffer de health_logs lleno: registro descartado")
+
+# Uso de caché con redis: contador de peticiones (INCR + EXPIRE atómico)
+def _health_count_step(batch):
+    if batch is None:
+        return lambda: None
+
+    pending = batch.incr_with_ttl('health_count', 300)  # 5 minutos de TTL
+
+    def finish():
+        try:
+            return pending.result()
+        except Exception as e:
+            print(f"Error usando Redis: {e}")
             return None
 
-        # Intentar obtener datos de caché
-        cached = client.get('health_count')
+    return finish
+
+
+def _serialize_cars(cars):
+    return [
+        {
+            'id': car['id'],
+            'brand': car['brand'],
+            'model': car['model'],
+            'year': car['year'],
+            'created_at': car['created_at'].isoformat() if car['created_at'] else None
+        }
+        for car in cars
+    ]
+
+
+def _should_refresh_early(entry):
+    """Refresco anticipado probabilístico (XFetch).
+
+    La probabilidad de recalcular crece a medida que se acerca la expiración y
+    es mayor cuanto más caro fue el último cálculo (``delta``).
+    """
+    if entry['fresh_ttl'] is None:
+        return True
+    delta = entry['delta']
+    if CARS_CACHE_EARLY_REFRESH_BETA <= 0 or delta <= 0:
+        return False
+    jitter = -delta * CARS_CACHE_EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+    return jitter >= entry['fresh_ttl']
+
+
+def _iter_cars_from_db(conn):
+    """Todos los coches en bloques de CARS_CACHE_REBUILD_CHUNK filas.
+
+    Cursor con nombre (del lado del servidor): cada bloque es un FETCH corto,
+    así que ni la memoria del worker ni el statement_timeout dependen del
+    tamaño de la tabla.
+    """
+    cur = conn.cursor(name=f'cars_cache_{uuid.uuid4().hex}')
+    try:
+        cur.execute("SELECT id, brand, model, year, created_at FROM cars")
+        while True:
+            rows = cur.fetchmany(CARS_CACHE_REBUILD_CHUNK)
+            if not rows:
+                return
+            yield [
+                {
+                    'id': row[0],
+                    'brand': row[1],
+                    'model': row[2],
+                    'year': row[3],
+                    'created_at': row[4]
+                }
+                for row in rows
+            ]
+    finally:
+        cur.close()
+
+
+def _rebuild_cars_cache(cache, token):
+    """Recalcula la estructura desde Postgres por bloques; requiere el lease.
+
+    Se escribe en claves temporales que sustituyen a las definitivas al
+    terminar; las altas y bajas que llegan mientras tanto se aplican entonces.
+    """
+    try:
+        started = time.monotonic()
+        with track('redis', 'start_cars_cache_rebuild', is_connection_error):
+            cache.start_rebuild(token)
+
+        # Del primario: la estructura se comparte y no debe quedar atrasada
+        with db_connection() as conn:
+            chunks = _iter_cars_from_db(conn)
+            while True:
+                with track('postgres', 'select_cars'):
+                    cars = next(chunks, None)
+                if cars is None:
+                    break
+                with track('redis', 'rebuild_cars_cache', is_connection_error):
+                    if not cache.write_rebuild_chunk(token, cars):
+                        print("Reconstrucción de la caché de coches abandonada: se perdió el lease")
+                        return False
+
+        with track('redis', 'swap_cars_cache', is_connection_error):
+            rebuilt = cache.finish_rebuild(token, time.monotonic() - started)
+        if rebuilt:
+            _local_cache.delete_prefix(CARS_CACHE_KEY)
+        return rebuilt
+    finally:
+        cache.release_lock(token)
+
+
+def _acquire_cars_cache_lock(cache, token):
+    with track('redis', 'acquire_cars_cache_lock', is_connection_error):
+        return cache.acquire_lock(token)
+
 
-        if cached:
-            count = int(cached)
+def _rebuild_cars_cache_quietly(cache, token):
+    try:
+        _rebuild_cars_cache(cache, token)
+    except Exception as exc:  # pragma: no cover - logging auxiliar
+        print(f"Error reconstruyendo la caché de coches: {exc}")
+
+
+def _refresh_cars_cache_in_background(cache):
+    """Lanza la reconstrucción en segundo plano si nadie más la está haciendo."""
+    token = uuid.uuid4().hex
+    if _acquire_cars_cache_lock(cache, token):
+        threading.Thread(
+            target=_rebuild_cars_cache_quietly,
+            args=(cache, token),
+            name='cars-cache-refresh',
+            daemon=True
+        ).start()
+
+
+def _observe_cars_reads(operation):
+    """Decora un paso de lectura de coches con métricas de origen y número de filas.
+
+    ``operation`` distingue las páginas (``page``) del resto de lecturas;
+    las lecturas fallidas no se cuentan.
+    """
+    def decorator(step):
+        @wraps(step)
+        def wrapper(*args, **kwargs):
+            finish = step(*args, **kwargs)
+
+            def observed():
+                result = finish()
+                data, error, from_cache = result
+                if not error:
+                    cars = data['cars'] if isinstance(data, dict) else data
+                    source = 'cache' if from_cache else 'database'
+                    CARS_READS.labels(operation, source).inc()
+                    CARS_ROWS.labels(operation, source).observe(len(cars))
+                return result
+
+            return observed
+        return wrapper
+    return decorator
+
+
+def encode_cars_cursor(car):
+    """Cursor opaco con la posición (created_at, id) del último coche de la página."""
+    raw = json.dumps([car['created_at'].isoformat(), car['id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cars_cursor(cursor):
+    """Devuelve (created_at, id) a partir del cursor; ValueError si no es válido."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, car_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(car_id)
+    except Exception as exc:
+        raise ValueError('Cursor de paginación no válido') from exc
+
+
+def _load_cars_page_from_db(after, limit):
+    def select_page(cur):
+        if after:
+            cur.execute(
+                """
+                SELECT id, brand, model, year, created_at
+                FROM cars
+                WHERE (created_at, id) < (%s, %s)
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+                """,
+                (after[0], after[1], limit + 1)
+            )
         else:
-            # Simular consulta a BD
-            count = 1
+            cur.execute(
+                """
+                SELECT id, brand, model, year, created_at
+                FROM cars
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s
+                """,
+                (limit + 1,)
+            )
+        return cur.fetchall()
 
-        # Incrementar y guardar en caché
-        count += 1
-        client.setex('health_count', 300, count)  # 5 minutos de TTL
+    rows = run_read('select_cars_page', select_page)
 
-        return count
-    except Exception as e:
-        print(f"Error usando Redis: {e}")
-        return None
+    return _make_page([
+        {
+            'id': row[0],
+            'brand': row[1],
+            'model': row[2],
+            'year': row[3],
+            'created_at': row[4]
+        }
+        for row in rows
+    ], limit)
+
+
+def _make_page(cars, limit):
+    """Recorta a ``limit`` coches (se piden limit + 1 para saber si hay más)."""
+    has_more = len(cars) > limit
+    cars = cars[:limit]
+    return {
+        'cars': cars,
+        'next_cursor': encode_cars_cursor(cars[-1]) if has_more and cars else None
+    }
 
-# Recupera la lista de coches registrados con soporte de caché
-def get_cars(use_cache=True):
-    cache_client = get_redis_client() if REDIS_ENABLED else None
 
-    if use_cache and cache_client:
+# Recupera una página del listado de coches (keyset sobre created_at, id).
+# Se lee del sorted set de Redis; si la estructura aún no existe se consulta
+# la página en Postgres mientras un único proceso la reconstruye.
+@_observe_cars_reads('page')
+def _cars_page_step(batch, cursor=None, limit=None):
+    limit = min(max(int(limit or CARS_PAGE_SIZE), 1), CARS_PAGE_MAX_SIZE)
+    after = decode_cars_cursor(cursor) if cursor else None
+    cache = get_cars_cache() if batch is not None else None
+
+    def from_db():
+        try:
+            return _load_cars_page_from_db(after, limit), None, False
+        except Exception as exc:
+            return {'cars': [], 'next_cursor': None}, str(exc), False
+
+    local_cache = get_local_cache()
+    local_key = f'{CARS_CACHE_KEY}:page:{cursor or "first"}:{limit}'
+    generation = None
+    if local_cache is not None:
+        page = local_cache.get(local_key)
+        if page is not None:
+            return lambda: (page, None, True)
+        generation = local_cache.generation
+
+    if not cache:
+        return from_db
+
+    pending = cache.queue_read(batch, member_for(*after) if after else None, limit + 1)
+
+    def finish():
         try:
-            cached_raw = cache_client.get(CARS_CACHE_KEY)
-            if cached_raw:
-                cached_data = json.loads(cached_raw)
-                cars = []
-                for item in cached_data:
-                    created_at = item.get('created_at')
-                    cars.append({
-                        'id': item['id'],
-                        'brand': item['brand'],
-                        'model': item['model'],
-                        'year': item['year'],
-                        'created_at': datetime.fromisoformat(created_at) if created_at else None
-                    })
-                return cars, None, True
+            entry = pending.result()
+            if entry['built']:
+                CARS_CACHE_PAYLOAD_BYTES.labels('page').observe(entry['payload_bytes'])
+                if _should_refresh_early(entry):
+                    _refresh_cars_cache_in_background(cache)
+                page = _make_page(entry['cars'], limit)
+                if local_cache is not None:
+                    local_cache.set(local_key, page, generation=generation)
+                return page, None, True
+            _refresh_cars_cache_in_background(cache)
         except Exception as exc:  # pragma: no cover - logging auxiliar
-            print(f"Error leyendo caché de coches: {exc}")
+            print(f"Error leyendo caché de página de coches: {exc}")
 
-    conn = None
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT id, brand, model, year, created_at
-            FROM cars
-            ORDER BY created_at DESC, id DESC
-            """
-        )
-        rows = cur.fetchall()
-        cur.close()
+        return from_db()
 
-        cars = [
-            {
-                'id': row[0],
-                'brand': row[1],
-                'model': row[2],
-                'year': row[3],
-                'created_at': row[4]
-            }
-            for row in rows
-        ]
+    return finish
+
+
+def get_cars_page(cursor=None, limit=None):
+    return run_redis_steps(lambda batch: _cars_page_step(batch, cursor, limit))[0]
+
+
+def _load_cars_search_from_db(filters, after, limit, replica=True):
+    cars = run_read('search_cars', lambda cur: cars_search.search(cur, filters, after, limit + 1), replica)
+    return _make_page(cars, limit)
+
+
+# Busca coches con filtros ya normalizados (cars_search.normalize_filters).
+# Cada página de resultados se cachea en L1 y en Redis con la versión de datos
+# en la clave, de modo que las altas y bajas dejan de servir resultados viejos.
+@_observe_cars_reads('search')
+def _cars_search_step(batch, filters, cursor=None, limit=None):
+    limit = min(max(int(limit or CARS_PAGE_SIZE), 1), CARS_PAGE_MAX_SIZE)
+    after = decode_cars_cursor(cursor) if cursor else None
+    digest = cars_search.digest(filters, cursor, limit)
+    cache = get_cars_cache() if batch is not None else None
+
+    def from_db(replica=True):
+        try:
+            return _load_cars_search_from_db(filters, after, limit, replica), None, False
+        except Exception as exc:
+            return {'cars': [], 'next_cursor': None}, str(exc), False
+
+    local_cache = get_local_cache()
+    local_key = f'{CARS_CACHE_KEY}:search:{digest}'
+    generation = None
+    if local_cache is not None:
+        page = local_cache.get(local_key)
+        if page is not None:
+            return lambda: (page, None, True)
+        generation = local_cache.generation
 
-        if cache_client and use_cache:
+    if not cache:
+        return from_db
+
+    pending = cache.queue_versioned_read(batch, 'search', digest)
+
+    def finish():
+        try:
+            version, raw = pending.result()
+        except Exception as exc:  # pragma: no cover - logging auxiliar
+            print(f"Error leyendo caché de búsqueda de coches: {exc}")
+            return from_db()
+
+        if raw is not None:
+            with track('app', 'decode_search'):
+                page = cache.decode_search(raw)
+            if local_cache is not None:
+                local_cache.set(local_key, page, generation=generation)
+            return page, None, True
+
+        # Se va a cachear: del primario
+        page, error, from_cache = from_db(replica=False)
+        if not error:
             try:
-                cache_payload = [
-                    {
-                        'id': car['id'],
-                        'brand': car['brand'],
-                        'model': car['model'],
-                        'year': car['year'],
-                        'created_at': car['created_at'].isoformat() if car['created_at'] else None
-                    }
-                    for car in cars
-                ]
-                cache_client.setex(
-                    CARS_CACHE_KEY, CARS_CACHE_TTL, json.dumps(cache_payload))
+                with track('redis', 'store_search', is_connection_error):
+                    cache.store_versioned('search', version, digest, cache.encode_search(page),
+                                          CARS_SEARCH_CACHE_TTL)
             except Exception as exc:  # pragma: no cover - logging auxiliar
-                print(f"Error actualizando caché de coches: {exc}")
+                print(f"No se pudo cachear la búsqueda de coches: {exc}")
+            if local_cache is not None:
+                local_cache.set(local_key, page, generation=generation)
+        return page, error, from_cache
 
-        return cars, None, False
-    except Exception as exc:
-        return [], str(exc), False
-    finally:
-        if conn:
-            conn.close()
+    return finish
+
+
+def get_cars_search(filters, cursor=None, limit=None):
+    return run_redis_steps(lambda batch: _cars_search_step(batch, filters, cursor, limit))[0]
+
+
+def _load_cars_stats_from_db(replica=True):
+    return run_read('select_cars_stats', cars_stats.fetch, replica)
+
+
+# Estadísticas agregadas (total, por marca y por década) desde cars_stats.
+# Se cachean en L1 y en Redis con la versión de datos en la clave.
+def _cars_stats_step(batch):
+    cache = get_cars_cache() if batch is not None else None
+
+    def from_db(replica=True):
+        try:
+            return _load_cars_stats_from_db(replica), None, False
+        except Exception as exc:
+            return None, str(exc), False
+
+    local_cache = get_local_cache()
+    local_key = f'{CARS_CACHE_KEY}:stats'
+    generation = None
+    if local_cache is not None:
+        stats = local_cache.get(local_key)
+        if stats is not None:
+            return lambda: (stats, None, True)
+        generation = local_cache.generation
+
+    if not cache:
+        return from_db
+
+    pending = cache.queue_versioned_read(batch, 'stats', 'all')
+
+    def finish():
+        try:
+            version, raw = pending.result()
+        except Exception as exc:  # pragma: no cover - logging auxiliar
+            print(f"Error leyendo caché de estadísticas de coches: {exc}")
+            return from_db()
+
+        if raw is not None:
+            stats = json.loads(raw)
+            from_cache = True
+        else:
+            # Se va a cachear: del primario
+            stats, error, from_cache = from_db(replica=False)
+            if error:
+                return stats, error, from_cache
+            try:
+                with track('redis', 'store_stats', is_connection_error):
+                    cache.store_versioned('stats', version, 'all', json.dumps(stats), CARS_STATS_CACHE_TTL)
+            except Exception as exc:  # pragma: no cover - logging auxiliar
+                print(f"No se pudieron cachear las estadísticas de coches: {exc}")
+
+        if local_cache is not None:
+            local_cache.set(local_key, stats, generation=generation)
+        return stats, None, from_cache
+
+    return finish
+
+
+def get_cars_stats():
+    return run_redis_steps(_cars_stats_step)[0]
 
 # Inserta un coche en la base de datos
 def create_car(brand, model, year):
-    conn = None
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO cars (brand, model, year)
-            VALUES (%s, %s, %s)
-            RETURNING id
-            """,
-            (brand, model, year)
-        )
-        new_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        invalidate_cars_cache()
+        with db_connection() as conn, track('postgres', 'insert_car'):
+            cur = conn.cursor()
+            cur.execute(
+                """
+                INSERT INTO cars (brand, model, year)
+                VALUES (%s, %s, %s)
+                RETURNING id, created_at
+                """,
+                (brand, model, year)
+            )
+            new_id, created_at = cur.fetchone()
+            conn.commit()
+            cur.close()
+        car = {'id': new_id, 'brand': brand, 'model': model, 'year': year, 'created_at': created_at}
+        _publish_cars_change(lambda cache, pipe: cache.add(car, pipe))
         return new_id, None
     except Exception as e:
-        if conn:
-            conn.rollback()
         return None, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 # Obtención del mensaje almacenado en redis
+_MESSAGE_MISSING = object()
 
 
-def get_redis_message():
+def _redis_message_step(batch):
     if not REDIS_ENABLED:
-        return None, None
+        return lambda: (None, None)
 
-    try:
-        client = get_redis_client()
-        if not client:
-            return None, 'No se pudo inicializar la conexión con Redis'
-        message = client.get(REDIS_MESSAGE_KEY)
+    if batch is None:
+        return lambda: (None, 'No se pudo inicializar la conexión con Redis')
+
+    # El mensaje se escribe desde fuera (redis-cli), así que en L1 vive
+    # solo unos segundos
+    local_cache = get_local_cache()
+    generation = None
+    if local_cache is not None:
+        generation = local_cache.generation
+        message = local_cache.get(REDIS_MESSAGE_KEY, _MESSAGE_MISSING)
+        if message is not _MESSAGE_MISSING:
+            return lambda: (message, None)
+
+    pending = batch.get(REDIS_MESSAGE_KEY)
+
+    def finish():
+        try:
+            message = pending.result()
+        except Exception as exc:
+            return None, str(exc)
+        if local_cache is not None:
+            local_cache.set(REDIS_MESSAGE_KEY, message,
+                            ttl=LOCAL_CACHE_MESSAGE_TTL, generation=generation)
         return message, None
-    except Exception as exc:
-        return None, str(exc)
+
+    return finish
+
+
+# Versión de los datos de coches: la incrementan las altas, las bajas y las
+# importaciones (en Redis, junto al parche de la caché). Se guarda en L1, que
+# la invalida con el resto de claves de coches cuando cualquier pod publica
+# un cambio. Sin Redis no hay versión compartida y devuelve None.
+def _cars_version_step(batch):
+    cache = get_cars_cache() if batch is not None else None
+    local_cache = get_local_cache()
+    if not cache or local_cache is None:
+        return lambda: None
+
+    version = local_cache.get(cache.version_key)
+    if version is not None:
+        return lambda: version
+    generation = local_cache.generation
+
+    pending = batch.get(cache.version_key)
+
+    def finish():
+        try:
+            version = pending.result() or '0'
+        except Exception as exc:
+            print(f"Error leyendo la versión de coches: {exc}")
+            return None
+        local_cache.set(cache.version_key, version, generation=generation)
+        return version
+
+    return finish
 
 # Eliminación de coche por ID
 def delete_car(car_id):
-    conn = None
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
-        cur.execute("DELETE FROM cars WHERE id = %s", (car_id,))
-        deleted = cur.rowcount
-        conn.commit()
-        cur.close()
+        with db_connection() as conn, track('postgres', 'delete_car'):
+            cur = conn.cursor()
+            cur.execute("DELETE FROM cars WHERE id = %s RETURNING created_at", (car_id,))
+            deleted = cur.fetchone()
+            conn.commit()
+            cur.close()
         if deleted:
-            invalidate_cars_cache()
+            _publish_cars_change(lambda cache, pipe: cache.remove(car_id, deleted[0], pipe))
             return True, None
         return False, 'Registro no encontrado'
     except Exception as e:
-        if conn:
-            conn.rollback()
         return False, str(e)
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_minio_client():
-    try:
-        # Ensure endpoint starts with http protocol if not present
-        endpoint = MINIO_ENDPOINT
-        if not endpoint.startswith('http'):
-            endpoint = f"http://{endpoint}"
-
-        s3 = boto3.client('s3',
-                          endpoint_url=endpoint,
-                          aws_access_key_id=MINIO_ACCESS_KEY,
-                          aws_secret_access_key=MINIO_SECRET_KEY,
-                          config=boto3.session.Config(
-                              signature_version='s3v4'),
-                          region_name='us-east-1')
-        return s3
-    except Exception as e:
-        print(f"Error connecting to MinIO: {e}")
-        return None
+    """Devuelve un cliente S3 reutilizable (uno por worker, con pool de conexiones).
 
+    boto3 se importa aquí y no al cargar el módulo: cuesta unos cientos de ms
+    y solo lo necesitan los assets. La creación va bajo lock porque la sesión
+    por defecto de boto3 no es thread-safe.
+    """
+    global _minio_client, _minio_client_pid
+
+    if _minio_client is not None and _minio_client_pid == os.getpid():
+        return _minio_client
+
+    with _minio_client_lock:
+        if _minio_client is not None and _minio_client_pid == os.getpid():
+            return _minio_client
+
+        try:
+            import boto3
+            from botocore.config import Config as BotoConfig
+
+            # Ensure endpoint starts with http protocol if not present
+            endpoint = MINIO_ENDPOINT
+            if not endpoint.startswith('http'):
+                endpoint = f"http://{endpoint}"
+
+            s3 = boto3.client('s3',
+                              endpoint_url=endpoint,
+                              aws_access_key_id=MINIO_ACCESS_KEY,
+                              aws_secret_access_key=MINIO_SECRET_KEY,
+                              config=BotoConfig(
+                                  signature_version='s3v4',
+                                  max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                                  connect_timeout=3,
+                                  read_timeout=10,
+                                  retries={'max_attempts': 2, 'mode': 'standard'},
+                                  tcp_keepalive=True),
+                              region_name='us-east-1')
+            _minio_client = s3
+            _minio_client_pid = os.getpid()
+            return s3
+        except Exception as e:
+            print(f"Error connecting to MinIO: {e}")
+            return None
+
+
+def _asset_response(asset):
+    """Respuesta con ETag fuerte, Last-Modified y Cache-Control; resuelve 304."""
+    body = asset['body']
+    response = Response(body, mimetype=asset['content_type'], direct_passthrough=not isinstance(body, bytes))
+    response.set_etag(asset['etag'].strip('"'))
+    if asset['last_modified']:
+        response.last_modified = asset['last_modified']
+    if asset.get('content_length') is not None:
+        response.content_length = asset['content_length']
+    response.cache_control.public = True
+    response.cache_control.max_age = ASSET_MAX_AGE
+    return response.make_conditional(request)
+
+
+def _is_s3_outage(exc):
+    from botocore.exceptions import BotoCoreError, ClientError
+    if isinstance(exc, ClientError):
+        return exc.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 500) >= 500
+    return isinstance(exc, BotoCoreError)
+
+
+def _is_s3_error(exc):
+    """304 y 404 son respuestas esperadas de get_object, no errores."""
+    from botocore.exceptions import ClientError
+    if isinstance(exc, ClientError):
+        return exc.response.get('ResponseMetadata', {}).get('HTTPStatusCode') not in (304, 404)
+    return True
+
+
+def fetch_asset(key, if_none_match=None):
+    """Obtiene un objeto de MinIO con caché en memoria revalidada por ETag.
+
+    Los objetos pequeños se guardan en memoria y se revalidan contra MinIO con
+    If-None-Match cada ASSET_REVALIDATE_SECONDS. Los grandes no se cachean y
+    su cuerpo es un iterador por bloques. ``if_none_match`` (el del cliente)
+    solo se reenvía a MinIO cuando no hay copia local.
+
+    Devuelve ``(asset, status, message)``: ``asset`` es None salvo con 200.
+    No depende del framework web, así que también lo usa el modo ASGI.
+    """
+    entry = _asset_cache.get(key)
+    if entry and time.monotonic() - entry['checked_at'] < ASSET_REVALIDATE_SECONDS:
+        return entry, 200, None
 
-@app.route('/favicon.ico')
-def favicon():
     s3 = get_minio_client()
     if not s3:
-        return "MinIO unavailable", 503
+        return (entry, 200, None) if entry else (None, 503, "MinIO unavailable")
+    from botocore.exceptions import ClientError
+
+    params = {'Bucket': MINIO_BUCKET, 'Key': key}
+    if entry:
+        params['IfNoneMatch'] = entry['etag']
+    elif if_none_match:
+        # Sin copia local: que MinIO conteste directamente el 304 del cliente
+        params['IfNoneMatch'] = if_none_match
 
     try:
-        # Fetch the file from MinIO and stream it to the user
-        file_obj = s3.get_object(Bucket=MINIO_BUCKET, Key='favicon.ico')
-        return file_obj['Body'].read(), 200, {'Content-Type': 'image/x-icon'}
+        with s3_breaker.guard(_is_s3_outage), track('minio', 'get_object', _is_s3_error):
+            obj = s3.get_object(**params)
+    except CircuitOpenError:
+        # MinIO caído: servir la copia local sin esperar timeouts
+        return (entry, 200, None) if entry else (None, 503, "MinIO unavailable")
     except ClientError as e:
-        print(f"Error fetching favicon from MinIO: {e}")
-        return "Favicon not found", 404
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if status == 304:
+            if entry:
+                # Sin cambios en MinIO: renovar la revalidación de la copia local
+                entry = dict(entry, checked_at=time.monotonic())
+                _asset_cache.set(key, entry, size=len(entry['body']))
+                return entry, 200, None
+            return None, 304, None
+        if status == 404 or e.response.get('Error', {}).get('Code') == 'NoSuchKey':
+            _asset_cache.delete(key)
+            return None, 404, "Asset not found"
+        print(f"Error fetching {key} from MinIO: {e}")
+        return (entry, 200, None) if entry else (None, 502, "Error fetching asset")
     except Exception as e:
         print(f"Error: {e}")
-        return str(e), 500
+        return (entry, 200, None) if entry else (None, 500, str(e))
+
+    content_type = mimetypes.guess_type(key)[0] or obj.get('ContentType') or 'application/octet-stream'
+    size = obj.get('ContentLength', 0)
+    asset = {
+        'etag': obj['ETag'],
+        'last_modified': obj.get('LastModified'),
+        'content_type': content_type
+    }
+
+    if size > ASSET_CACHE_MAX_OBJECT_BYTES:
+        asset.update(body=obj['Body'].iter_chunks(ASSET_STREAM_CHUNK_SIZE), content_length=size)
+        return asset, 200, None
+
+    with track('minio', 'read_object'):
+        body = obj['Body'].read()
+    asset.update(body=body, checked_at=time.monotonic())
+    _asset_cache.set(key, asset, size=len(asset['body']))
+    return asset, 200, None
+
+
+def serve_asset(key):
+    if_none_match = request.headers.get('If-None-Match') if request.if_none_match else None
+    asset, status, message = fetch_asset(key, if_none_match)
+    if asset:
+        return _asset_response(asset)
+    if status == 304:
+        return Response(status=304)
+    return message, status
+
+
+@app.route('/assets/<path:key>')
+def asset(key):
+    return serve_asset(key)
+
+
+@app.route('/favicon.ico')
+def favicon():
+    return serve_asset('favicon.ico')
+
+def _index_cache_key(version, cursor, *state):
+    """Clave de la página renderizada: versión de datos, cursor y todo lo que muestra."""
+    raw = json.dumps([version, cursor, request.script_root, *state], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _html_page(html):
+    body = html.encode('utf-8')
+    return {'body': body, 'etag': hashlib.sha1(body).hexdigest(), 'gzip': None}
+
+
+def _html_response(page):
+    """Respuesta con ETag fuerte (304 si no cambió) y gzip si el cliente lo acepta.
+
+    La versión comprimida se calcula una vez y queda guardada en ``page``.
+    """
+    body = page['body']
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        if page['gzip'] is None:
+            with track('app', 'gzip_html'):
+                page['gzip'] = gzip.compress(body, compresslevel=6)
+        response = Response(page['gzip'], mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+        # Cada codificación es una representación distinta con su propio ETag
+        response.set_etag(f"{page['etag']}-gzip")
+    else:
+        response = Response(body, mimetype='text/html')
+        response.set_etag(page['etag'])
+    response.vary.add('Accept-Encoding')
+    # El navegador guarda la página pero la revalida siempre (If-None-Match)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 # Endpoint raíz -> Página principal
+# El HTML se cachea por worker con la versión de datos de coches en la clave;
+# las páginas con mensajes flash (tras un POST) no se cachean.
 @app.route('/')
 def index():
-    db_status = check_database()
-    redis_status = check_redis()
+    # Estado de las dependencias según el monitor en segundo plano
+    health_result = get_health_snapshot()['result']
+    db_status = health_result.get('database') or check_database()
+    redis_status = health_result.get('cache')
     cars = []
     cars_error = None
     cars_from_cache = False
     redis_message = None
     redis_message_error = None
 
+    cursor = request.args.get('cursor') or None
+    next_cursor = None
+    filters = None
+    # Valores tal cual los escribió el usuario: el formulario los muestra así
+    filter_form = {name: request.args.get(name, '') for name in cars_search.FILTER_FIELDS}
+    try:
+        if cursor:
+            decode_cars_cursor(cursor)
+        filters = cars_search.normalize_filters(**filter_form)
+    except ValueError as exc:
+        cars_error = str(exc)
+    if filters and cars_search.is_empty(filters):
+        filters = None
+
+    want_message = bool(redis_status and redis_status['healthy'] and redis_status['status'] == 'connected')
+    if redis_status and redis_status['status'] == 'disconnected':
+        redis_message_error = redis_status['message']
+    cacheable = not cars_error and not session.get('_flashes')
+
+    # Versión, mensaje y coches de la página comparten un viaje a Redis (ninguno
+    # si todo está en L1). Los coches solo se recogen si el HTML no está cacheado.
+    steps = []
+    if want_message:
+        steps.append(_redis_message_step)
+    if cacheable:
+        steps.append(_cars_version_step)
+    if not cars_error:
+        if filters:
+            steps.append(lambda batch: _cars_search_step(batch, filters, cursor))
+        else:
+            steps.append(lambda batch: _cars_page_step(batch, cursor))
+    finishers = queue_redis_steps(*steps)
+    if want_message:
+        redis_message, redis_message_error = finishers.pop(0)()
+    version = finishers.pop(0)() if cacheable else None
+
+    page_key = None
+    if version is not None:
+        page_key = _index_cache_key(
+            version, cursor, filter_form, db_status, redis_status, redis_message, redis_message_error)
+        page = _page_cache.get(page_key)
+        if page is not None:
+            return _html_response(page)
+
     # Intentar obtener datos (priorizando caché) independientemente del estado de la BD
-    cars, cars_error, cars_from_cache = get_cars()
+    if not cars_error:
+        page_data, cars_error, cars_from_cache = finishers.pop(0)()
+        cars = page_data['cars']
+        next_cursor = page_data['next_cursor']
 
     # Si falló y la BD está caída, el error será el de conexión a BD
     if cars_error and not db_status['healthy']:
         cars_error = f'Base de datos no disponible: {cars_error}'
 
-    if redis_status and redis_status['healthy'] and redis_status['status'] == 'connected':
-        redis_message, redis_message_error = get_redis_message()
-    elif redis_status and redis_status['status'] == 'disconnected':
-        redis_message_error = redis_status['message']
-
     # Obtener el hostname del contenedor
     hostname = os.getenv('INSTANCE_NAME', os.getenv('HOSTNAME', 'unknown'))
 
-    return render_template(
-        'index.html',
-        db_status=db_status,
-        redis_status=redis_status,
-        env=ENV,
-        cars=cars,
-        cars_error=cars_error,
-        cars_from_cache=cars_from_cache,
-        redis_message=redis_message,
-        redis_message_error=redis_message_error,
-        redis_message_key=REDIS_MESSAGE_KEY,
-        hostname=hostname
-    )
+    with track('app', 'render_index'):
+        html = render_template(
+            'index.html',
+            db_status=db_status,
+            redis_status=redis_status,
+            env=ENV,
+            cars=cars,
+            cars_error=cars_error,
+            cars_from_cache=cars_from_cache,
+            cursor=cursor,
+            next_cursor=next_cursor,
+            filters=filters,
+            filter_form=filter_form,
+            filter_args=cars_search.query_args(filters) if filters else {},
+            redis_message=redis_message,
+            redis_message_error=redis_message_error,
+            redis_message_key=REDIS_MESSAGE_KEY,
+            hostname=hostname
+        )
+
+    page = _html_page(html)
+    if page_key and not cars_error:
+        _page_cache.set(page_key, page, size=len(page['body']))
+    return _html_response(page)
 
 # Formulario para añadir coches
 @app.route('/cars', methods=['POST'])
@@ -496,6 +1812,7 @@ def add_car():
     if error:
         flash(f'No se pudo registrar el coche: {error}', 'error')
     else:
+        mark_session_write()
         flash('Coche añadido correctamente.', 'success')
 
     return redirect(url_for('index'))
@@ -505,38 +1822,272 @@ def add_car():
 def remove_car(car_id):
     success, error = delete_car(car_id)
     if success:
+        mark_session_write()
         flash('Coche eliminado correctamente.', 'success')
     else:
         flash(f'No se pudo eliminar el coche: {error}', 'error')
     return redirect(url_for('index'))
 
-# Registro de dos endpoints para healthcheck
-@app.route('/status')
-@app.route('/health')
-def health():
+# API JSON paginada del listado de coches
+@app.route('/api/cars')
+def api_cars():
+    try:
+        page, error, from_cache = get_cars_page(
+            request.args.get('cursor') or None,
+            request.args.get('limit', type=int)
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if error:
+        return jsonify({'error': error}), 503
+
+    return jsonify({
+        'cars': _serialize_cars(page['cars']),
+        'next_cursor': page['next_cursor'],
+        'source': 'cache' if from_cache else 'database'
+    })
+
+# Búsqueda de coches: ?brand=, ?model= (con ?match=prefix|fuzzy), ?year_min=, ?year_max=
+@app.route('/api/cars/search')
+def api_cars_search():
+    try:
+        filters = cars_search.normalize_filters(
+            request.args.get('brand'),
+            request.args.get('model'),
+            request.args.get('match'),
+            request.args.get('year_min'),
+            request.args.get('year_max')
+        )
+        page, error, from_cache = get_cars_search(
+            filters,
+            request.args.get('cursor') or None,
+            request.args.get('limit', type=int)
+        )
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if error:
+        return jsonify({'error': error}), 503
+
+    return jsonify({
+        'cars': _serialize_cars(page['cars']),
+        'next_cursor': page['next_cursor'],
+        'filters': cars_search.query_args(filters),
+        'source': 'cache' if from_cache else 'database'
+    })
+
+# Estadísticas agregadas para dashboards
+@app.route('/api/cars/stats')
+def api_cars_stats():
+    stats, error, from_cache = get_cars_stats()
+    if error:
+        return jsonify({'error': error}), 503
+    return jsonify(dict(stats, source='cache' if from_cache else 'database'))
+
+def _iter_cars_export(connection, fmt):
+    """Contenido de la exportación; la conexión se devuelve al terminar o cortarse."""
+    exported = 0
+
+    def count(rows):
+        nonlocal exported
+        exported += rows
+
+    with connection as conn:
+        try:
+            yield from car_export.iter_export(conn, fmt, CARS_EXPORT_ITERSIZE, on_rows=count)
+        except Exception as exc:
+            # Las cabeceras ya se enviaron: la respuesta queda cortada
+            print(f"Error exportando coches tras {exported} filas: {exc}")
+            raise
+
+    CARS_READS.labels('export', 'database').inc()
+    CARS_ROWS.labels('export', 'database').observe(exported)
+
+
+def _open_cars_export(fmt):
+    """Abre la exportación y devuelve (primer bloque, resto del contenido).
+
+    Se lee de una réplica si hay alguna elegible; si falla al abrir la consulta
+    se repite en el primario. Una vez empezado el envío ya no hay reintento.
+    """
+    replicas = get_read_replicas()
+    chosen = replicas.choose() if replicas and not _session_reads_primary() else None
+    if chosen is not None:
+        content = _iter_cars_export(chosen.connection(_is_db_outage), fmt)
+        try:
+            with track('postgres_replica', 'export_cars'):
+                return next(content, ''), content
+        except Exception as exc:
+            if not _is_replica_failure(exc):
+                raise
+            replicas.fallbacks_total += 1
+            print(f"Réplica {chosen.name} no disponible, se exporta desde el primario: {exc}")
+
+    content = _iter_cars_export(db_connection(), fmt)
+    with track('postgres', 'export_cars'):
+        return next(content, ''), content
+
+# Exportación completa en streaming (?format=ndjson|csv) con memoria constante
+@app.route('/api/cars/export')
+def export_cars():
+    try:
+        fmt = car_export.parse_format(request.args.get('format'))
+    except car_export.ExportFormatError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if not _export_slots.acquire(blocking=False):
+        return jsonify({'error': 'Demasiadas exportaciones en curso'}), 503, {'Retry-After': '5'}
+
+    try:
+        first, content = _open_cars_export(fmt)
+    except Exception as exc:
+        _export_slots.release()
+        return jsonify({'error': f'No se pudo iniciar la exportación: {exc}'}), 503
+
+    def stream():
+        yield first
+        yield from content
+
+    def finish():
+        content.close()
+        _export_slots.release()
+
+    response = Response(stream(), content_type=car_export.CONTENT_TYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=cars.{fmt}'
+    response.headers['Cache-Control'] = 'no-store'
+    # Que el Ingress (Nginx) reenvíe cada bloque en lugar de acumular la respuesta
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(finish)
+    return response
+
+# Comprueba dependencias y datos; la usan el monitor en segundo plano y /health?deep=1.
+# Todas las lecturas de Redis (PING, coches, mensaje y contador) van en un único viaje.
+def collect_health(count_requests=False):
     db_status = check_database()
-    redis_status = check_redis()
 
-    # Log del healthcheck en BD
+    # Retraso de las réplicas de lectura (decide a cuáles se envían lecturas)
+    replicas = get_read_replicas()
+    if replicas:
+        replicas.check_lag(_is_db_outage)
+
+    # Log del healthcheck en BD (y mantenimiento periódico de sus particiones)
     if db_status['healthy']:
+        _maybe_maintain_health_logs()
         log_health_check()
 
-    # Obtener contador de caché si está disponible
-    cache_count = get_cached_data()
-    cars_count = None
-    cars_from_cache = False
-    redis_message = None
+    steps = [_check_redis_step, _cars_stats_step, _redis_message_step]
+    if count_requests:
+        steps.append(_health_count_step)
+    redis_status, (stats, error, cars_from_cache), (redis_message, _), *extra = run_redis_steps(*steps)
 
-    # Intentar obtener coches (priorizando caché)
-    cars, error, cars_from_cache = get_cars()
-    if not error:
-        cars_count = len(cars)
+    # Total de coches desde los agregados (priorizando caché), sin leer el listado
+    cars_count = None if error else stats['total']
 
-    if redis_status and redis_status['healthy'] and redis_status['status'] == 'connected':
-        redis_message, _ = get_redis_message()
+    if not (redis_status and redis_status['healthy'] and redis_status['status'] == 'connected'):
+        redis_message = None
 
-    overall_healthy = db_status['healthy'] and (
+    result = {
+        'database': db_status,
+        'cache': redis_status,
+        'cars_count': cars_count,
+        'cars_from_cache': cars_from_cache,
+        'redis_message': redis_message
+    }
+    if count_requests:
+        result['cache_count'] = extra[0]
+    return result
+
+def get_health_monitor():
+    """Devuelve el monitor de salud del worker, arrancándolo si hace falta."""
+    global _health_monitor, _health_monitor_pid
+
+    if _health_monitor_pid != os.getpid():
+        with _health_monitor_lock:
+            if _health_monitor_pid != os.getpid():
+                _health_monitor = HealthMonitor(
+                    collect_health,
+                    interval=HEALTH_CHECK_INTERVAL,
+                    max_staleness=HEALTH_MAX_STALENESS
+                )
+                _health_monitor.start()
+                _health_monitor_pid = os.getpid()
+
+    return _health_monitor
+
+
+def get_health_snapshot():
+    """Último estado conocido de las dependencias (sin I/O salvo el primero)."""
+    monitor = get_health_monitor()
+    snapshot = monitor.snapshot()
+    if snapshot is None:
+        # Primera petición del worker: esperar a la primera sonda
+        if not monitor.wait_ready(HEALTH_CHECK_INTERVAL):
+            monitor.run_once()
+        snapshot = monitor.snapshot()
+    return snapshot
+
+
+def _is_healthy(result):
+    db_status = result.get('database')
+    redis_status = result.get('cache')
+    return bool(db_status and db_status['healthy']) and (
         redis_status['healthy'] if redis_status else True)
+
+
+# Importación masiva de coches (CSV o NDJSON en el cuerpo de la petición)
+@app.route('/api/cars/import', methods=['POST'])
+def import_cars():
+    try:
+        fmt = car_import.detect_format(request.content_type, request.args.get('format'))
+    except car_import.ImportFormatError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        with db_connection() as conn, track('postgres', 'import_cars'):
+            result = car_import.import_cars(
+                conn,
+                car_import.iter_records(request.stream, fmt),
+                chunk_size=BULK_IMPORT_CHUNK_SIZE
+            )
+            conn.commit()
+    except Exception as exc:
+        return jsonify({'error': f'No se pudo completar la importación: {exc}'}), 500
+
+    # Una única invalidación para todo el lote
+    if result['inserted']:
+        mark_session_write()
+        invalidate_cars_cache()
+
+    return jsonify(result), 200
+
+# Registro de dos endpoints para healthcheck.
+# Por defecto responde desde memoria con el último resultado del monitor;
+# ?deep=1 fuerza la comprobación completa en la propia petición.
+@app.route('/status')
+@app.route('/health')
+def health():
+    deep = request.args.get('deep', '').lower() in ('1', 'true', 'yes')
+
+    if deep:
+        # Incluye el contador de caché si está disponible
+        result = collect_health(count_requests=True)
+        checked_at = datetime.now()
+        stale = False
+    else:
+        snapshot = get_health_snapshot()
+        result = snapshot['result']
+        checked_at = datetime.fromtimestamp(snapshot['checked_at'])
+        stale = snapshot['stale']
+
+    db_status = result.get('database') or {
+        'status': 'unknown',
+        'message': result.get('error', 'Sin datos de salud'),
+        'healthy': False
+    }
+    redis_status = result.get('cache')
+
+    overall_healthy = _is_healthy(result) and not stale
     services = {
         'database': db_status
     }
@@ -546,50 +2097,187 @@ def health():
     response = {
         'status': 'healthy' if overall_healthy else 'unhealthy',
         'timestamp': datetime.now().isoformat(),
+        'checked_at': checked_at.isoformat(),
         'environment': ENV,
         'services': services
     }
 
-    if cache_count:
-        response['cache_requests'] = cache_count
-    if cars_count is not None:
+    if result.get('cache_count'):
+        response['cache_requests'] = result['cache_count']
+    if result.get('cars_count') is not None:
         response['data'] = {
-            'cars_count': cars_count,
-            'cars_source': 'cache' if cars_from_cache else 'database'
+            'cars_count': result['cars_count'],
+            'cars_source': 'cache' if result['cars_from_cache'] else 'database'
         }
-    if redis_message:
-        response.setdefault('data', {})['redis_message'] = redis_message
+    if result.get('redis_message'):
+        response.setdefault('data', {})['redis_message'] = result['redis_message']
 
     status_code = 200 if overall_healthy else 503
     return jsonify(response), status_code
 
+# Liveness: el proceso responde (sin tocar dependencias)
+@app.route('/livez')
+def livez():
+    return jsonify({'status': 'alive'}), 200
+
+# Readiness: dependencias sanas según el último resultado del monitor
+@app.route('/readyz')
+def readyz():
+    snapshot = get_health_snapshot()
+    ready = _is_healthy(snapshot['result']) and not snapshot['stale']
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'checked_at': datetime.fromtimestamp(snapshot['checked_at']).isoformat()
+    }), 200 if ready else 503
+
+def _request_priority():
+    endpoint = request.endpoint
+    if endpoint in ADMISSION_PROBE_ENDPOINTS:
+        # /health?deep=1 comprueba todas las dependencias: no es una sonda barata
+        if endpoint == 'health' and request.args.get('deep', '').lower() in ('1', 'true', 'yes'):
+            return admission.NORMAL
+        return admission.PROBE
+    if endpoint in ADMISSION_CHEAP_ENDPOINTS:
+        return admission.CHEAP
+    if endpoint in ADMISSION_BULK_ENDPOINTS:
+        return admission.BULK
+    return admission.NORMAL
+
+# Control de admisión: rechaza pronto (503 + Retry-After) lo que el worker no
+# puede atender a tiempo, sin bloquear las sondas de Kubernetes
+@app.before_request
+def _admit_request():
+    if admission_controller is None:
+        return None
+
+    priority = _request_priority()
+    admitted, queued = admission_controller.acquire(priority)
+    if priority != admission.PROBE:
+        ADMISSION_QUEUE_SECONDS.labels(priority).observe(queued)
+    if not admitted:
+        return jsonify({'error': 'Servidor saturado, reintente en unos segundos'}), 503, {
+            'Retry-After': str(ADMISSION_RETRY_AFTER)
+        }
+    g.admission = (priority, time.monotonic())
+    return None
+
+
+@app.teardown_request
+def _release_request(_exc):
+    admitted = g.pop('admission', None)
+    if admitted:
+        priority, started = admitted
+        admission_controller.release(priority, time.monotonic() - started)
+
+
+@app.before_request
+def _begin_profiled_request():
+    if profiler.armed:
+        profiler.begin_request(request.endpoint)
+
+
+@app.teardown_request
+def _end_profiled_request(_exc):
+    profiler.end_request()
+
+
+def admin_required(view):
+    """Exige la cabecera X-Admin-Token; sin ADMIN_TOKEN configurado la ruta no existe."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _parse_profile_rates(value):
+    """``index=1,health=0.1`` -> {'index': 1.0, 'health': 0.1}"""
+    rates = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        route, sep, rate = item.partition('=')
+        rate = float(rate) if sep else 1.0
+        if not 0 <= rate <= 1:
+            raise ValueError(f'La proporción de {route.strip()} debe estar entre 0 y 1')
+        rates[route.strip()] = rate
+    return rates
+
+# Profiler por muestreo del worker que atiende la petición.
+# POST arma (?seconds=, ?requests=, ?hz=, ?routes=index=1,health=0.1, ?rate=),
+# GET devuelve el estado o el perfil (?format=collapsed|speedscope) y DELETE desarma.
+@app.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def admin_profile():
+    if request.method == 'DELETE':
+        return jsonify(profiler.disarm())
+
+    if request.method == 'GET':
+        fmt = request.args.get('format')
+        if fmt == 'collapsed':
+            return Response(profiler.collapsed(), mimetype='text/plain')
+        if fmt == 'speedscope':
+            response = jsonify(profiler.speedscope())
+            response.headers['Content-Disposition'] = f'attachment; filename=profile-{os.getpid()}.speedscope.json'
+            return response
+        return jsonify(profiler.status())
+
+    try:
+        seconds = request.args.get('seconds', type=float)
+        requests_limit = request.args.get('requests', type=int)
+        hz = request.args.get('hz', 100, type=int)
+        if not 1 <= hz <= PROFILER_MAX_HZ:
+            raise ValueError(f'hz debe estar entre 1 y {PROFILER_MAX_HZ}')
+        if (seconds is not None and seconds <= 0) or (requests_limit is not None and requests_limit <= 0):
+            raise ValueError('seconds y requests deben ser positivos')
+        rates = _parse_profile_rates(request.args.get('routes'))
+        # Con rutas explícitas el resto no se muestrea salvo que se indique ?rate=
+        default_rate = request.args.get('rate', 0.0 if rates else 1.0, type=float)
+        if not 0 <= default_rate <= 1:
+            raise ValueError('rate debe estar entre 0 y 1')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    try:
+        status = profiler.arm(seconds, requests_limit, hz, rates, default_rate)
+    except ProfilerBusyError as exc:
+        return jsonify({'error': str(exc), **profiler.status()}), 409
+    return jsonify(status), 202
+
 # Endpoint para testear persistencia
 @app.route('/db-test')
 def db_test():
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cur = conn.cursor()
+        # Volcar lo pendiente en el buffer para que el recuento sea exacto
+        get_health_log_writer().flush()
 
-        # Insertar un registro de prueba
-        cur.execute(
-            "INSERT INTO health_logs (timestamp, status) VALUES (%s, %s) RETURNING id",
-            (datetime.now(), 'test')
-        )
-        new_id = cur.fetchone()[0]
+        with db_connection() as conn, track('postgres', 'db_test'):
+            cur = conn.cursor()
+
+            # Insertar un registro de prueba (síncrono: se devuelve su ID)
+            now = datetime.now()
+            cur.execute(
+                "INSERT INTO health_logs (timestamp, status) VALUES (%s, %s) RETURNING id",
+                (now, 'test')
+            )
+            new_id = cur.fetchone()[0]
+            cur.execute(
+                """
+                INSERT INTO health_logs_daily (day, status, count) VALUES (%s, %s, 1)
+                ON CONFLICT (day, status) DO UPDATE SET count = health_logs_daily.count + 1
+                """,
+                (now.date(), 'test')
+            )
 
-        # Obtener todos los registros
-        cur.execute("SELECT COUNT(*) FROM health_logs")
-        count = cur.fetchone()[0]
+            # Total de registros desde los recuentos diarios (sin recorrer la tabla)
+            count = health_logs.total_count(cur)
 
-        conn.commit()
-        cur.close()
-        conn.close()
+            conn.commit()
+            cur.close()
 
         return jsonify({
             'success': True,
@@ -603,10 +2291,15 @@ def db_test():
         }), 500
 
 
+startup.record('load_app', startup.elapsed())
+
+
 if __name__ == '__main__':
     # Inicializar BD al arrancar
     print("Inicializando base de datos...")
-    if init_database():
+    with startup.phase('init_schema'):
+        initialized = init_database()
+    if initialized:
         print("Base de datos inicializada correctamente")
     else:
         print("Error inicializando base de datos")
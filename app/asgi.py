@@ -0,0 +1,589 @@
+"""Modo de servicio asíncrono (ASGI), opcional.
+
+Sirve las rutas principales de ``app.py`` con Quart, asyncpg y redis.asyncio,
+con pools compartidos por worker: cada worker atiende cientos de peticiones
+concurrentes en lugar de una por worker síncrono, y las comprobaciones
+independientes (Postgres y Redis) se lanzan a la vez.
+
+La configuración y la lógica sin I/O se reutilizan de ``app.py``. Lo poco
+frecuente sigue en hilos con los clientes síncronos: reconstruir la caché de
+coches, parchearla tras un alta o baja, escribir health_logs y leer de MinIO
+(boto3 no tiene cliente asíncrono). La importación masiva, la búsqueda con
+filtros, las estadísticas y la exportación solo existen en el modo WSGI (el
+índice no muestra el formulario de filtros).
+
+Uso::
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2 --proxy-headers
+"""
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import asyncpg
+import redis.asyncio as aioredis
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from quart import Quart, Response, flash, jsonify, redirect, render_template, request, url_for
+
+import app as sync_app
+import car_import
+import cars_stats
+import health_logs
+from app import (
+    CARS_CACHE_KEY, CARS_CACHE_LOCK_TTL, CARS_CACHE_STALE_TTL, CARS_CACHE_TTL,
+    CARS_PAGE_MAX_SIZE, CARS_PAGE_SIZE, DB_CONNECT_TIMEOUT, DB_HOST, DB_NAME,
+    DB_PASSWORD, DB_POOL_TIMEOUT, DB_PORT, DB_STATEMENT_TIMEOUT_MS, DB_USER, ENV,
+    LOCAL_CACHE_MESSAGE_TTL, REDIS_ENABLED, REDIS_HOST, REDIS_MESSAGE_KEY, REDIS_PORT,
+    REDIS_SOCKET_TIMEOUT, decode_cars_cursor
+)
+from cars_cache import CarsCache, member_for
+from db_pool import PoolTimeout
+from redis_batch import AsyncRedisBatch
+
+ASYNC_DB_POOL_MAX = int(os.getenv('ASYNC_DB_POOL_MAX', '20'))
+ASYNC_REDIS_MAX_CONNECTIONS = int(os.getenv('ASYNC_REDIS_MAX_CONNECTIONS', '50'))
+
+app = Quart(__name__)
+app.secret_key = sync_app.app.secret_key
+
+_db_pool = None
+_redis = None
+_cars_cache = None
+
+
+# Pools compartidos por todas las peticiones del worker
+@app.before_serving
+async def open_pools():
+    global _db_pool, _redis, _cars_cache
+
+    # min_size=0: el worker arranca aunque Postgres no esté disponible todavía
+    _db_pool = await asyncpg.create_pool(
+        host=DB_HOST,
+        port=int(DB_PORT),
+        database=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        min_size=0,
+        max_size=ASYNC_DB_POOL_MAX,
+        timeout=DB_CONNECT_TIMEOUT,
+        server_settings={'statement_timeout': str(DB_STATEMENT_TIMEOUT_MS)}
+    )
+
+    if REDIS_ENABLED:
+        _redis = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=int(REDIS_PORT),
+            max_connections=ASYNC_REDIS_MAX_CONNECTIONS,
+            socket_connect_timeout=3,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            decode_responses=True
+        ))
+        # Solo se usa para encolar lecturas (queue_read) en lotes asíncronos
+        _cars_cache = CarsCache(
+            _redis,
+            CARS_CACHE_KEY,
+            ttl=CARS_CACHE_TTL,
+            stale_ttl=CARS_CACHE_STALE_TTL,
+            lock_ttl=CARS_CACHE_LOCK_TTL,
+            track=sync_app.track
+        )
+
+
+@app.after_serving
+async def close_pools():
+    if _db_pool is not None:
+        await _db_pool.close()
+    if _redis is not None:
+        await _redis.aclose()
+
+
+def _is_db_outage(exc):
+    return isinstance(exc, (OSError, asyncpg.PostgresConnectionError,
+                            asyncpg.InterfaceError, asyncpg.QueryCanceledError))
+
+
+@asynccontextmanager
+async def db_connection():
+    """Conexión del pool asyncpg, protegida por el mismo circuit breaker que WSGI."""
+    with sync_app.db_breaker.guard(_is_db_outage, sync_app._is_pool_wait):
+        with sync_app.track('postgres', 'connect'):
+            try:
+                conn = await _db_pool.acquire(timeout=DB_POOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Sin conexiones libres: no es un fallo de Postgres
+                raise PoolTimeout(f'Pool agotado (sin conexiones libres tras {DB_POOL_TIMEOUT}s)') from None
+        try:
+            yield conn
+        finally:
+            await _db_pool.release(conn)
+
+
+def new_redis_batch():
+    return AsyncRedisBatch(_redis, breaker=sync_app.redis_breaker,
+                           track=sync_app.track) if _redis is not None else None
+
+
+async def _execute(batch):
+    if batch is not None:
+        await batch.execute()
+
+
+# Verifica conexión con Postgres
+async def check_database():
+    try:
+        async with db_connection() as conn:
+            await conn.fetchval('SELECT 1')
+        return {
+            'status': 'connected',
+            'message': 'PostgreSQL conectado correctamente',
+            'healthy': True
+        }
+    except Exception as e:
+        return {
+            'status': 'disconnected',
+            'message': f'Error: {str(e)}',
+            'healthy': False
+        }
+
+
+# Resultado del PING encolado en el lote (None si Redis no está habilitado)
+def redis_status_from(ping):
+    if not REDIS_ENABLED:
+        return None
+    try:
+        if ping is None:
+            raise RuntimeError('No se pudo inicializar la conexión con Redis')
+        ping.result()
+        return {
+            'status': 'connected',
+            'message': 'Redis conectado correctamente',
+            'healthy': True
+        }
+    except Exception as exc:
+        return {
+            'status': 'disconnected',
+            'message': f'Error: {str(exc)}',
+            'healthy': False
+        }
+
+
+async def _refresh_cars_cache_in_background():
+    cache = sync_app.get_cars_cache()
+    if cache:
+        await asyncio.to_thread(sync_app._refresh_cars_cache_in_background, cache)
+
+
+async def load_cars_page_from_db(after, limit):
+    async with db_connection() as conn:
+        if after:
+            rows = await conn.fetch(
+                """
+                SELECT id, brand, model, year, created_at
+                FROM cars
+                WHERE (created_at, id) < ($1, $2)
+                ORDER BY created_at DESC, id DESC
+                LIMIT $3
+                """,
+                after[0], after[1], limit + 1
+            )
+        else:
+            rows = await conn.fetch(
+                """
+                SELECT id, brand, model, year, created_at
+                FROM cars
+                ORDER BY created_at DESC, id DESC
+                LIMIT $1
+                """,
+                limit + 1
+            )
+    return sync_app._make_page([dict(row) for row in rows], limit)
+
+
+class PageRead:
+    """Lectura de una página de coches en dos fases: encolar y completar.
+
+    Primero se consulta la caché L1; si no está, la lectura se encola en el
+    lote de Redis y ``finish`` la completa (o consulta Postgres) tras enviarlo.
+    """
+
+    def __init__(self, batch, cursor=None, limit=None):
+        self.limit = min(max(int(limit or CARS_PAGE_SIZE), 1), CARS_PAGE_MAX_SIZE)
+        self.after = decode_cars_cursor(cursor) if cursor else None
+        self.local_cache = sync_app.get_local_cache()
+        self.local_key = f'{CARS_CACHE_KEY}:page:{cursor or "first"}:{self.limit}'
+        self.page = None
+        self.pending = None
+
+        if self.local_cache is not None:
+            self.generation = self.local_cache.generation
+            self.page = self.local_cache.get(self.local_key)
+        if self.page is None and batch is not None:
+            self.pending = _cars_cache.queue_read(
+                batch, member_for(*self.after) if self.after else None, self.limit + 1)
+
+    async def finish(self):
+        """Devuelve (page, error, from_cache) como ``get_cars_page``."""
+        if self.page is not None:
+            return self.page, None, True
+
+        if self.pending is not None:
+            try:
+                entry = self.pending.result()
+                if entry['built']:
+                    if sync_app._should_refresh_early(entry):
+                        await _refresh_cars_cache_in_background()
+                    page = sync_app._make_page(entry['cars'], self.limit)
+                    if self.local_cache is not None:
+                        self.local_cache.set(self.local_key, page, generation=self.generation)
+                    return page, None, True
+                await _refresh_cars_cache_in_background()
+            except Exception as exc:  # pragma: no cover - logging auxiliar
+                print(f"Error leyendo caché de página de coches: {exc}")
+
+        try:
+            return await load_cars_page_from_db(self.after, self.limit), None, False
+        except Exception as exc:
+            return {'cars': [], 'next_cursor': None}, str(exc), False
+
+
+class MessageRead:
+    """Lectura del mensaje de Redis (con caché L1) en dos fases."""
+
+    def __init__(self, batch):
+        self.local_cache = sync_app.get_local_cache()
+        self.message = sync_app._MESSAGE_MISSING
+        self.pending = None
+
+        if self.local_cache is not None:
+            self.generation = self.local_cache.generation
+            self.message = self.local_cache.get(REDIS_MESSAGE_KEY, sync_app._MESSAGE_MISSING)
+        if self.message is sync_app._MESSAGE_MISSING and batch is not None:
+            self.pending = batch.get(REDIS_MESSAGE_KEY)
+
+    def finish(self):
+        if not REDIS_ENABLED:
+            return None, None
+        if self.message is not sync_app._MESSAGE_MISSING:
+            return self.message, None
+        if self.pending is None:
+            return None, 'No se pudo inicializar la conexión con Redis'
+        try:
+            message = self.pending.result()
+        except Exception as exc:
+            return None, str(exc)
+        if self.local_cache is not None:
+            self.local_cache.set(REDIS_MESSAGE_KEY, message,
+                                 ttl=LOCAL_CACHE_MESSAGE_TTL, generation=self.generation)
+        return message, None
+
+
+# Endpoint raíz -> Página principal
+@app.route('/')
+async def index():
+    cursor = request.args.get('cursor') or None
+    cars = []
+    cars_error = None
+    cars_from_cache = False
+    next_cursor = None
+    redis_message = None
+    redis_message_error = None
+
+    # Un único lote de Redis (PING, página y mensaje) en paralelo con Postgres
+    batch = new_redis_batch()
+    ping = batch.ping() if batch is not None else None
+    page_read = None
+    try:
+        page_read = PageRead(batch, cursor)
+    except ValueError as exc:
+        cars_error = str(exc)
+    message_read = MessageRead(batch)
+
+    if batch is None and page_read is not None:
+        # Sin Redis la página sale de Postgres: también en paralelo
+        db_status, page_result = await asyncio.gather(check_database(), page_read.finish())
+    else:
+        db_status, _ = await asyncio.gather(check_database(), _execute(batch))
+        page_result = await page_read.finish() if page_read is not None else None
+    redis_status = redis_status_from(ping)
+
+    if page_result is not None:
+        page, cars_error, cars_from_cache = page_result
+        cars = page['cars']
+        next_cursor = page['next_cursor']
+
+    # Si falló y la BD está caída, el error será el de conexión a BD
+    if cars_error and not db_status['healthy']:
+        cars_error = f'Base de datos no disponible: {cars_error}'
+
+    if redis_status and redis_status['healthy']:
+        redis_message, redis_message_error = message_read.finish()
+    elif redis_status:
+        redis_message_error = redis_status['message']
+
+    # Obtener el hostname del contenedor
+    hostname = os.getenv('INSTANCE_NAME', os.getenv('HOSTNAME', 'unknown'))
+
+    return await render_template(
+        'index.html',
+        db_status=db_status,
+        redis_status=redis_status,
+        env=ENV,
+        cars=cars,
+        cars_error=cars_error,
+        cars_from_cache=cars_from_cache,
+        cursor=cursor,
+        next_cursor=next_cursor,
+        # La búsqueda con filtros solo existe en el modo WSGI: sin formulario
+        filters=None,
+        filter_form=None,
+        filter_args={},
+        redis_message=redis_message,
+        redis_message_error=redis_message_error,
+        redis_message_key=REDIS_MESSAGE_KEY,
+        hostname=hostname
+    )
+
+
+# Formulario para añadir coches
+@app.route('/cars', methods=['POST'])
+async def add_car():
+    form = await request.form
+    try:
+        brand, model, year = car_import.validate_record(
+            {'brand': form.get('brand'), 'model': form.get('model'), 'year': form.get('year')},
+            datetime.now().year
+        )
+    except ValueError as exc:
+        await flash(f'{exc}.', 'error')
+        return redirect(url_for('index'))
+
+    try:
+        async with db_connection() as conn:
+            row = await conn.fetchrow(
+                """
+                INSERT INTO cars (brand, model, year)
+                VALUES ($1, $2, $3)
+                RETURNING id, created_at
+                """,
+                brand, model, year
+            )
+    except Exception as e:
+        await flash(f'No se pudo registrar el coche: {e}', 'error')
+        return redirect(url_for('index'))
+
+    car = {'id': row['id'], 'brand': brand, 'model': model, 'year': year, 'created_at': row['created_at']}
+    await asyncio.to_thread(sync_app._publish_cars_change, lambda cache, pipe: cache.add(car, pipe))
+    await flash('Coche añadido correctamente.', 'success')
+    return redirect(url_for('index'))
+
+
+# Eliminación de coches
+@app.route('/cars/<int:car_id>/delete', methods=['POST'])
+async def remove_car(car_id):
+    try:
+        async with db_connection() as conn:
+            created_at = await conn.fetchval(
+                "DELETE FROM cars WHERE id = $1 RETURNING created_at", car_id)
+    except Exception as e:
+        await flash(f'No se pudo eliminar el coche: {e}', 'error')
+        return redirect(url_for('index'))
+
+    if created_at is None:
+        await flash('No se pudo eliminar el coche: Registro no encontrado', 'error')
+    else:
+        await asyncio.to_thread(
+            sync_app._publish_cars_change, lambda cache, pipe: cache.remove(car_id, created_at, pipe))
+        await flash('Coche eliminado correctamente.', 'success')
+    return redirect(url_for('index'))
+
+
+# API JSON paginada del listado de coches
+@app.route('/api/cars')
+async def api_cars():
+    batch = new_redis_batch()
+    try:
+        page_read = PageRead(batch, request.args.get('cursor') or None,
+                             request.args.get('limit', type=int))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    await _execute(batch)
+    page, error, from_cache = await page_read.finish()
+    if error:
+        return jsonify({'error': error}), 503
+
+    return jsonify({
+        'cars': sync_app._serialize_cars(page['cars']),
+        'next_cursor': page['next_cursor'],
+        'source': 'cache' if from_cache else 'database'
+    })
+
+
+async def _stream_body(chunks):
+    # boto3 es bloqueante: cada bloque se lee en un hilo
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def serve_asset(key):
+    if_none_match = request.headers.get('If-None-Match') if request.if_none_match else None
+    asset, status, message = await asyncio.to_thread(sync_app.fetch_asset, key, if_none_match)
+    if not asset:
+        return Response(message or '', status=status)
+
+    etag = asset['etag'].strip('"')
+    if request.if_none_match.contains(etag):
+        response = Response('', status=304)
+    else:
+        body = asset['body']
+        response = Response(body if isinstance(body, bytes) else _stream_body(body),
+                            mimetype=asset['content_type'])
+        if asset.get('content_length') is not None:
+            response.content_length = asset['content_length']
+    response.set_etag(etag)
+    if asset['last_modified']:
+        response.last_modified = asset['last_modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = sync_app.ASSET_MAX_AGE
+    return response
+
+
+@app.route('/assets/<path:key>')
+async def asset(key):
+    return await serve_asset(key)
+
+
+@app.route('/favicon.ico')
+async def favicon():
+    return await serve_asset('favicon.ico')
+
+
+# Healthcheck: Postgres y Redis se comprueban a la vez en cada petición
+@app.route('/status')
+@app.route('/health')
+async def health():
+    deep = request.args.get('deep', '').lower() in ('1', 'true', 'yes')
+
+    batch = new_redis_batch()
+    ping = batch.ping() if batch is not None else None
+    message_read = MessageRead(batch)
+    stats_read = _cars_cache.queue_versioned_read(batch, 'stats', 'all') if deep and batch is not None else None
+    count = batch.incr_with_ttl('health_count', 300) if deep and batch is not None else None
+
+    db_status, _ = await asyncio.gather(check_database(), _execute(batch))
+    redis_status = redis_status_from(ping)
+
+    # Log del healthcheck en BD (por lotes, en el hilo del BatchWriter)
+    if db_status['healthy']:
+        sync_app.log_health_check()
+
+    overall_healthy = sync_app._is_healthy({'database': db_status, 'cache': redis_status})
+    services = {
+        'database': db_status
+    }
+    if redis_status:
+        services['cache'] = redis_status
+
+    response = {
+        'status': 'healthy' if overall_healthy else 'unhealthy',
+        'timestamp': datetime.now().isoformat(),
+        'checked_at': datetime.now().isoformat(),
+        'environment': ENV,
+        'services': services
+    }
+
+    if deep:
+        try:
+            if count is not None:
+                response['cache_requests'] = count.result()
+            if stats_read is not None:
+                _, raw = stats_read.result()
+                if raw is not None:
+                    response['data'] = {'cars_count': json.loads(raw)['total'], 'cars_source': 'cache'}
+        except Exception as exc:
+            print(f"Error usando Redis: {exc}")
+        if 'data' not in response and db_status['healthy']:
+            # Total desde los agregados: O(grupos), sin recorrer cars
+            try:
+                async with db_connection() as conn:
+                    total = await conn.fetchval(cars_stats.TOTAL_COUNT_SQL)
+                response['data'] = {'cars_count': total, 'cars_source': 'database'}
+            except Exception as exc:
+                print(f"Error leyendo estadísticas de coches: {exc}")
+
+    if redis_status and redis_status['healthy']:
+        redis_message, _ = message_read.finish()
+        if redis_message:
+            response.setdefault('data', {})['redis_message'] = redis_message
+
+    status_code = 200 if overall_healthy else 503
+    return jsonify(response), status_code
+
+
+# Liveness: el proceso responde (sin tocar dependencias)
+@app.route('/livez')
+async def livez():
+    return jsonify({'status': 'alive'}), 200
+
+
+# Readiness: Postgres y Redis responden
+@app.route('/readyz')
+async def readyz():
+    batch = new_redis_batch()
+    ping = batch.ping() if batch is not None else None
+    db_status, _ = await asyncio.gather(check_database(), _execute(batch))
+    ready = sync_app._is_healthy({'database': db_status, 'cache': redis_status_from(ping)})
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'checked_at': datetime.now().isoformat()
+    }), 200 if ready else 503
+
+
+# Endpoint para testear persistencia
+@app.route('/db-test')
+async def db_test():
+    try:
+        # Volcar lo pendiente en el buffer para que el recuento sea exacto
+        await asyncio.to_thread(sync_app.get_health_log_writer().flush)
+
+        async with db_connection() as conn:
+            async with conn.transaction():
+                # Insertar un registro de prueba (síncrono: se devuelve su ID)
+                now = datetime.now()
+                new_id = await conn.fetchval(
+                    "INSERT INTO health_logs (timestamp, status) VALUES ($1, $2) RETURNING id",
+                    now, 'test'
+                )
+                await conn.execute(
+                    """
+                    INSERT INTO health_logs_daily (day, status, count) VALUES ($1, $2, 1)
+                    ON CONFLICT (day, status) DO UPDATE SET count = health_logs_daily.count + 1
+                    """,
+                    now.date(), 'test'
+                )
+
+                # Total de registros desde los recuentos diarios (sin recorrer la tabla)
+                count = await conn.fetchval(health_logs.TOTAL_COUNT_SQL)
+
+        return jsonify({
+            'success': True,
+            'message': f'Registro creado con ID: {new_id}',
+            'total_records': count
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# Métricas de Prometheus (los collectors del modo WSGI: pool, cachés, breakers...)
+@app.route('/metrics')
+async def prometheus_metrics():
+    return Response(generate_latest(sync_app.metrics.registry), mimetype=CONTENT_TYPE_LATEST)
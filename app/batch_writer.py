@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque
+
+
+class BatchWriter:
+    """Buffer de escritura asíncrona (write-behind) por lotes.
+
+    Los registros se encolan con ``submit`` y un hilo en segundo plano los
+    entrega a ``flush_fn`` en lotes de hasta ``max_batch`` elementos, cuando
+    se llena el lote o pasan ``flush_interval`` segundos desde el primero.
+    Si el buffer está lleno el registro se descarta (nunca bloquea la petición).
+
+    Los registros solo salen del buffer con ``_flush_lock`` tomado y hasta
+    escribirse, así que ``flush`` espera también al lote que tenga en curso
+    el hilo.
+    """
+
+    def __init__(self, flush_fn, max_batch=100, flush_interval=5.0, max_queue=10000,
+                 on_flush=None, name='batch-writer'):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.on_flush = on_flush
+        self.name = name
+        self._items = deque()
+        # Momento en que llegó el registro pendiente más antiguo
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Contadores expuestos como métricas
+        self.written_total = 0
+        self.dropped_total = 0
+        self.failed_total = 0
+        self.last_flush_duration = 0.0
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        with self._cond:
+            if len(self._items) >= self.max_queue:
+                self.dropped_total += 1
+                return False
+            if not self._items:
+                self._oldest = time.monotonic()
+            self._items.append(record)
+            # Despierta al hilo con el primer registro (para contar el intervalo) y con el lote lleno
+            if len(self._items) == 1 or len(self._items) >= self.max_batch:
+                self._cond.notify()
+        return True
+
+    def _wait_for_batch(self):
+        """Espera a que se llene un lote o venza el intervalo; False al detenerse."""
+        with self._cond:
+            while not self._stop.is_set():
+                if not self._items:
+                    self._cond.wait()
+                    continue
+                remaining = self._oldest + self.flush_interval - time.monotonic()
+                if len(self._items) >= self.max_batch or remaining <= 0:
+                    return True
+                self._cond.wait(remaining)
+            return False
+
+    def _take_batch(self):
+        # Requiere _flush_lock: el lote no sale del buffer hasta escribirse
+        with self._cond:
+            batch = [self._items.popleft() for _ in range(min(len(self._items), self.max_batch))]
+            self._oldest = time.monotonic() if self._items else None
+            return batch
+
+    def _write(self, batch):
+        started = time.monotonic()
+        try:
+            self.flush_fn(batch)
+            self.written_total += len(batch)
+        except Exception as exc:
+            self.failed_total += len(batch)
+            print(f"Error escribiendo lote de {len(batch)} registros ({self.name}): {exc}")
+        finally:
+            self.last_flush_duration = time.monotonic() - started
+            if self.on_flush:
+                self.on_flush(self.last_flush_duration, len(batch))
+
+    def _run(self):
+        while self._wait_for_batch():
+            with self._flush_lock:
+                batch = self._take_batch()
+                if batch:
+                    self._write(batch)
+
+    def flush(self):
+        """Escribe de forma síncrona todo lo pendiente, incluido el lote en curso del hilo."""
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                self._write(batch)
+
+    def close(self, timeout=5.0):
+        """Detiene el hilo y vacía el buffer (al terminar el worker)."""
+        with self._cond:
+            self._stop.set()
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
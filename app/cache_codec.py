@@ -0,0 +1,112 @@
+"""Formatos de serialización de las filas de coches en la caché de Redis.
+
+Cada fila del hash ``<prefix>:rows`` se guarda con el códec configurado
+(``CARS_CACHE_CODEC``), pero al leer se reconoce el formato de cada fila por
+su prefijo, de modo que pods con códecs distintos pueden convivir durante un
+despliegue:
+
+- ``json`` (formato original): objeto JSON con nombres de campo y
+  ``created_at`` en ISO 8601. Empieza siempre por ``{``.
+- ``compact``: ``c1:`` seguido de un array JSON posicional
+  ``[id, brand, model, year, created_at]`` sin espacios ni escapes ASCII.
+  La fecha sigue en ISO 8601: ``datetime.fromisoformat`` es más rápido que
+  construirla desde un epoch con ``timedelta``, y el decode es lo que se
+  ejecuta en cada acierto de caché.
+
+Las filas son texto (el cliente de Redis decodifica las respuestas como
+UTF-8), por eso el formato compacto no es binario. Las filas de una lectura
+se decodifican con un único ``json.loads`` en lugar de uno por fila.
+"""
+import json
+from datetime import datetime
+
+
+class JsonRowCodec:
+    """Formato original: un objeto JSON por fila."""
+
+    name = 'json'
+    prefix = '{'
+
+    def encode(self, car):
+        return json.dumps({
+            'id': car['id'],
+            'brand': car['brand'],
+            'model': car['model'],
+            'year': car['year'],
+            'created_at': car['created_at'].isoformat() if car['created_at'] else None
+        })
+
+    def decode_many(self, rows):
+        fromisoformat = datetime.fromisoformat
+        return [
+            {
+                'id': item['id'],
+                'brand': item['brand'],
+                'model': item['model'],
+                'year': item['year'],
+                'created_at': fromisoformat(item['created_at']) if item.get('created_at') else None
+            }
+            for item in json.loads('[' + ','.join(rows) + ']')
+        ]
+
+
+class CompactRowCodec:
+    """Array posicional, sin nombres de campo."""
+
+    name = 'compact'
+    prefix = 'c1:'
+
+    def encode(self, car):
+        return self.prefix + json.dumps(
+            [car['id'], car['brand'], car['model'], car['year'],
+             car['created_at'].isoformat() if car['created_at'] else None],
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
+
+    def decode_many(self, rows):
+        skip = len(self.prefix)
+        fromisoformat = datetime.fromisoformat
+        return [
+            {
+                'id': car_id,
+                'brand': brand,
+                'model': model,
+                'year': year,
+                'created_at': fromisoformat(created_at) if created_at else None
+            }
+            for car_id, brand, model, year, created_at
+            in json.loads('[' + ','.join(row[skip:] for row in rows) + ']')
+        ]
+
+
+CODECS = {codec.name: codec for codec in (JsonRowCodec(), CompactRowCodec())}
+
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Códec de caché desconocido: {name!r} (disponibles: {', '.join(CODECS)})") from None
+
+
+def _codec_for(row):
+    for codec in CODECS.values():
+        if row.startswith(codec.prefix):
+            return codec
+    raise ValueError(f'Formato de fila de caché desconocido: {row[:16]!r}')
+
+
+def decode_rows(rows):
+    """Decodifica filas de cualquier formato conocido, conservando el orden."""
+    decoded = []
+    start = 0
+    # Un único json.loads por tramo de filas con el mismo formato (normalmente uno)
+    while start < len(rows):
+        codec = _codec_for(rows[start])
+        end = start + 1
+        while end < len(rows) and rows[end].startswith(codec.prefix):
+            end += 1
+        decoded.extend(codec.decode_many(rows[start:end]))
+        start = end
+    return decoded
@@ -0,0 +1,84 @@
+"""Exportación de la tabla de coches en streaming (CSV o NDJSON).
+
+Las filas se leen con un cursor con nombre (del lado del servidor), que
+Postgres entrega en bloques de ``itersize`` filas: la memoria del worker no
+depende del tamaño de la tabla y el primer bloque puede enviarse al cliente
+mientras el resto de la consulta sigue en curso. El CSV usa las mismas
+columnas que acepta la importación (``car_import``).
+"""
+import csv
+import io
+import json
+import uuid
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8'
+}
+COLUMNS = ('id', 'brand', 'model', 'year', 'created_at')
+
+
+class ExportFormatError(ValueError):
+    """El formato solicitado no está soportado."""
+
+
+def parse_format(value):
+    fmt = (value or 'ndjson').strip().lower()
+    if fmt not in FORMATS:
+        raise ExportFormatError(f"Formato no soportado: {value} (disponibles: {', '.join(FORMATS)})")
+    return fmt
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _ndjson_chunk(rows):
+    return ''.join(
+        json.dumps(dict(zip(COLUMNS, (car_id, brand, model, year, _iso(created_at))))) + '\n'
+        for car_id, brand, model, year, created_at in rows
+    )
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        (car_id, brand, model, year, _iso(created_at) or '')
+        for car_id, brand, model, year, created_at in rows
+    )
+    return buffer.getvalue()
+
+
+def _csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(COLUMNS)
+    return buffer.getvalue()
+
+
+def iter_export(conn, fmt, itersize=2000, on_rows=None):
+    """Genera el contenido de la exportación en bloques de ``itersize`` filas.
+
+    La consulta se abre en la primera iteración; ``on_rows(n)`` recibe el
+    número de filas de cada bloque enviado. El cursor se cierra aunque el
+    cliente corte la descarga (el generador se cierra con GeneratorExit).
+    """
+    encode = _csv_chunk if fmt == 'csv' else _ndjson_chunk
+    cur = conn.cursor(name=f'cars_export_{uuid.uuid4().hex}')
+    try:
+        # Orden por clave primaria: el índice entrega las filas sin ordenar la tabla
+        cur.execute(f"SELECT {', '.join(COLUMNS)} FROM cars ORDER BY id")
+        if fmt == 'csv':
+            yield _csv_header()
+
+        while True:
+            # Cada bloque es un FETCH de itersize filas en el servidor
+            rows = cur.fetchmany(itersize)
+            if not rows:
+                break
+            if on_rows:
+                on_rows(len(rows))
+            yield encode(rows)
+    finally:
+        cur.close()
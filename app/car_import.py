@@ -0,0 +1,228 @@
+"""Importación masiva de coches desde CSV o NDJSON.
+
+Las filas se validan por bloques, se cargan con ``COPY`` en una tabla de
+staging temporal y se fusionan en ``cars`` con una única sentencia que
+respeta el índice único ``idx_cars_brand_model_year``.
+
+Uso como CLI::
+
+    python car_import.py coches.csv
+    python car_import.py coches.ndjson --format ndjson
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+FORMATS = ('csv', 'ndjson')
+MAX_REJECTS_REPORTED = 1000
+_FIELD_MAX_LENGTH = 100
+
+
+class ImportFormatError(ValueError):
+    """El formato solicitado no está soportado."""
+
+
+def detect_format(content_type, explicit=None):
+    """Deduce el formato a partir del parámetro explícito o del Content-Type."""
+    if explicit:
+        if explicit not in FORMATS:
+            raise ImportFormatError(f'Formato no soportado: {explicit}')
+        return explicit
+    content_type = (content_type or '').lower()
+    if 'ndjson' in content_type or 'jsonl' in content_type or 'json' in content_type:
+        return 'ndjson'
+    return 'csv'
+
+
+def _iter_lines(stream):
+    """Líneas de texto (con su salto de línea) de un stream binario."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_records(stream, fmt):
+    """Genera (número de línea, dict) sin cargar el cuerpo entero en memoria."""
+    if fmt == 'ndjson':
+        for line_number, line in enumerate(_iter_lines(stream), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_number, exc
+                continue
+            yield line_number, record if isinstance(record, dict) else ValueError('Se esperaba un objeto JSON')
+    else:
+        reader = csv.DictReader(_iter_lines(stream))
+        for record in reader:
+            # La cabecera ocupa la línea 1
+            yield reader.line_num, record
+
+
+def validate_record(record, current_year):
+    """Devuelve (brand, model, year) o lanza ValueError con el motivo."""
+    if isinstance(record, Exception):
+        raise ValueError(f'Fila mal formada: {record}')
+
+    brand = str(record.get('brand') or '').strip()
+    model = str(record.get('model') or '').strip()
+    year_raw = record.get('year')
+
+    if not brand or not model or year_raw in (None, ''):
+        raise ValueError('Todos los campos son obligatorios')
+    if len(brand) > _FIELD_MAX_LENGTH or len(model) > _FIELD_MAX_LENGTH:
+        raise ValueError(f'Marca y modelo admiten como máximo {_FIELD_MAX_LENGTH} caracteres')
+
+    try:
+        year = int(str(year_raw).strip())
+    except ValueError:
+        raise ValueError('El año debe ser un número entero')
+
+    if year < 1886 or year > current_year:
+        raise ValueError(f'El año debe estar entre 1886 y {current_year}')
+
+    return brand, model, year
+
+
+def _copy_escape(value):
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copy_chunk(cur, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_escape(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert(
+        "COPY cars_import_staging (line, brand, model, year) FROM STDIN", buffer)
+
+
+def import_cars(conn, records, chunk_size=5000):
+    """Carga los registros en ``cars`` dentro de la transacción de ``conn``.
+
+    No hace commit: lo decide quien llama. Devuelve un dict con el número de
+    filas insertadas y los rechazos por fila (línea y motivo).
+    """
+    current_year = datetime.now().year
+    rejects = []
+    rejected_total = 0
+    staged = 0
+    started = time.monotonic()
+
+    def reject(line, error):
+        nonlocal rejected_total
+        rejected_total += 1
+        if len(rejects) < MAX_REJECTS_REPORTED:
+            rejects.append({'line': line, 'error': error})
+
+    cur = conn.cursor()
+    # Una carga masiva puede superar el statement_timeout de las peticiones
+    cur.execute("SET LOCAL statement_timeout = 0")
+    cur.execute("""
+        CREATE TEMP TABLE cars_import_staging (
+            line INTEGER NOT NULL,
+            brand VARCHAR(100) NOT NULL,
+            model VARCHAR(100) NOT NULL,
+            year INTEGER NOT NULL
+        ) ON COMMIT DROP
+    """)
+
+    chunk = []
+    for line, record in records:
+        try:
+            chunk.append((line, *validate_record(record, current_year)))
+        except ValueError as exc:
+            reject(line, str(exc))
+            continue
+        if len(chunk) >= chunk_size:
+            _copy_chunk(cur, chunk)
+            staged += len(chunk)
+            chunk = []
+    if chunk:
+        _copy_chunk(cur, chunk)
+        staged += len(chunk)
+
+    inserted = 0
+    if staged:
+        # Inserta la primera aparición de cada (marca, modelo, año) y devuelve
+        # las líneas que no entraron: duplicadas en el fichero o ya existentes
+        cur.execute("""
+            WITH ranked AS (
+                SELECT line, brand, model, year,
+                       row_number() OVER (PARTITION BY brand, model, year ORDER BY line) AS rn
+                FROM cars_import_staging
+            ), inserted AS (
+                INSERT INTO cars (brand, model, year)
+                SELECT brand, model, year FROM ranked WHERE rn = 1 ORDER BY line
+                ON CONFLICT (brand, model, year) DO NOTHING
+                RETURNING brand, model, year
+            )
+            SELECT r.line, r.rn > 1 AS duplicated
+            FROM ranked r
+            WHERE r.rn > 1 OR NOT EXISTS (
+                SELECT 1 FROM inserted i
+                WHERE i.brand = r.brand AND i.model = r.model AND i.year = r.year
+            )
+            ORDER BY r.line
+        """)
+        conflicts = cur.fetchall()
+        for line, duplicated in conflicts:
+            reject(line, 'Duplicado dentro del fichero' if duplicated else 'El coche ya existe')
+        inserted = staged - len(conflicts)
+
+    cur.close()
+    rejects.sort(key=lambda item: item['line'])
+    return {
+        'inserted': inserted,
+        'rejected': rejected_total,
+        'rejects': rejects,
+        'rejects_truncated': rejected_total > len(rejects),
+        'duration_seconds': round(time.monotonic() - started, 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importación masiva de coches (CSV o NDJSON)')
+    parser.add_argument('path', help="Fichero a importar ('-' para stdin)")
+    parser.add_argument('--format', choices=FORMATS, help='Por defecto se deduce de la extensión')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+    # Import diferido: el módulo también lo usa app.py
+    from app import db_connection, invalidate_cars_cache
+
+    stream = sys.stdin.buffer if args.path == '-' else open(args.path, 'rb')
+    try:
+        with db_connection() as conn:
+            result = import_cars(conn, iter_records(stream, fmt), args.chunk_size)
+            conn.commit()
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+
+    if result['inserted']:
+        invalidate_cars_cache()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if not result['rejected'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
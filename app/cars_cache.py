@@ -0,0 +1,330 @@
+"""Caché incremental del listado de coches en Redis.
+
+Estructura (``prefix`` es ``CARS_CACHE_KEY``, por defecto ``app:cars``):
+
+- ``<prefix>:index``: sorted set con score 0 y miembro
+  ``<created_at en µs>:<id>`` con relleno de ceros, de modo que el orden
+  lexicográfico coincide con ``(created_at, id)`` y la paginación por cursor
+  es un ``ZREVRANGEBYLEX``.
+- ``<prefix>:rows``: hash ``id -> fila serializada`` (ver ``cache_codec``).
+- ``<prefix>:built``: marca de que índice y filas están completos (TTL largo).
+  Sin ella la estructura no es fiable y hay que reconstruirla.
+- ``<prefix>:fresh``: marca de frescura cuyo valor es el coste de la última
+  reconstrucción, para el refresco anticipado. Los parches mantienen la
+  estructura al día, así que su TTL es largo (red de seguridad); la borran
+  los cambios masivos que no se parchean (``invalidate``).
+- ``<prefix>:journal``: parches que llegan mientras hay una reconstrucción en
+  curso (el lease ``<prefix>:lock`` existe), para aplicarlos a la nueva.
+- ``<prefix>:build:<token>:index`` y ``:rows``: claves temporales de la
+  reconstrucción, que sustituyen a las definitivas con ``RENAME``.
+- ``<prefix>:version``: se incrementa con cada cambio.
+- ``<prefix>:search:<digest>``: página de resultados de una búsqueda, y
+  ``<prefix>:stats:all`` las estadísticas agregadas. Son hashes con el valor
+  y la versión con la que se calculó; solo se sirven si esa versión es la
+  actual, así que cualquier cambio deja de leer los valores anteriores.
+
+Las altas y bajas parchean la estructura de forma atómica (scripts Lua) en
+lugar de descartarla entera. La reconstrucción escribe por bloques (ninguna
+orden bloquea Redis mucho tiempo) y no se descarta si hay escrituras en
+medio: los parches anotados en el diario se aplican antes de sustituirla.
+"""
+import json
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+from cache_codec import JsonRowCodec, decode_rows
+
+_EPOCH = datetime(1970, 1, 1)
+_MEMBER_ID_OFFSET = 18  # longitud de "<17 dígitos>:"
+
+# Página (o listado completo si limit < 0) en un único viaje de ida y vuelta
+_READ_SCRIPT = """
+local built = redis.call('exists', KEYS[3])
+local fresh_ttl = redis.call('pttl', KEYS[4])
+local delta = redis.call('get', KEYS[4])
+local max = '+'
+if ARGV[1] ~= '' then max = '(' .. ARGV[1] end
+local limit = tonumber(ARGV[2])
+local members
+if limit < 0 then
+    members = redis.call('zrevrangebylex', KEYS[1], max, '-')
+else
+    members = redis.call('zrevrangebylex', KEYS[1], max, '-', 'LIMIT', 0, limit)
+end
+local rows = {}
+local ids = {}
+for i, member in ipairs(members) do
+    ids[#ids + 1] = tostring(tonumber(string.sub(member, tonumber(ARGV[3]))))
+    if #ids == 1000 or i == #members then
+        local chunk = redis.call('hmget', KEYS[2], unpack(ids))
+        for _, row in ipairs(chunk) do rows[#rows + 1] = row end
+        ids = {}
+    end
+end
+return {built, fresh_ttl, delta or false, rows}
+"""
+
+# Alta: solo si la estructura está completa (si no, se reconstruirá entera).
+# Con una reconstrucción en curso se anota también en el diario.
+_ADD_SCRIPT = """
+if redis.call('exists', KEYS[3]) == 1 then
+    redis.call('zadd', KEYS[1], 0, ARGV[1])
+    redis.call('hset', KEYS[2], ARGV[2], ARGV[3])
+end
+if redis.call('exists', KEYS[5]) == 1 then
+    redis.call('rpush', KEYS[6], 'add', ARGV[1], ARGV[2], ARGV[3])
+    redis.call('expire', KEYS[6], ARGV[4])
+end
+return redis.call('incr', KEYS[4])
+"""
+
+_REMOVE_SCRIPT = """
+if redis.call('exists', KEYS[3]) == 1 then
+    redis.call('zrem', KEYS[1], ARGV[1])
+    redis.call('hdel', KEYS[2], ARGV[2])
+end
+if redis.call('exists', KEYS[5]) == 1 then
+    redis.call('rpush', KEYS[6], 'remove', ARGV[1], ARGV[2], '')
+    redis.call('expire', KEYS[6], ARGV[3])
+end
+return redis.call('incr', KEYS[4])
+"""
+
+# Cambio masivo: la estructura deja de ser fresca, y también la que se esté
+# reconstruyendo (puede no incluirlo), que se sustituirá pero sin marca fresh
+_INVALIDATE_SCRIPT = """
+redis.call('del', KEYS[1])
+if redis.call('exists', KEYS[2]) == 1 then
+    redis.call('rpush', KEYS[3], 'stale', '', '', '')
+    redis.call('expire', KEYS[3], ARGV[1])
+end
+return redis.call('incr', KEYS[4])
+"""
+
+# Fin de la reconstrucción: aplica el diario a las claves temporales y las
+# pone en lugar de las definitivas (UNLINK libera las antiguas en segundo plano)
+_SWAP_SCRIPT = """
+if redis.call('get', KEYS[5]) ~= ARGV[1] then
+    return 0
+end
+local stale = false
+local journal = redis.call('lrange', KEYS[6], 0, -1)
+for i = 1, #journal, 4 do
+    local op = journal[i]
+    if op == 'add' then
+        redis.call('zadd', KEYS[7], 0, journal[i + 1])
+        redis.call('hset', KEYS[8], journal[i + 2], journal[i + 3])
+    elseif op == 'remove' then
+        redis.call('zrem', KEYS[7], journal[i + 1])
+        redis.call('hdel', KEYS[8], journal[i + 2])
+    else
+        stale = true
+    end
+end
+redis.call('unlink', KEYS[1], KEYS[2], KEYS[6])
+if redis.call('exists', KEYS[7]) == 1 then
+    redis.call('rename', KEYS[7], KEYS[1])
+    redis.call('rename', KEYS[8], KEYS[2])
+    redis.call('expire', KEYS[1], ARGV[2])
+    redis.call('expire', KEYS[2], ARGV[2])
+end
+redis.call('setex', KEYS[3], ARGV[2], 1)
+if stale then
+    redis.call('del', KEYS[4])
+else
+    redis.call('setex', KEYS[4], ARGV[3], ARGV[4])
+end
+redis.call('del', KEYS[5])
+return 1
+"""
+
+# Valor derivado de la versión actual (versión y valor en un solo viaje)
+_VERSIONED_READ_SCRIPT = """
+local version = redis.call('get', KEYS[1]) or '0'
+local stored = redis.call('hmget', KEYS[2], 'version', 'value')
+if stored[1] == version then
+    return {version, stored[2]}
+end
+return {version}
+"""
+
+# Libera el lease solo si sigue siendo nuestro (compare-and-delete atómico)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Renueva el lease solo si sigue siendo nuestro
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def member_for(created_at, car_id):
+    """Miembro del sorted set cuyo orden lexicográfico es (created_at, id)."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    return f'{micros:017d}:{car_id:012d}'
+
+
+class CarsCache:
+    """Acceso a la estructura de caché de coches en Redis."""
+
+    def __init__(self, client, prefix, ttl, stale_ttl, lock_ttl, track=None, codec=None):
+        self.client = client
+        # Formato con el que se escriben las filas; se leen todos los conocidos
+        self.codec = codec or JsonRowCodec()
+        # Medición opcional de la decodificación de filas (DependencyMetrics.track)
+        self.track = track
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_ttl = lock_ttl
+        self.index_key = f'{prefix}:index'
+        self.rows_key = f'{prefix}:rows'
+        self.built_key = f'{prefix}:built'
+        self.fresh_key = f'{prefix}:fresh'
+        self.version_key = f'{prefix}:version'
+        self.lock_key = f'{prefix}:lock'
+        self.journal_key = f'{prefix}:journal'
+        self.prefix = prefix
+        self._read = client.register_script(_READ_SCRIPT)
+        self._add = client.register_script(_ADD_SCRIPT)
+        self._remove = client.register_script(_REMOVE_SCRIPT)
+        self._invalidate = client.register_script(_INVALIDATE_SCRIPT)
+        self._swap = client.register_script(_SWAP_SCRIPT)
+        self._release = client.register_script(_RELEASE_LOCK_SCRIPT)
+        self._extend = client.register_script(_EXTEND_LOCK_SCRIPT)
+
+    def _read_args(self, before_member, limit):
+        keys = [self.index_key, self.rows_key, self.built_key, self.fresh_key]
+        return keys, [before_member or '', limit, _MEMBER_ID_OFFSET + 1]
+
+    def _parse_read(self, reply):
+        built, fresh_ttl_ms, delta, rows = reply
+        # Un hueco (None) indica que otro proceso modificó la fila entre medias
+        rows = [row for row in rows if row]
+        with self.track('app', 'decode_cars') if self.track else nullcontext():
+            cars = decode_rows(rows)
+        return {
+            'built': bool(built),
+            'fresh_ttl': fresh_ttl_ms / 1000.0 if fresh_ttl_ms and fresh_ttl_ms > 0 else None,
+            'delta': float(delta) if delta else 0.0,
+            'cars': cars,
+            'payload_bytes': sum(len(row) for row in rows)
+        }
+
+    def read(self, before_member=None, limit=-1):
+        """Lee hasta ``limit`` coches anteriores a ``before_member`` (todos si limit < 0).
+
+        Devuelve un dict con ``built`` (estructura completa), ``fresh_ttl``
+        (segundos de frescura restantes, None si caducó), ``delta`` (coste de
+        la última reconstrucción), ``cars`` y ``payload_bytes`` (tamaño de las
+        filas serializadas leídas).
+        """
+        keys, args = self._read_args(before_member, limit)
+        return self._parse_read(self._read(keys=keys, args=args))
+
+    def queue_read(self, batch, before_member=None, limit=-1):
+        """Como ``read``, pero encolado en un ``RedisBatch``; devuelve su Pending."""
+        keys, args = self._read_args(before_member, limit)
+        return batch.eval(_READ_SCRIPT, keys, args, parse=self._parse_read)
+
+    def queue_versioned_read(self, batch, namespace, name):
+        """Encola la lectura de un valor derivado de la versión actual de los datos.
+
+        El resultado es ``(version, valor)``; ``valor`` es None si no está.
+        """
+        return batch.eval(_VERSIONED_READ_SCRIPT, [self.version_key, f'{self.prefix}:{namespace}:{name}'], [],
+                          parse=lambda reply: (reply[0], reply[1] if len(reply) > 1 else None))
+
+    def store_versioned(self, namespace, version, name, value, ttl):
+        key = f'{self.prefix}:{namespace}:{name}'
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={'version': version, 'value': value})
+            pipe.expire(key, ttl)
+            pipe.execute()
+
+    def encode_search(self, page):
+        return json.dumps({
+            'rows': [self.codec.encode(car) for car in page['cars']],
+            'next_cursor': page['next_cursor']
+        })
+
+    @staticmethod
+    def decode_search(raw):
+        item = json.loads(raw)
+        return {'cars': decode_rows(item['rows']), 'next_cursor': item['next_cursor']}
+
+    def _build_keys(self, token):
+        return f'{self.prefix}:build:{token}:index', f'{self.prefix}:build:{token}:rows'
+
+    def start_rebuild(self, token):
+        """Empieza una reconstrucción (requiere el lease) con el diario vacío.
+
+        Los parches anotados a partir de aquí se aplican en ``finish_rebuild``;
+        los anteriores ya están en la BD que se va a leer.
+        """
+        self.client.delete(self.journal_key, *self._build_keys(token))
+
+    def write_rebuild_chunk(self, token, cars):
+        """Escribe un bloque en las claves temporales y renueva el lease.
+
+        Devuelve False si el lease ya no es nuestro (hay que abandonar).
+        """
+        index_key, rows_key = self._build_keys(token)
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.zadd(index_key, {member_for(car['created_at'], car['id']): 0 for car in cars})
+            pipe.hset(rows_key, mapping={car['id']: self.codec.encode(car) for car in cars})
+            # Si el proceso muere a medias, las claves temporales caducan con el lease
+            pipe.expire(index_key, self.lock_ttl)
+            pipe.expire(rows_key, self.lock_ttl)
+            self._extend(keys=[self.lock_key], args=[token, self.lock_ttl * 1000], client=pipe)
+            return bool(pipe.execute()[-1])
+
+    def finish_rebuild(self, token, delta):
+        """Aplica el diario y sustituye la estructura; False si se perdió el lease."""
+        index_key, rows_key = self._build_keys(token)
+        return bool(self._swap(
+            keys=[self.index_key, self.rows_key, self.built_key, self.fresh_key,
+                  self.lock_key, self.journal_key, index_key, rows_key],
+            args=[token, self.stale_ttl, self.ttl, delta]
+        ))
+
+    def _patch_keys(self):
+        return [self.index_key, self.rows_key, self.built_key, self.version_key,
+                self.lock_key, self.journal_key]
+
+    def add(self, car, pipe=None):
+        self._add(
+            keys=self._patch_keys(),
+            args=[member_for(car['created_at'], car['id']), car['id'], self.codec.encode(car),
+                  self.stale_ttl],
+            client=pipe
+        )
+
+    def remove(self, car_id, created_at, pipe=None):
+        self._remove(
+            keys=self._patch_keys(),
+            args=[member_for(created_at, car_id), car_id, self.stale_ttl],
+            client=pipe
+        )
+
+    def invalidate(self, pipe=None):
+        """Marca la estructura como no fresca; se sigue sirviendo hasta reconstruirla."""
+        self._invalidate(
+            keys=[self.fresh_key, self.lock_key, self.journal_key, self.version_key],
+            args=[self.stale_ttl],
+            client=pipe
+        )
+
+    def acquire_lock(self, token):
+        return bool(self.client.set(self.lock_key, token, nx=True, ex=self.lock_ttl))
+
+    def release_lock(self, token):
+        self._release(keys=[self.lock_key], args=[token])
@@ -0,0 +1,165 @@
+"""Búsqueda de coches por marca, modelo y rango de años.
+
+Índices que la sirven (``ensure_indexes``):
+
+- ``idx_cars_brand_created_at``: btree sobre ``(lower(brand), created_at DESC,
+  id DESC)``. Filtro por marca (sin distinguir mayúsculas) ya en el orden del
+  listado, así que una página es un recorrido corto del índice.
+- ``idx_cars_model_prefix``: btree ``lower(model) text_pattern_ops`` para la
+  búsqueda por prefijo (``LIKE 'abc%'``).
+- ``idx_cars_model_trgm``: GIN de trigramas (``pg_trgm``) sobre
+  ``lower(model)`` para la búsqueda aproximada.
+- ``idx_cars_year``: btree sobre ``year`` para los rangos.
+
+Los resultados mantienen el orden del listado (más recientes primero) y se
+paginan con el mismo cursor (created_at, id).
+"""
+import hashlib
+import json
+
+# Parámetros de URL del formulario de búsqueda (argumentos de normalize_filters)
+FILTER_FIELDS = ('brand', 'model', 'match', 'year_min', 'year_max')
+MATCH_MODES = ('prefix', 'fuzzy')
+MIN_YEAR = 1886
+MAX_YEAR = 9999
+
+_COLUMNS = "id, brand, model, year, created_at"
+
+
+def ensure_indexes(cur):
+    """Crea pg_trgm y los índices de búsqueda.
+
+    Si la extensión no puede crearse (sin permisos) se avisa y se crean el
+    resto de índices; la búsqueda aproximada fallará hasta que exista.
+    """
+    cur.execute("SAVEPOINT cars_search_trgm")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cars_model_trgm
+            ON cars USING gin (lower(model) gin_trgm_ops)
+        """)
+        cur.execute("RELEASE SAVEPOINT cars_search_trgm")
+    except Exception as exc:
+        cur.execute("ROLLBACK TO SAVEPOINT cars_search_trgm")
+        print(f"No se pudo crear el índice de trigramas (pg_trgm): {exc}")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cars_brand_created_at
+        ON cars (lower(brand), created_at DESC, id DESC)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cars_model_prefix
+        ON cars (lower(model) text_pattern_ops)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_cars_year ON cars (year)")
+
+
+def _normalize_text(value):
+    return ' '.join(str(value or '').split()).lower() or None
+
+
+def _parse_year(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        year = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} debe ser un año entero') from None
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f'{name} debe estar entre {MIN_YEAR} y {MAX_YEAR}')
+    return year
+
+
+def normalize_filters(brand=None, model=None, match=None, year_min=None, year_max=None):
+    """Filtros en forma canónica (minúsculas, espacios colapsados).
+
+    Dos búsquedas equivalentes dan el mismo dict, y por tanto la misma clave
+    de caché. Lanza ValueError si algún filtro no es válido.
+    """
+    model = _normalize_text(model)
+    match = (match or 'prefix').strip().lower()
+    if match not in MATCH_MODES:
+        raise ValueError(f"match debe ser uno de: {', '.join(MATCH_MODES)}")
+
+    filters = {
+        'brand': _normalize_text(brand),
+        'model': model,
+        # Sin modelo el modo de búsqueda no importa
+        'match': match if model else 'prefix',
+        'year_min': _parse_year(year_min, 'year_min'),
+        'year_max': _parse_year(year_max, 'year_max')
+    }
+    if filters['year_min'] and filters['year_max'] and filters['year_min'] > filters['year_max']:
+        raise ValueError('year_min no puede ser mayor que year_max')
+    return filters
+
+
+def is_empty(filters):
+    return not (filters['brand'] or filters['model'] or filters['year_min'] or filters['year_max'])
+
+
+def query_args(filters):
+    """Parámetros de URL de unos filtros (para los enlaces de paginación)."""
+    args = {key: value for key, value in filters.items() if value and key != 'match'}
+    if filters['model'] and filters['match'] != 'prefix':
+        args['match'] = filters['match']
+    return args
+
+
+def digest(filters, cursor, limit):
+    """Clave estable de una página de resultados."""
+    raw = json.dumps([filters, cursor, limit], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(cur, filters, after=None, limit=20):
+    """Hasta ``limit`` coches que cumplen los filtros, anteriores a ``after``."""
+    clauses = []
+    params = []
+    if filters['brand']:
+        clauses.append("lower(brand) = %s")
+        params.append(filters['brand'])
+    if filters['model']:
+        if filters['match'] == 'fuzzy':
+            # Similitud de trigramas con alguna palabra del modelo (pg_trgm)
+            clauses.append("%s <%% lower(model)")
+            params.append(filters['model'])
+        else:
+            clauses.append("lower(model) LIKE %s")
+            params.append(_escape_like(filters['model']) + '%')
+    if filters['year_min']:
+        clauses.append("year >= %s")
+        params.append(filters['year_min'])
+    if filters['year_max']:
+        clauses.append("year <= %s")
+        params.append(filters['year_max'])
+    if after:
+        clauses.append("(created_at, id) < (%s, %s)")
+        params.extend(after)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cur.execute(
+        f"""
+        SELECT {_COLUMNS}
+        FROM cars
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT %s
+        """,
+        (*params, limit)
+    )
+    return [
+        {
+            'id': row[0],
+            'brand': row[1],
+            'model': row[2],
+            'year': row[3],
+            'created_at': row[4]
+        }
+        for row in cur.fetchall()
+    ]
@@ -0,0 +1,120 @@
+"""Estadísticas agregadas de coches mantenidas de forma incremental.
+
+``cars_stats`` guarda el número de coches por ``(brand, year)``. Los
+triggers de ``cars`` (a nivel de sentencia, con tablas de transición) la
+actualizan en la misma transacción que el cambio, sea cual sea su origen:
+la app, la importación con COPY o psql. Los totales por marca, por década y
+el total general se calculan sobre esos grupos, sin recorrer ``cars``.
+"""
+
+TOTAL_COUNT_SQL = "SELECT COALESCE(SUM(count), 0) FROM cars_stats"
+
+_APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION cars_stats_apply() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO cars_stats (brand, year, count)
+        SELECT brand, year, -COUNT(*) FROM old_rows GROUP BY brand, year
+        ON CONFLICT (brand, year) DO UPDATE SET count = cars_stats.count + EXCLUDED.count;
+        DELETE FROM cars_stats s
+        USING (SELECT DISTINCT brand, year FROM old_rows) o
+        WHERE s.brand = o.brand AND s.year = o.year AND s.count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO cars_stats (brand, year, count)
+        SELECT brand, year, COUNT(*) FROM new_rows GROUP BY brand, year
+        ON CONFLICT (brand, year) DO UPDATE SET count = cars_stats.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+_RESET_FUNCTION = """
+CREATE OR REPLACE FUNCTION cars_stats_reset() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    DELETE FROM cars_stats;
+    RETURN NULL;
+END
+$$
+"""
+
+# Las tablas de transición solo se permiten en triggers de un único evento
+_TRIGGERS = (
+    """
+    CREATE OR REPLACE TRIGGER cars_stats_insert AFTER INSERT ON cars
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cars_stats_apply()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER cars_stats_delete AFTER DELETE ON cars
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cars_stats_apply()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER cars_stats_update AFTER UPDATE ON cars
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cars_stats_apply()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER cars_stats_truncate AFTER TRUNCATE ON cars
+    FOR EACH STATEMENT EXECUTE FUNCTION cars_stats_reset()
+    """
+)
+
+
+def ensure_schema(cur):
+    """Crea la tabla de agregados y sus triggers; la rellena la primera vez.
+
+    Los triggers se crean antes del relleno: su bloqueo sobre ``cars`` espera
+    a las escrituras en curso y frena las nuevas hasta el commit, así que
+    ninguna queda fuera del recuento ni se cuenta dos veces.
+    """
+    cur.execute("SELECT to_regclass('cars_stats') IS NULL")
+    backfill = cur.fetchone()[0]
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cars_stats (
+            brand VARCHAR(100) NOT NULL,
+            year INTEGER NOT NULL,
+            count BIGINT NOT NULL,
+            PRIMARY KEY (brand, year)
+        )
+    """)
+    cur.execute(_APPLY_FUNCTION)
+    cur.execute(_RESET_FUNCTION)
+    for trigger in _TRIGGERS:
+        cur.execute(trigger)
+
+    if backfill:
+        cur.execute("""
+            INSERT INTO cars_stats (brand, year, count)
+            SELECT brand, year, COUNT(*) FROM cars GROUP BY brand, year
+        """)
+
+
+def fetch(cur):
+    """Total, coches por marca y por década a partir de los grupos (brand, year)."""
+    cur.execute("SELECT brand, year, count FROM cars_stats")
+    total = 0
+    by_brand = {}
+    by_decade = {}
+    for brand, year, count in cur.fetchall():
+        total += count
+        by_brand[brand] = by_brand.get(brand, 0) + count
+        decade = year // 10 * 10
+        by_decade[decade] = by_decade.get(decade, 0) + count
+
+    return {
+        'total': total,
+        'by_brand': [
+            {'brand': brand, 'count': count}
+            for brand, count in sorted(by_brand.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'by_decade': [
+            {'decade': decade, 'count': count}
+            for decade, count in sorted(by_decade.items())
+        ]
+    }
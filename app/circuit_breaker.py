@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CircuitOpenError(Exception):
+    """El circuito de la dependencia está abierto: la llamada no se intenta."""
+
+
+class CircuitBreaker:
+    """Circuit breaker por dependencia (cerrado / abierto / semiabierto).
+
+    Tras ``failure_threshold`` fallos consecutivos el circuito se abre y las
+    llamadas fallan al instante con ``CircuitOpenError``. Pasados
+    ``reset_timeout`` segundos pasa a semiabierto y deja pasar una única
+    llamada de prueba: si va bien se cierra y si falla vuelve a abrirse. Si
+    no llega a la dependencia o se interrumpe (``record_neutral``) no cambia
+    el estado y la siguiente llamada hace de prueba.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+        # Contadores expuestos como métricas
+        self.opened_total = 0
+        self.rejected_total = 0
+        self.failures_total = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Lanza CircuitOpenError si la llamada no debe intentarse."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected_total += 1
+        raise CircuitOpenError(f'Circuito abierto para {self.name}')
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_neutral(self):
+        """La llamada no dice nada de la dependencia: solo libera la prueba."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures_total += 1
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_total += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def guard(self, is_failure=lambda exc: True, is_neutral=lambda exc: False):
+        """Protege un bloque; solo las excepciones con ``is_failure`` cuentan como fallo.
+
+        Las de ``is_neutral`` (la llamada no llegó a la dependencia) y las
+        interrupciones (GeneratorExit, CancelledError...) no cuentan ni como
+        fallo ni como éxito.
+        """
+        self.allow()
+        try:
+            yield
+        except BaseException as exc:
+            if not isinstance(exc, Exception) or is_neutral(exc):
+                self.record_neutral()
+            elif is_failure(exc):
+                self.record_failure()
+            else:
+                # La dependencia respondió (p. ej. un error de integridad)
+                self.record_success()
+            raise
+        else:
+            self.record_success()
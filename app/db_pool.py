@@ -0,0 +1,211 @@
+import threading
+import time
+
+import psycopg2
+
+
+class PoolTimeout(Exception):
+    """No hay conexiones libres en el pool tras esperar el tiempo máximo."""
+
+
+class _PooledConnection:
+    """Metadatos de una conexión física gestionada por el pool."""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Pool de conexiones psycopg2 thread-safe para un único worker.
+
+    - Mantiene entre ``minconn`` y ``maxconn`` conexiones físicas.
+    - Valida la conexión al prestarla si lleva más de ``validate_after``
+      segundos sin usarse (``SELECT 1``).
+    - Recicla las conexiones que superan ``max_lifetime`` segundos de vida.
+    - Si el pool está agotado, espera hasta ``timeout`` segundos.
+    """
+
+    def __init__(self, minconn, maxconn, max_lifetime=1800, validate_after=30,
+                 timeout=5, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError('Tamaño de pool inválido')
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.validate_after = validate_after
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+
+        self._idle = []
+        self._in_use = {}
+        self._lock = threading.Condition()
+        self._pending = 0
+        self._closed = False
+
+        # Contadores expuestos como métricas
+        self.created_total = 0
+        self.recycled_total = 0
+        self.discarded_total = 0
+        self.timeouts_total = 0
+        self.waiting = 0
+
+        for _ in range(minconn):
+            try:
+                self._idle.append(self._connect())
+            except psycopg2.Error:
+                # La BD puede no estar lista todavía; se reintentará al prestar
+                break
+
+    # --- Gestión de conexiones físicas ---
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        self.created_total += 1
+        return _PooledConnection(conn)
+
+    def _close(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, pooled, now):
+        return self.max_lifetime and now - pooled.created_at >= self.max_lifetime
+
+    def _is_usable(self, pooled, now):
+        conn = pooled.conn
+        if conn.closed:
+            return False
+        if now - pooled.last_used < self.validate_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # --- API pública ---
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    @property
+    def in_use(self):
+        return len(self._in_use)
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def getconn(self):
+        """Presta una conexión validada del pool."""
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            pooled = None
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise psycopg2.InterfaceError('El pool está cerrado')
+
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        self._in_use[id(pooled.conn)] = pooled
+                        break
+
+                    if self.size < self.maxconn:
+                        # Reservar el hueco y conectar fuera del lock
+                        self._pending += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts_total += 1
+                        raise PoolTimeout(
+                            f'Pool agotado ({self.maxconn} conexiones en uso)')
+
+                    self.waiting += 1
+                    try:
+                        self._lock.wait(remaining)
+                    finally:
+                        self.waiting -= 1
+
+            if pooled is None:
+                try:
+                    pooled = self._connect()
+                finally:
+                    with self._lock:
+                        self._pending -= 1
+                        if pooled is not None:
+                            self._in_use[id(pooled.conn)] = pooled
+                        else:
+                            self._lock.notify()
+                return pooled.conn
+
+            now = time.monotonic()
+            expired = self._expired(pooled, now)
+            if not expired and self._is_usable(pooled, now):
+                return pooled.conn
+
+            # Conexión caducada o rota: se descarta y se prueba con otra
+            with self._lock:
+                self._in_use.pop(id(pooled.conn), None)
+                if expired:
+                    self.recycled_total += 1
+                else:
+                    self.discarded_total += 1
+                self._lock.notify()
+            self._close(pooled)
+
+    def putconn(self, conn, discard=False):
+        """Devuelve una conexión al pool (o la descarta si está rota)."""
+        if not discard and not conn.closed:
+            try:
+                # No devolver nunca una conexión con transacción abierta
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._lock:
+            pooled = self._in_use.pop(id(conn), None)
+            if pooled is None:
+                return
+
+            now = time.monotonic()
+            close = True
+            if discard or conn.closed or self._closed:
+                self.discarded_total += 1
+            elif self._expired(pooled, now):
+                self.recycled_total += 1
+            else:
+                pooled.last_used = now
+                self._idle.append(pooled)
+                close = False
+
+            self._lock.notify()
+
+        if close:
+            self._close(pooled)
+
+    def closeall(self):
+        """Cierra todas las conexiones (p. ej. al terminar el worker)."""
+        with self._lock:
+            self._closed = True
+            for pooled in self._idle:
+                self._close(pooled)
+            for pooled in self._in_use.values():
+                self._close(pooled)
+            self._idle.clear()
+            self._in_use.clear()
+            self._lock.notify_all()
@@ -0,0 +1,57 @@
+"""Configuración de gunicorn (``gunicorn -c gunicorn.conf.py app:app``).
+
+- ``preload_app``: el maestro importa la app una sola vez y los workers la
+  heredan con el fork (arrancan sin reimportar Flask, psycopg2, etc.).
+- ``on_starting``: el maestro inicializa el esquema (una vez por versión,
+  bajo advisory lock) y cierra sus conexiones antes de crear los workers.
+  Si Postgres no está disponible reintenta con backoff durante
+  ``SCHEMA_INIT_TIMEOUT`` segundos y, si no lo consigue, el arranque falla.
+- ``post_fork``: cada worker abre sus propios clientes y arranca el monitor
+  de salud antes de recibir peticiones.
+- ``gthread``: cada worker atiende varias peticiones a la vez; el control de
+  admisión de la app limita las costosas y reserva hilos para las sondas.
+
+Los tiempos de cada fase se exportan en ``app_startup_phase_seconds``.
+"""
+import os
+import time
+
+# Primero: mide el arranque desde que se carga la configuración
+import startup
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+# Hilos por worker: las peticiones lentas no bloquean las sondas (ver admission.py)
+worker_class = 'gthread'
+# Cupos de admisión por defecto (4 normales + 2 en cola + 4 baratas + 2 masivas) y 2 hilos libres para las sondas
+threads = int(os.getenv('GUNICORN_THREADS', '14'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+preload_app = True
+
+# Espera máxima a Postgres para inicializar el esquema (p. ej. durante un despliegue)
+SCHEMA_INIT_TIMEOUT = float(os.getenv('SCHEMA_INIT_TIMEOUT', '120'))
+
+
+def on_starting(server):
+    import app
+
+    with startup.phase('init_schema'):
+        deadline = time.monotonic() + SCHEMA_INIT_TIMEOUT
+        delay = 1.0
+        while not app.init_database():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Sin esquema faltarían tablas y particiones toda la vida del pod
+                raise RuntimeError(f'No se pudo inicializar el esquema en {SCHEMA_INIT_TIMEOUT:.0f}s')
+            print(f"Reintentando la inicialización del esquema en {min(delay, remaining):.0f}s")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 10.0)
+    app.release_connections()
+
+
+def post_fork(server, worker):
+    import app
+
+    with startup.phase('worker_init'):
+        app.init_worker()
+    startup.record('worker_ready', startup.elapsed())
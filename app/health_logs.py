@@ -0,0 +1,179 @@
+"""Esquema y mantenimiento de ``health_logs``.
+
+La tabla está particionada por rango de ``timestamp`` con una partición por
+día (``health_logs_pYYYYMMDD``) más una partición DEFAULT para lo que caiga
+fuera de las creadas. ``health_logs_daily`` mantiene el recuento por día y
+estado, de modo que los totales no requieren recorrer la tabla.
+"""
+import re
+from collections import Counter
+from datetime import date, timedelta
+
+import psycopg2.extras
+from psycopg2 import sql
+
+PARTITION_PREFIX = 'health_logs_p'
+DEFAULT_PARTITION = 'health_logs_default'
+_PARTITION_RE = re.compile(rf'^{PARTITION_PREFIX}(\d{{8}})$')
+
+TOTAL_COUNT_SQL = "SELECT COALESCE(SUM(count), 0) FROM health_logs_daily"
+
+# Identificador del advisory lock de mantenimiento (un único pod a la vez)
+MAINTENANCE_LOCK_KEY = 'health_logs_maintenance'
+
+
+def _relkind(cur, name):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _create_partitioned_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS health_logs (
+            id BIGSERIAL,
+            timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
+            status VARCHAR(50),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF health_logs DEFAULT")
+                .format(sql.Identifier(DEFAULT_PARTITION)))
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS health_logs_daily (
+            day DATE NOT NULL,
+            status VARCHAR(50) NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status)
+        )
+    """)
+
+
+def _migrate_legacy_table(cur):
+    """Convierte una health_logs no particionada conservando sus filas."""
+    cur.execute("ALTER TABLE health_logs RENAME TO health_logs_legacy")
+    cur.execute("ALTER SEQUENCE IF EXISTS health_logs_id_seq RENAME TO health_logs_legacy_id_seq")
+    _create_partitioned_table(cur)
+    cur.execute("""
+        INSERT INTO health_logs (id, timestamp, status)
+        SELECT id, COALESCE(timestamp, NOW()), status FROM health_logs_legacy
+    """)
+    cur.execute("""
+        SELECT setval(pg_get_serial_sequence('health_logs', 'id'),
+                      GREATEST((SELECT MAX(id) FROM health_logs), 1))
+    """)
+    cur.execute("""
+        INSERT INTO health_logs_daily (day, status, count)
+        SELECT timestamp::date, COALESCE(status, ''), COUNT(*)
+        FROM health_logs
+        GROUP BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE SET count = EXCLUDED.count
+    """)
+    cur.execute("DROP TABLE health_logs_legacy")
+
+
+def ensure_schema(cur):
+    """Crea (o migra) health_logs particionada y su tabla de recuentos."""
+    kind = _relkind(cur, 'health_logs')
+    if kind == 'r':
+        _migrate_legacy_table(cur)
+    else:
+        _create_partitioned_table(cur)
+
+
+def partition_name(day):
+    return f'{PARTITION_PREFIX}{day:%Y%m%d}'
+
+
+def _existing_partitions(cur):
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'health_logs'::regclass
+    """)
+    partitions = {}
+    for (name,) in cur.fetchall():
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions[name] = date(int(match.group(1)[:4]), int(match.group(1)[4:6]),
+                                    int(match.group(1)[6:]))
+    return partitions
+
+
+def _create_partition(cur, day):
+    """Crea la partición del día moviendo antes las filas que hubiera en DEFAULT."""
+    name = sql.Identifier(partition_name(day))
+    default = sql.Identifier(DEFAULT_PARTITION)
+    bounds = (day, day + timedelta(days=1))
+
+    cur.execute(sql.SQL("CREATE TABLE {} (LIKE health_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+                .format(name))
+    cur.execute(sql.SQL("""
+        WITH moved AS (
+            DELETE FROM {default} WHERE timestamp >= %s AND timestamp < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """).format(default=default, name=name), bounds)
+    cur.execute(sql.SQL("ALTER TABLE health_logs ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)")
+                .format(name), bounds)
+
+
+def maintain(cur, retention_days, premake_days, today=None):
+    """Crea las particiones futuras y elimina las caducadas.
+
+    Debe ejecutarse dentro de una transacción. Devuelve None si otro proceso
+    ya está haciendo el mantenimiento, o un dict con lo creado y eliminado.
+    """
+    cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (MAINTENANCE_LOCK_KEY,))
+    if not cur.fetchone()[0]:
+        return None
+
+    ensure_schema(cur)
+
+    today = today or date.today()
+    cutoff = today - timedelta(days=retention_days)
+    partitions = _existing_partitions(cur)
+    created, dropped = [], []
+
+    for offset in range(premake_days + 1):
+        day = today + timedelta(days=offset)
+        if partition_name(day) not in partitions:
+            _create_partition(cur, day)
+            created.append(partition_name(day))
+
+    for name, day in sorted(partitions.items(), key=lambda item: item[1]):
+        if day < cutoff:
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+            dropped.append(name)
+
+    cur.execute(sql.SQL("DELETE FROM {} WHERE timestamp < %s").format(sql.Identifier(DEFAULT_PARTITION)),
+                (cutoff,))
+    # El recuento refleja solo las filas que siguen almacenadas
+    cur.execute("DELETE FROM health_logs_daily WHERE day < %s", (cutoff,))
+
+    return {'created': created, 'dropped': dropped}
+
+
+def insert(cur, records):
+    """Inserta (timestamp, status) en lote y actualiza los recuentos diarios."""
+    psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO health_logs (timestamp, status) VALUES %s",
+        records,
+        page_size=len(records)
+    )
+    counts = Counter((timestamp.date(), status or '') for timestamp, status in records)
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO health_logs_daily (day, status, count) VALUES %s
+        ON CONFLICT (day, status) DO UPDATE SET count = health_logs_daily.count + EXCLUDED.count
+        """,
+        [(day, status, count) for (day, status), count in counts.items()]
+    )
+
+
+def total_count(cur):
+    cur.execute(TOTAL_COUNT_SQL)
+    return cur.fetchone()[0]
@@ -0,0 +1,71 @@
+import threading
+import time
+
+
+class HealthMonitor:
+    """Ejecuta periódicamente una sonda de salud en segundo plano.
+
+    ``probe`` es una función sin argumentos que devuelve un dict con el estado
+    de las dependencias. El último resultado se guarda en memoria para que los
+    endpoints de salud respondan sin hacer I/O.
+    """
+
+    def __init__(self, probe, interval=10.0, max_staleness=30.0):
+        self.probe = probe
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self._result = None
+        self._updated_at = None
+        self._duration = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        """Ejecuta la sonda y guarda el resultado (nunca lanza excepciones)."""
+        started = time.monotonic()
+        try:
+            result = self.probe()
+        except Exception as exc:  # pragma: no cover - la sonda no debería fallar
+            result = {'error': str(exc)}
+        with self._lock:
+            self._result = result
+            self._updated_at = time.time()
+            self._duration = time.monotonic() - started
+        self._ready.set()
+        return result
+
+    def wait_ready(self, timeout):
+        """Espera a que termine la primera sonda; devuelve False si no llega."""
+        return self._ready.wait(timeout)
+
+    def snapshot(self):
+        """Último resultado con su antigüedad, o None si aún no hay ninguno."""
+        with self._lock:
+            if self._result is None:
+                return None
+            age = time.time() - self._updated_at
+            return {
+                'result': self._result,
+                'checked_at': self._updated_at,
+                'age': age,
+                'duration': self._duration,
+                'stale': age > self.max_staleness
+            }
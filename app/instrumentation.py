@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram
+
+# Desde 0,5 ms: una lectura de Redis o un SELECT sencillo caen por debajo de 5 ms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class DependencyMetrics:
+    """Latencia y errores de cada operación contra una dependencia.
+
+    ``track(dependency, operation)`` mide un bloque: observa su duración en
+    ``app_dependency_duration_seconds``, cuenta en
+    ``app_dependency_errors_total`` las excepciones para las que
+    ``is_error`` es cierto y deja una línea en el log si supera
+    ``slow_threshold`` segundos (0 lo desactiva).
+    """
+
+    def __init__(self, registry, slow_threshold=0.25):
+        self.slow_threshold = slow_threshold
+        self.duration = Histogram(
+            'app_dependency_duration_seconds',
+            'Duración de las operaciones contra dependencias',
+            ['dependency', 'operation'],
+            buckets=LATENCY_BUCKETS,
+            registry=registry
+        )
+        self.errors = Counter(
+            'app_dependency_errors',
+            'Operaciones contra dependencias que terminaron en error',
+            ['dependency', 'operation', 'error'],
+            registry=registry
+        )
+        self.slow = Counter(
+            'app_dependency_slow_operations',
+            'Operaciones que superaron el umbral de operación lenta',
+            ['dependency', 'operation'],
+            registry=registry
+        )
+
+    @contextmanager
+    def track(self, dependency, operation, is_error=lambda exc: True):
+        started = time.perf_counter()
+        failed = None
+        try:
+            yield
+        except Exception as exc:
+            if is_error(exc):
+                failed = type(exc).__name__
+                self.errors.labels(dependency, operation, failed).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.duration.labels(dependency, operation).observe(elapsed)
+            if self.slow_threshold and elapsed >= self.slow_threshold:
+                self.slow.labels(dependency, operation).inc()
+                outcome = f" (error: {failed})" if failed else ""
+                print(f"Operación lenta: {dependency}.{operation} tardó {elapsed * 1000:.0f} ms{outcome}")
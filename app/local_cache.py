@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Caché en memoria acotada (LRU) con expiración por entrada.
+
+    Es local a cada worker y thread-safe. Con ``max_bytes`` también se acota
+    por tamaño: cada entrada declara el suyo al guardarse (``size``).
+
+    ``generation`` se incrementa en cada invalidación: quien lee de Redis la
+    captura antes y la pasa a ``set`` para no guardar un valor que ya fue
+    invalidado mientras se obtenía.
+    """
+
+    def __init__(self, maxsize=512, ttl=30.0, max_bytes=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.size_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _pop(self, key):
+        _, _, size = self._data.pop(key)
+        self.size_bytes -= size
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires_at, _ = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None, generation=None, size=0):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            if self.max_bytes is not None and size > self.max_bytes:
+                return False
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl), size)
+            self.size_bytes += size
+            while len(self._data) > self.maxsize or (
+                    self.max_bytes is not None and self.size_bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            if key in self._data:
+                self._pop(key)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            self.generation += 1
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self.size_bytes = 0
@@ -0,0 +1,201 @@
+"""Profiler por muestreo que se activa bajo demanda en un worker.
+
+Mientras está armado, un hilo toma cada ``1/hz`` segundos la pila de los
+hilos que atienden una petición muestreada (``sys._current_frames``) y
+cuenta cuántas veces aparece cada pila. Mide tiempo de reloj: una petición
+bloqueada en Postgres o Redis aparece en la línea que hace la llamada.
+
+- Se arma para N segundos o N peticiones (lo que ocurra antes, con un
+  máximo de ``max_seconds``).
+- Cada ruta (endpoint de Flask) puede muestrearse con una proporción
+  distinta de peticiones.
+- Desarmado no hay hilo de muestreo y cada petición solo consulta ``armed``.
+
+Los resultados se exportan en formato de pilas colapsadas (flamegraph.pl,
+speedscope, Pyroscope) o en el formato JSON de speedscope. Cada pila empieza
+por el nombre de la ruta, así que un mismo perfil separa las rutas.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class ProfilerBusyError(RuntimeError):
+    """Ya hay una sesión de muestreo en curso."""
+
+
+def _short_path(filename):
+    # Rutas de dependencias a partir de site-packages; las de la app, solo el fichero
+    _, sep, rest = filename.rpartition('site-packages' + os.sep)
+    return rest if sep else os.path.basename(filename)
+
+
+class SamplingProfiler:
+    def __init__(self, max_seconds=300):
+        self.max_seconds = max_seconds
+        self.armed = False
+        self._lock = threading.Lock()
+        self._active = {}
+        self._session = None
+        self._names = {}
+
+    def arm(self, seconds=None, requests=None, hz=100, rates=None, default_rate=1.0):
+        """Empieza una sesión nueva; descarta los resultados de la anterior."""
+        seconds = min(seconds or self.max_seconds, self.max_seconds)
+        with self._lock:
+            if self.armed:
+                raise ProfilerBusyError('Ya hay una sesión de muestreo en curso')
+            session = {
+                'started_at': time.time(),
+                'finished_at': None,
+                'deadline': time.monotonic() + seconds,
+                'seconds': seconds,
+                'requests_left': requests,
+                'interval': 1.0 / hz,
+                'rates': dict(rates or {}),
+                'default_rate': default_rate,
+                'requests': Counter(),
+                'samples': Counter()
+            }
+            self._session = session
+            self._active.clear()
+            self.armed = True
+
+        threading.Thread(target=self._run, args=(session,), name='sampling-profiler', daemon=True).start()
+        return self.status()
+
+    def disarm(self):
+        with self._lock:
+            self._finish(self._session)
+        return self.status()
+
+    def _finish(self, session):
+        # Requiere el lock
+        if session is not None and session is self._session and self.armed:
+            self.armed = False
+            self._active.clear()
+            session['finished_at'] = time.time()
+
+    def begin_request(self, route):
+        """Decide si se muestrea la petición del hilo actual."""
+        session = self._session
+        rate = session['rates'].get(route, session['default_rate'])
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return False
+        with self._lock:
+            if not self.armed or session is not self._session or session['requests_left'] == 0:
+                return False
+            if session['requests_left'] is not None:
+                session['requests_left'] -= 1
+            session['requests'][route] += 1
+            self._active[threading.get_ident()] = route
+        return True
+
+    def end_request(self):
+        if not self._active:
+            return
+        with self._lock:
+            if self._active.pop(threading.get_ident(), None) is None:
+                return
+            session = self._session
+            # Sesión por número de peticiones: termina con la última muestreada
+            if session['requests_left'] == 0 and not self._active:
+                self._finish(session)
+
+    def _frame_name(self, code):
+        name = self._names.get(code)
+        if name is None:
+            name = f'{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})'
+            self._names[code] = name
+        return name
+
+    def _stack(self, route, frame):
+        names = []
+        while frame is not None:
+            names.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        names.append(route or '<sin ruta>')
+        names.reverse()
+        return tuple(names)
+
+    def _run(self, session):
+        while True:
+            time.sleep(session['interval'])
+            with self._lock:
+                if session is not self._session or not self.armed:
+                    return
+                if time.monotonic() >= session['deadline']:
+                    self._finish(session)
+                    return
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, route in active:
+                frame = frames.get(ident)
+                if frame is not None:
+                    session['samples'][self._stack(route, frame)] += 1
+
+    def status(self):
+        session = self._session
+        if session is None:
+            return {'armed': False, 'pid': os.getpid()}
+        return {
+            'armed': self.armed,
+            'pid': os.getpid(),
+            'started_at': session['started_at'],
+            'finished_at': session['finished_at'],
+            'seconds': session['seconds'],
+            'hz': round(1.0 / session['interval']),
+            'requests': dict(session['requests']),
+            'samples': sum(session['samples'].values())
+        }
+
+    def _samples(self):
+        session = self._session
+        return list(session['samples'].items()) if session else []
+
+    def collapsed(self):
+        """Una línea por pila: ``ruta;frame;...;frame muestras``."""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in sorted(self._samples())]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def speedscope(self):
+        """Perfil en formato speedscope, con un perfil muestreado por ruta."""
+        interval = self._session['interval'] if self._session else 0.01
+        frames = []
+        index = {}
+        profiles = {}
+        for stack, count in self._samples():
+            route, calls = stack[0], stack[1:]
+            indexes = []
+            for name in calls:
+                if name not in index:
+                    index[name] = len(frames)
+                    frames.append({'name': name})
+                indexes.append(index[name])
+            profile = profiles.setdefault(route, {'samples': [], 'weights': []})
+            profile['samples'].append(indexes)
+            profile['weights'].append(count * interval)
+
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'exporter': 'app-sampling-profiler',
+            'name': f'worker {os.getpid()}',
+            'shared': {'frames': frames},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': route,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': sum(profile['weights']),
+                    'samples': profile['samples'],
+                    'weights': profile['weights']
+                }
+                for route, profile in sorted(profiles.items())
+            ]
+        }
@@ -0,0 +1,106 @@
+import itertools
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+from db_pool import PoolTimeout
+
+# Retraso de replicación en segundos (0 si ya ha aplicado todo lo recibido
+# o si el servidor no es una réplica)
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def parse_hosts(value, default_port):
+    """``host1:5432,host2`` -> [('host1', '5432'), ('host2', default_port)]."""
+    hosts = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item:
+            host, _, port = item.partition(':')
+            hosts.append((host, port or default_port))
+    return hosts
+
+
+class Replica:
+    """Réplica de lectura con su propio pool y circuit breaker."""
+
+    def __init__(self, name, pool, breaker):
+        self.name = name
+        self.pool = pool
+        self.breaker = breaker
+        self.lag = None
+        self.checked_at = None
+
+    @contextmanager
+    def connection(self, is_outage):
+        # Esperar una conexión libre del pool no dice nada de la réplica
+        with self.breaker.guard(is_outage, lambda exc: isinstance(exc, PoolTimeout)):
+            conn = self.pool.getconn()
+            discard = False
+            try:
+                yield conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                discard = True
+                raise
+            finally:
+                self.pool.putconn(conn, discard=discard)
+
+
+class ReplicaSet:
+    """Reparte las lecturas entre réplicas sanas y al día (round-robin).
+
+    Una réplica es elegible si su circuito no está abierto y su último
+    retraso medido (``check_lag``) es como mucho ``max_lag`` segundos y no
+    tiene más de ``max_check_age`` segundos. Si ninguna lo es, ``choose``
+    devuelve None y la lectura va al primario.
+    """
+
+    def __init__(self, replicas, max_lag=5.0, max_check_age=30.0):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.max_check_age = max_check_age
+        self._next = itertools.count()
+
+        # Contadores expuestos como métricas
+        self.fallbacks_total = 0
+
+    def is_eligible(self, replica, now=None):
+        now = time.monotonic() if now is None else now
+        return (replica.breaker.state != replica.breaker.OPEN
+                and replica.lag is not None
+                and replica.lag <= self.max_lag
+                and now - replica.checked_at <= self.max_check_age)
+
+    def choose(self):
+        now = time.monotonic()
+        eligible = [replica for replica in self.replicas if self.is_eligible(replica, now)]
+        if not eligible:
+            return None
+        return eligible[next(self._next) % len(eligible)]
+
+    def check_lag(self, is_outage):
+        """Mide el retraso de cada réplica; si no responde queda sin medir (no elegible)."""
+        for replica in self.replicas:
+            lag = None
+            try:
+                with replica.connection(is_outage) as conn:
+                    cur = conn.cursor()
+                    cur.execute(LAG_SQL)
+                    lag = float(cur.fetchone()[0])
+                    cur.close()
+                    conn.rollback()
+            except Exception as exc:
+                print(f"No se pudo medir el retraso de la réplica {replica.name}: {exc}")
+            replica.lag = lag
+            replica.checked_at = time.monotonic()
+
+    def closeall(self):
+        for replica in self.replicas:
+            replica.pool.closeall()
@@ -0,0 +1,126 @@
+"""Lecturas de Redis agrupadas en un único viaje de ida y vuelta.
+
+Cada paso de una petición encola sus comandos con ``queue`` y, tras un único
+``execute``, recoge su resultado con ``Pending.result()``. Los errores se
+entregan por comando: ``result()`` lanza la excepción correspondiente, igual
+que lo haría la llamada directa.
+
+Los scripts Lua se encolan con ``EVAL``: con ``EVALSHA`` el pipeline de
+redis-py haría antes un ``SCRIPT EXISTS`` y serían dos viajes.
+"""
+from contextlib import nullcontext
+
+import redis
+
+# Contador con expiración deslizante, atómico entre workers
+INCR_EXPIRE_SCRIPT = """
+local count = redis.call('incr', KEYS[1])
+redis.call('expire', KEYS[1], ARGV[1])
+return count
+"""
+
+_NOT_EXECUTED = object()
+
+
+def is_connection_error(exc):
+    """Errores que indican que Redis no está disponible (no los de un comando)."""
+    return isinstance(exc, (redis.ConnectionError, redis.TimeoutError))
+
+
+class Pending:
+    """Resultado diferido de un comando encolado en un ``RedisBatch``."""
+
+    __slots__ = ('_batch', '_index', '_parse')
+
+    def __init__(self, batch, index, parse):
+        self._batch = batch
+        self._index = index
+        self._parse = parse
+
+    def result(self):
+        value = self._batch._results[self._index]
+        if value is _NOT_EXECUTED:
+            raise RuntimeError('El lote de Redis aún no se ha ejecutado')
+        if isinstance(value, Exception):
+            raise value
+        return self._parse(value) if self._parse else value
+
+
+class RedisBatch:
+    """Pipeline (sin transacción) de los comandos de Redis de una petición.
+
+    Con ``breaker`` (un CircuitBreaker) el lote no se envía mientras el
+    circuito está abierto y cada comando recibe CircuitOpenError. Con
+    ``track`` (un ``DependencyMetrics.track``) se mide cada envío.
+    """
+
+    def __init__(self, client, breaker=None, track=None):
+        self.client = client
+        self.breaker = breaker
+        self.track = track
+        self._pipe = client.pipeline(transaction=False)
+        self._results = []
+
+    def __len__(self):
+        return len(self._results)
+
+    def queue(self, command, parse=None):
+        """Encola ``command(pipe)``, que debe añadir exactamente un comando."""
+        command(self._pipe)
+        self._results.append(_NOT_EXECUTED)
+        return Pending(self, len(self._results) - 1, parse)
+
+    def ping(self):
+        return self.queue(lambda pipe: pipe.ping())
+
+    def get(self, key):
+        return self.queue(lambda pipe: pipe.get(key))
+
+    def eval(self, script, keys=(), args=(), parse=None):
+        return self.queue(lambda pipe: pipe.eval(script, len(keys), *keys, *args), parse)
+
+    def incr_with_ttl(self, key, ttl):
+        return self.eval(INCR_EXPIRE_SCRIPT, [key], [ttl])
+
+    def _unsent(self):
+        return [i for i, value in enumerate(self._results) if value is _NOT_EXECUTED]
+
+    def _guard(self):
+        return self.breaker.guard(is_connection_error) if self.breaker else nullcontext()
+
+    def _track(self):
+        return self.track('redis', 'pipeline', is_connection_error) if self.track else nullcontext()
+
+    def _store(self, unsent, results):
+        for index, value in zip(unsent, results):
+            self._results[index] = value
+
+    def execute(self):
+        """Envía todo lo encolado en un único viaje; idempotente."""
+        unsent = self._unsent()
+        if not unsent:
+            return
+        try:
+            with self._guard(), self._track():
+                results = self._pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            # Fallo de conexión o circuito abierto: lo recibe cada comando
+            self._pipe.reset()
+            results = [exc] * len(unsent)
+        self._store(unsent, results)
+
+
+class AsyncRedisBatch(RedisBatch):
+    """Variante para ``redis.asyncio``: igual, pero ``execute`` es una corrutina."""
+
+    async def execute(self):
+        unsent = self._unsent()
+        if not unsent:
+            return
+        try:
+            with self._guard(), self._track():
+                results = await self._pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            await self._pipe.reset()
+            results = [exc] * len(unsent)
+        self._store(unsent, results)
@@ -0,0 +1,47 @@
+"""Tiempos de las fases de arranque del pod.
+
+Lo importa primero ``gunicorn.conf.py``, así que ``elapsed()`` mide desde que
+arranca el proceso maestro. Las fases del maestro (carga de la app,
+inicialización del esquema) se heredan en cada worker con el fork; cada
+worker añade las suyas. ``StartupCollector`` las exporta como
+``app_startup_phase_seconds{phase}``.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client.core import GaugeMetricFamily
+
+_started = time.perf_counter()
+_phases = {}
+
+
+def elapsed():
+    """Segundos desde el inicio del arranque."""
+    return time.perf_counter() - _started
+
+
+def record(name, seconds):
+    _phases[name] = seconds
+    print(f"Arranque: {name} en {seconds:.3f}s")
+
+
+@contextmanager
+def phase(name):
+    """Mide la duración de una fase de arranque (también si falla)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+class StartupCollector:
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            'app_startup_phase_seconds',
+            'Duración de cada fase de arranque del proceso',
+            labels=['phase']
+        )
+        for name, seconds in _phases.items():
+            gauge.add_metric([name], seconds)
+        yield gauge
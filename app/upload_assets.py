@@ -1,12 +1,30 @@
+import hashlib
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import boto3
-from botocore.exceptions import ClientError
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 # Configuración
 MINIO_ENDPOINT = os.getenv('MINIO_ENDPOINT')
 MINIO_ACCESS_KEY = os.getenv('MINIO_ACCESS_KEY')
 MINIO_SECRET_KEY = os.getenv('MINIO_SECRET_KEY')
 MINIO_BUCKET = os.getenv('MINIO_BUCKET')
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '8'))
+MULTIPART_THRESHOLD = int(os.getenv('UPLOAD_MULTIPART_THRESHOLD', str(8 * 1024 * 1024)))
+MULTIPART_CHUNKSIZE = int(os.getenv('UPLOAD_MULTIPART_CHUNKSIZE', str(8 * 1024 * 1024)))
+
+ASSET_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.ico')
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=MULTIPART_CHUNKSIZE,
+    max_concurrency=4
+)
 
 def get_minio_client():
     if not all([MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET]):
@@ -17,19 +35,63 @@ def get_minio_client():
         if not endpoint.startswith('http'):
             endpoint = f"http://{endpoint}"
 
+        # El pool de conexiones debe cubrir todas las subidas en paralelo
         s3 = boto3.client('s3',
                           endpoint_url=endpoint,
                           aws_access_key_id=MINIO_ACCESS_KEY,
                           aws_secret_access_key=MINIO_SECRET_KEY,
-                          config=boto3.session.Config(signature_version='s3v4'),
+                          config=Config(signature_version='s3v4',
+                                        max_pool_connections=UPLOAD_CONCURRENCY * TRANSFER_CONFIG.max_concurrency),
                           region_name='us-east-1')
         return s3
     except Exception as e:
         print(f"❌ Error conectando a MinIO: {e}")
         return None
 
+# Objetos del bucket en un único listado (paginado): key -> (etag, tamaño, fecha)
+def list_remote_objects(s3):
+    remote = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=MINIO_BUCKET):
+        for obj in page.get('Contents', []):
+            remote[obj['Key']] = (obj['ETag'].strip('"'), obj['Size'], obj['LastModified'].timestamp())
+    return remote
+
+# ETag que tendría el fichero en S3 (MD5, o MD5 de los MD5 de cada parte si es multipart)
+def local_etag(file_path, size):
+    if size < MULTIPART_THRESHOLD:
+        digest = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    parts = []
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(MULTIPART_CHUNKSIZE), b''):
+            parts.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(parts)).hexdigest()}-{len(parts)}"
+
+# El objeto remoto ya tiene el mismo contenido
+def is_up_to_date(file_path, remote):
+    if remote is None:
+        return False
+    remote_etag, remote_size, remote_mtime = remote
+    stat = os.stat(file_path)
+    if stat.st_size != remote_size:
+        return False
+    if remote_etag == local_etag(file_path, stat.st_size):
+        return True
+    # ETag no comparable (p. ej. otro tamaño de parte): basta con tamaño y fecha
+    return '-' in remote_etag and remote_mtime >= stat.st_mtime
+
+def upload_file(s3, file_path, key):
+    s3.upload_file(file_path, MINIO_BUCKET, key, Config=TRANSFER_CONFIG)
+    return os.path.getsize(file_path)
+
 def upload_assets():
     print(f"🚀 Iniciando carga de assets a MinIO ({MINIO_ENDPOINT})...")
+    started = time.monotonic()
     s3 = get_minio_client()
     if not s3:
         return
@@ -41,23 +103,45 @@ def upload_assets():
         print(f"⚠️ No se encontró la carpeta {static_dir}")
         return
 
+    try:
+        remote_objects = list_remote_objects(s3)
+    except (ClientError, BotoCoreError) as e:
+        print(f"❌ Error listando el bucket '{MINIO_BUCKET}': {e}")
+        return
+
+    # Subir únicamente imágenes que no estén ya en el bucket con el mismo contenido
+    pending = []
+    files_skipped = 0
+    for filename in sorted(os.listdir(static_dir)):
+        if not filename.lower().endswith(ASSET_EXTENSIONS):
+            continue
+        file_path = os.path.join(static_dir, filename)
+        # El Key en el bucket será el nombre del archivo
+        if is_up_to_date(file_path, remote_objects.get(filename)):
+            files_skipped += 1
+        else:
+            pending.append((file_path, filename))
+
     files_uploaded = 0
-    for filename in os.listdir(static_dir):
-        # Subir únicamente imágenes
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.ico')):
-            file_path = os.path.join(static_dir, filename)
+    bytes_uploaded = 0
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+        futures = {executor.submit(upload_file, s3, file_path, key): key for file_path, key in pending}
+        for future in as_completed(futures):
+            key = futures[future]
             try:
-                # El Key en el bucket será el nombre del archivo
-                print(f"📤 Subiendo {filename} a bucket '{MINIO_BUCKET}'...")
-                s3.upload_file(file_path, MINIO_BUCKET, filename)
+                bytes_uploaded += future.result()
                 files_uploaded += 1
-            except ClientError as e:
-                print(f"❌ Error subiendo {filename}: {e}")
+                print(f"📤 Subido {key} a bucket '{MINIO_BUCKET}'")
+            except (ClientError, BotoCoreError, S3UploadFailedError) as e:
+                print(f"❌ Error subiendo {key}: {e}")
 
+    elapsed = time.monotonic() - started
     if files_uploaded > 0:
-        print(f"✅ {files_uploaded} archivos subidos correctamente.")
+        print(f"✅ {files_uploaded} archivos subidos correctamente "
+              f"({bytes_uploaded} bytes en {elapsed:.2f}s, {files_skipped} sin cambios).")
     else:
-        print("ℹ️ No se encontraron archivos nuevos para subir.")
+        print(f"ℹ️ No se encontraron archivos nuevos para subir "
+              f"({files_skipped} sin cambios, {elapsed:.2f}s).")
 
 if __name__ == "__main__":
     upload_assets()
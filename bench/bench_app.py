@@ -0,0 +1,85 @@
+"""App instrumentada para el benchmark.
+
+Envuelve ``app.app`` y cuenta, por petición, las sentencias enviadas a
+Postgres y los viajes de ida y vuelta a Redis (un pipeline cuenta como uno).
+Los recuentos se devuelven en las cabeceras ``X-Bench-Db-Calls`` y
+``X-Bench-Redis-Calls``; el trabajo de los hilos en segundo plano (monitor de
+salud, escritura de health_logs...) no se atribuye a ninguna petición.
+
+Lo arranca ``run_bench.py`` con gunicorn (``bench_app:app``); ejecutado
+directamente solo inicializa el esquema de la BD.
+"""
+import os
+import sys
+import threading
+
+import psycopg2
+import psycopg2.extensions
+import redis
+import redis.client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+_local = threading.local()
+
+
+def _count(kind):
+    stats = getattr(_local, 'stats', None)
+    if stats is not None:
+        stats[kind] += 1
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        _count('db')
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        _count('db')
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        _count('db')
+        return super().copy_expert(sql, file, size)
+
+
+def _counted(kind, func):
+    def wrapper(*args, **kwargs):
+        _count(kind)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def install_call_counters(flask_app):
+    connect = psycopg2.connect
+
+    def counting_connect(*args, **kwargs):
+        kwargs.setdefault('cursor_factory', CountingCursor)
+        return connect(*args, **kwargs)
+
+    psycopg2.connect = counting_connect
+    redis.Redis.execute_command = _counted('redis', redis.Redis.execute_command)
+    redis.client.Pipeline.execute = _counted('redis', redis.client.Pipeline.execute)
+    redis.client.Pipeline.immediate_execute_command = _counted(
+        'redis', redis.client.Pipeline.immediate_execute_command)
+
+    @flask_app.before_request
+    def _start_counting():
+        _local.stats = {'db': 0, 'redis': 0}
+
+    @flask_app.after_request
+    def _report_counts(response):
+        stats = getattr(_local, 'stats', None) or {'db': 0, 'redis': 0}
+        response.headers['X-Bench-Db-Calls'] = str(stats['db'])
+        response.headers['X-Bench-Redis-Calls'] = str(stats['redis'])
+        _local.stats = None
+        return response
+
+
+import app as app_module  # noqa: E402
+
+install_call_counters(app_module.app)
+app = app_module.app
+
+if __name__ == '__main__':
+    sys.exit(0 if app_module.init_database() else 1)
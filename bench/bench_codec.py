@@ -0,0 +1,124 @@
+"""Microbenchmark de los formatos de fila de la caché de coches.
+
+Compara, para catálogos de distinto tamaño, el tiempo de codificar y
+decodificar todas las filas y el tamaño total que ocupan en Redis:
+
+- ``json-per-row``: el decode anterior (``json.loads`` y ``fromisoformat``
+  fila a fila), como referencia.
+- ``json``: mismo formato, decodificado con un único ``json.loads``.
+- ``compact``: array JSON posicional, sin nombres de campo.
+
+No necesita Redis: mide solo (de)serialización, que es lo que se ejecuta en
+el worker en cada acierto de caché.
+
+Uso::
+
+    python bench/bench_codec.py --rows 100,10000,100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from cache_codec import CODECS, decode_rows  # noqa: E402
+
+BRANDS = ['Toyota', 'Seat', 'Renault', 'Peugeot', 'Citroën', 'Volkswagen', 'Ford', 'Kia']
+MODELS = ['Corolla', 'Ibiza', 'Clio', '308', 'C4', 'Golf', 'Focus', 'Ceed', 'León', 'Mégane']
+
+
+def make_cars(count, seed=42):
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    return [
+        {
+            'id': car_id,
+            'brand': rng.choice(BRANDS),
+            'model': rng.choice(MODELS),
+            'year': rng.randint(1990, 2025),
+            'created_at': start + timedelta(seconds=car_id * 37, microseconds=rng.randrange(10 ** 6))
+        }
+        for car_id in range(1, count + 1)
+    ]
+
+
+def decode_per_row(rows):
+    """Decode anterior: un json.loads y un fromisoformat por fila."""
+    cars = []
+    for raw in rows:
+        item = json.loads(raw)
+        created_at = item.get('created_at')
+        cars.append({
+            'id': item['id'],
+            'brand': item['brand'],
+            'model': item['model'],
+            'year': item['year'],
+            'created_at': datetime.fromisoformat(created_at) if created_at else None
+        })
+    return cars
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure(cars, repeat):
+    results = []
+    variants = [
+        ('json-per-row', CODECS['json'], decode_per_row),
+        ('json', CODECS['json'], decode_rows),
+        ('compact', CODECS['compact'], decode_rows),
+    ]
+    for name, codec, decode in variants:
+        rows = [codec.encode(car) for car in cars]
+        # Comprobación de ida y vuelta antes de medir
+        if decode(rows) != cars:
+            raise AssertionError(f'{name}: las filas decodificadas no coinciden')
+        payload = ''.join(rows).encode('utf-8')
+        results.append({
+            'format': name,
+            'encode_ms': best_of(lambda: [codec.encode(car) for car in cars], repeat) * 1000,
+            'decode_ms': best_of(lambda: decode(rows), repeat) * 1000,
+            'payload_bytes': len(payload),
+            'zlib_bytes': len(zlib.compress(payload, 6))
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los formatos de la caché de coches')
+    parser.add_argument('--rows', default='100,10000,100000', help='Tamaños de catálogo separados por comas')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeticiones (se toma la mejor)')
+    parser.add_argument('--output', help='Guardar los resultados en un JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for count in (int(value) for value in args.rows.split(',')):
+        cars = make_cars(count)
+        report[count] = results = measure(cars, args.repeat)
+        baseline = results[0]
+        print(f'\n{count} coches')
+        print(f"{'formato':<14}{'encode ms':>11}{'decode ms':>11}{'vs actual':>11}{'bytes':>12}{'zlib':>11}")
+        for row in results:
+            speedup = baseline['decode_ms'] / row['decode_ms'] if row['decode_ms'] else float('inf')
+            print(f"{row['format']:<14}{row['encode_ms']:>11.2f}{row['decode_ms']:>11.2f}"
+                  f"{speedup:>10.1f}x{row['payload_bytes']:>12}{row['zlib_bytes']:>11}")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f'\nResultados guardados en {args.output}')
+
+
+if __name__ == '__main__':
+    main()
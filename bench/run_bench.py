@@ -0,0 +1,439 @@
+"""Benchmark de carga de la app contra sustitutos locales.
+
+Levanta la app con gunicorn (``bench_app:app``, instrumentada para contar
+llamadas a Postgres y Redis) con la misma configuración que en producción
+(``app/gunicorn.conf.py``: workers gthread, preload y hooks de arranque), así
+que el control de admisión también actúa y sus 503 cuentan como errores.
+Se ejecuta contra:
+
+- Postgres desechable: ``initdb``/``pg_ctl`` en un directorio temporal, o uno
+  ya existente con ``--db-host`` (p. ej. ``docker run -p 5432:5432 postgres:16``).
+- Redis: servidor fakeredis por TCP en este proceso (``--no-redis`` para el
+  modo dev, sin caché).
+- S3: servidor moto con el favicon subido al bucket.
+
+Lanza los escenarios (``/``, ``/health``, alta y baja en ``/cars`` y
+``/favicon.ico``) con la concurrencia indicada y guarda un JSON con p50, p95
+y p99 de latencia, RPS, errores y llamadas a BD/Redis por petición, para
+comparar entre commits. Las cifras absolutas dependen de la máquina: lo
+fiable es la comparación entre dos ejecuciones en el mismo entorno.
+
+Uso::
+
+    pip install -r bench/requirements.txt
+    python bench/run_bench.py --concurrency 16 --duration 20
+    python bench/run_bench.py --compare bench/results/<commit-anterior>.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(ROOT_DIR, 'app')
+# Misma configuración de gunicorn que en producción (gthread, preload, hooks)
+GUNICORN_CONF = os.path.join(APP_DIR, 'gunicorn.conf.py')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+SCENARIOS = ('index', 'health', 'cars', 'favicon')
+MINIO_BUCKET = 'assets'
+MINIO_CREDENTIALS = 'bench'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+        dirty = bool(subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR, text=True).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+# --- Sustitutos locales de las dependencias ---
+
+def _pg_binary(name, bin_dir):
+    if bin_dir:
+        return os.path.join(bin_dir, name)
+    found = shutil.which(name)
+    if found:
+        return found
+    try:
+        pg_bin = subprocess.check_output(['pg_config', '--bindir'], text=True).strip()
+        return os.path.join(pg_bin, name)
+    except (OSError, subprocess.CalledProcessError):
+        raise SystemExit(f'❌ No se encontró {name}: instala PostgreSQL o usa --db-host')
+
+
+@contextmanager
+def local_postgres(bin_dir=None):
+    """Postgres desechable en un directorio temporal; se borra al terminar."""
+    initdb = _pg_binary('initdb', bin_dir)
+    pg_ctl = _pg_binary('pg_ctl', bin_dir)
+    workdir = tempfile.mkdtemp(prefix='bench-pg-')
+    data_dir = os.path.join(workdir, 'data')
+    port = free_port()
+
+    subprocess.run([initdb, '-D', data_dir, '-U', 'bench', '--auth=trust', '-E', 'UTF8'],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([pg_ctl, '-D', data_dir, '-l', os.path.join(workdir, 'postgres.log'), '-w',
+                    '-o', f'-p {port} -k {workdir} -c listen_addresses=127.0.0.1 -c fsync=off',
+                    'start'], check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield {'host': '127.0.0.1', 'port': port, 'user': 'bench', 'password': 'bench', 'name': 'postgres'}
+    finally:
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'fast', 'stop'], stdout=subprocess.DEVNULL)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def fake_redis_server():
+    import fakeredis
+
+    server = fakeredis.TcpFakeServer(('127.0.0.1', 0), server_type='redis')
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-redis', daemon=True).start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def fake_s3_server():
+    import boto3
+    from moto.server import ThreadedMotoServer
+
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    try:
+        endpoint = f'http://127.0.0.1:{port}'
+        s3 = boto3.client('s3', endpoint_url=endpoint, region_name='us-east-1',
+                          aws_access_key_id=MINIO_CREDENTIALS,
+                          aws_secret_access_key=MINIO_CREDENTIALS)
+        s3.create_bucket(Bucket=MINIO_BUCKET)
+        s3.upload_file(os.path.join(APP_DIR, 'static', 'favicon.ico'), MINIO_BUCKET, 'favicon.ico')
+        yield endpoint
+    finally:
+        server.stop()
+
+
+@contextmanager
+def app_server(env, workers, threads):
+    """Arranca la app instrumentada con gunicorn y espera a que responda.
+
+    Usa ``gunicorn.conf.py`` de la app; ``workers`` y ``threads`` solo se
+    pasan si se indican (None deja los de la configuración).
+    """
+    subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'bench_app.py')], env=env, check=True)
+
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '-c', GUNICORN_CONF, '--chdir', BENCH_DIR,
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    if threads is not None:
+        command += ['--threads', str(threads)]
+    # gunicorn.conf.py importa módulos de la app (startup)
+    env = dict(env, PYTHONPATH=os.pathsep.join(filter(None, [APP_DIR, env.get('PYTHONPATH')])))
+    process = subprocess.Popen(command + ['bench_app:app'], env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise SystemExit('❌ gunicorn terminó durante el arranque')
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                conn.request('GET', '/livez')
+                if conn.getresponse().status == 200:
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise SystemExit('❌ La app no respondió a tiempo')
+            time.sleep(0.2)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# --- Generación de carga ---
+
+class Recorder:
+    """Latencias y recuentos por escenario (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, name, elapsed, ok, db_calls, redis_calls):
+        with self._lock:
+            sample = self.samples.setdefault(name, {'latencies': [], 'errors': 0, 'db': 0, 'redis': 0})
+            sample['latencies'].append(elapsed)
+            sample['errors'] += 0 if ok else 1
+            sample['db'] += db_calls
+            sample['redis'] += redis_calls
+
+
+class Client:
+    """Conexión keep-alive por hilo de carga."""
+
+    def __init__(self, base_url, recorder):
+        parts = urlsplit(base_url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        self.recorder = recorder
+
+    def request(self, name, method, path, body=None, expected=(200,)):
+        headers = {}
+        if body is not None:
+            body = urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        started = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+            ok = response.status in expected
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            response = None
+            ok = False
+        elapsed = time.perf_counter() - started
+        if self.recorder is not None:
+            self.recorder.add(
+                name, elapsed, ok,
+                int(response.getheader('X-Bench-Db-Calls', 0)) if response else 0,
+                int(response.getheader('X-Bench-Redis-Calls', 0)) if response else 0
+            )
+        return ok
+
+
+def run_scenario(client, name, lookup_car_id):
+    if name == 'index':
+        client.request('index', 'GET', '/')
+    elif name == 'health':
+        client.request('health', 'GET', '/health', expected=(200, 503))
+    elif name == 'favicon':
+        client.request('favicon', 'GET', '/favicon.ico')
+    elif name == 'cars':
+        model = f'bench-{uuid.uuid4().hex[:12]}'
+        if client.request('cars_add', 'POST', '/cars',
+                          {'brand': 'Bench', 'model': model, 'year': '2020'}, expected=(302,)):
+            car_id = lookup_car_id(model)
+            if car_id is not None:
+                client.request('cars_delete', 'POST', f'/cars/{car_id}/delete', expected=(302,))
+
+
+def drive_load(base_url, scenarios, concurrency, duration, recorder, lookup_car_id):
+    """Cada hilo recorre los escenarios en bucle hasta agotar ``duration``."""
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        client = Client(base_url, recorder)
+        step = offset
+        while time.monotonic() < deadline:
+            run_scenario(client, scenarios[step % len(scenarios)], lookup_car_id)
+            step += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    return time.monotonic() - started
+
+
+def make_car_lookup(db):
+    """Busca el id del coche recién creado (fuera de la latencia medida)."""
+    if db is None:
+        return lambda model: None
+
+    import psycopg2
+
+    local = threading.local()
+
+    def lookup(model):
+        if not hasattr(local, 'conn'):
+            local.conn = psycopg2.connect(host=db['host'], port=db['port'], user=db['user'],
+                                          password=db['password'], dbname=db['name'])
+            local.conn.autocommit = True
+        with local.conn.cursor() as cur:
+            cur.execute("SELECT id FROM cars WHERE brand = 'Bench' AND model = %s", (model,))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    return lookup
+
+
+# --- Informe ---
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    index = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(recorder, elapsed):
+    summary = {}
+    for name, sample in sorted(recorder.samples.items()):
+        latencies = sorted(sample['latencies'])
+        count = len(latencies)
+        summary[name] = {
+            'requests': count,
+            'errors': sample['errors'],
+            'rps': round(count / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50) * 1000, 3),
+                'p95': round(percentile(latencies, 95) * 1000, 3),
+                'p99': round(percentile(latencies, 99) * 1000, 3),
+                'mean': round(sum(latencies) / count * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3)
+            },
+            'db_calls_per_request': round(sample['db'] / count, 3),
+            'redis_calls_per_request': round(sample['redis'] / count, 3)
+        }
+    return summary
+
+
+def print_report(report, baseline=None):
+    print(f"\n📊 Commit {report['commit']}{' (con cambios)' if report['dirty'] else ''} · "
+          f"concurrencia {report['config']['concurrency']} · {report['elapsed_seconds']}s")
+    header = f"{'escenario':<13}{'req':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db/req':>8}{'redis/req':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, row in report['scenarios'].items():
+        latency = row['latency_ms']
+        print(f"{name:<13}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9}"
+              f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+              f"{row['db_calls_per_request']:>8}{row['redis_calls_per_request']:>10}")
+        old = (baseline or {}).get('scenarios', {}).get(name)
+        if old:
+            deltas = []
+            for key in ('p50', 'p95', 'p99'):
+                before = old['latency_ms'][key]
+                if before:
+                    deltas.append(f"{key} {(latency[key] - before) / before * 100:+.1f}%")
+            if old['rps']:
+                deltas.append(f"rps {(row['rps'] - old['rps']) / old['rps'] * 100:+.1f}%")
+            print(f"{'':<13}vs {baseline['commit']}: {', '.join(deltas)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de carga contra sustitutos locales')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15.0, help='Segundos de medición')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Segundos de calentamiento (no se miden)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Lista separada por comas de: {', '.join(SCENARIOS)}")
+    parser.add_argument('--workers', type=int, help='Workers de gunicorn (por defecto, los de gunicorn.conf.py)')
+    parser.add_argument('--threads', type=int, help='Hilos por worker de gunicorn (por defecto, los de gunicorn.conf.py)')
+    parser.add_argument('--no-redis', action='store_true', help='Modo dev: sin Redis')
+    parser.add_argument('--pg-bin', help='Directorio con initdb y pg_ctl')
+    parser.add_argument('--db-host', help='Usar un Postgres existente (desechable) en lugar de uno temporal')
+    parser.add_argument('--db-port', type=int, default=5432)
+    parser.add_argument('--db-user', default='postgres')
+    parser.add_argument('--db-password', default='postgres')
+    parser.add_argument('--db-name', default='postgres')
+    parser.add_argument('--url', help='Medir una app ya arrancada (sin sustitutos ni recuentos de llamadas)')
+    parser.add_argument('--output', help='Fichero JSON de resultados (por defecto bench/results/<commit>.json)')
+    parser.add_argument('--compare', help='JSON de una ejecución anterior con el que comparar')
+    args = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    with ExitStack() as stack:
+        db = None
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            if args.db_host:
+                db = {'host': args.db_host, 'port': args.db_port, 'user': args.db_user,
+                      'password': args.db_password, 'name': args.db_name}
+            else:
+                db = stack.enter_context(local_postgres(args.pg_bin))
+
+            env = dict(os.environ,
+                       DB_HOST=db['host'], DB_PORT=str(db['port']), DB_USER=db['user'],
+                       DB_PASSWORD=db['password'], DB_NAME=db['name'],
+                       MINIO_ENDPOINT=stack.enter_context(fake_s3_server()),
+                       MINIO_BUCKET=MINIO_BUCKET, MINIO_ACCESS_KEY=MINIO_CREDENTIALS,
+                       MINIO_SECRET_KEY=MINIO_CREDENTIALS)
+            if args.no_redis:
+                env['ENV'] = 'dev'
+            else:
+                env.update(ENV='pro', REDIS_HOST='127.0.0.1',
+                           REDIS_PORT=str(stack.enter_context(fake_redis_server())))
+            base_url = stack.enter_context(app_server(env, args.workers, args.threads))
+
+        lookup_car_id = make_car_lookup(db)
+        print(f"🔥 Calentando {args.warmup}s...")
+        drive_load(base_url, scenarios, args.concurrency, args.warmup, None, lookup_car_id)
+
+        print(f"🚀 Midiendo {args.duration}s con concurrencia {args.concurrency}...")
+        recorder = Recorder()
+        elapsed = drive_load(base_url, scenarios, args.concurrency, args.duration, recorder, lookup_car_id)
+
+    commit, dirty = git_commit()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': {
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'scenarios': scenarios,
+            'gunicorn_config': os.path.relpath(GUNICORN_CONF, ROOT_DIR),
+            'workers': args.workers,
+            'threads': args.threads,
+            'redis': not args.no_redis and not args.url,
+            'url': args.url
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'scenarios': summarize(recorder, elapsed)
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\n💾 Resultados guardados en {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import admission  # noqa: E402
+
+
+def _acquire_concurrently(controller, priorities):
+    results = [None] * len(priorities)
+    barrier = threading.Barrier(len(priorities))
+
+    def run(index, priority):
+        barrier.wait()
+        results[index] = controller.acquire(priority)[0]
+
+    threads = [threading.Thread(target=run, args=item) for item in enumerate(priorities)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# Un navegador pide estilos y favicon a la vez: con el worker libre se admiten ambos
+def test_concurrent_cheap_requests_on_idle_controller_are_admitted():
+    controller = admission.AdmissionController()
+    assert _acquire_concurrently(controller, [admission.CHEAP, admission.CHEAP]) == [True, True]
+    assert controller.shed_total == {}
+
+
+# Las baratas no dependen del límite adaptativo ni de la cola de las normales
+def test_cheap_requests_bypass_normal_saturation():
+    controller = admission.AdmissionController(max_inflight=1, max_queue=0)
+    assert controller.acquire(admission.NORMAL)[0]
+    assert not controller.acquire(admission.NORMAL)[0]
+    assert controller.acquire(admission.CHEAP)[0]
+    assert controller.acquire(admission.PROBE)[0]
+
+
+# Una importación de minutos no debe reducir el límite de las rutas interactivas
+def test_bulk_requests_do_not_shrink_the_adaptive_limit():
+    controller = admission.AdmissionController(max_inflight=4, max_bulk=1, target_latency=0.5)
+    assert controller.acquire(admission.BULK)[0]
+    assert not controller.acquire(admission.BULK)[0]
+    controller.release(admission.BULK, latency=120.0)
+    assert controller.limit == 4.0
+    assert controller.shed_total == {(admission.BULK, 'bulk_limit'): 1}
+
+
+# Si el límite crece, entran tantas peticiones de la cola como huecos nuevos haya
+def test_release_wakes_one_waiter_per_free_slot():
+    controller = admission.AdmissionController(max_inflight=4, max_queue=2, queue_timeout=2.0)
+    controller.limit = 1.0
+    assert controller.acquire(admission.NORMAL)[0]
+
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(controller.acquire(admission.NORMAL)))
+               for _ in range(2)]
+    for waiter in waiters:
+        waiter.start()
+    while controller.waiting < 2:
+        time.sleep(0.001)
+
+    # Petición rápida: el límite pasa de 1 a 2 y quedan dos huecos libres
+    controller.release(admission.NORMAL, latency=0.01)
+    for waiter in waiters:
+        waiter.join()
+
+    assert [admitted for admitted, _ in results] == [True, True]
+    assert max(queued for _, queued in results) < 1.0
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Modo ASGI: solo si están instaladas sus dependencias (app/requirements-async.txt)
+pytest.importorskip('quart')
+pytest.importorskip('asyncpg')
+
+for name, value in {'DB_HOST': 'localhost', 'DB_USER': 'test', 'DB_PASSWORD': 'test', 'DB_NAME': 'test'}.items():
+    os.environ.setdefault(name, value)
+os.environ.pop('REDIS_HOST', None)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import asgi  # noqa: E402
+
+CARS = [
+    {'id': 2, 'brand': 'Seat', 'model': 'Ibiza', 'year': 2020, 'created_at': datetime(2024, 1, 2)},
+    {'id': 1, 'brand': 'Kia', 'model': 'Ceed', 'year': 2019, 'created_at': datetime(2024, 1, 1)},
+]
+
+
+# Página intermedia (con cursor y página siguiente) sin Postgres ni Redis
+def test_paginated_index_renders(monkeypatch):
+    async def check_database():
+        return {'status': 'connected', 'message': 'OK', 'healthy': True}
+
+    async def load_cars_page_from_db(after, limit):
+        return {'cars': CARS, 'next_cursor': asgi.sync_app.encode_cars_cursor(CARS[-1])}
+
+    monkeypatch.setattr(asgi, 'check_database', check_database)
+    monkeypatch.setattr(asgi, 'load_cars_page_from_db', load_cars_page_from_db)
+
+    async def get_index():
+        cursor = asgi.sync_app.encode_cars_cursor(CARS[0])
+        response = await asgi.app.test_client().get('/', query_string={'cursor': cursor})
+        return response.status_code, await response.get_data(as_text=True)
+
+    status, html = asyncio.run(get_index())
+    assert status == 200
+    assert 'Primera página' in html
+    assert 'Siguiente' in html
+    # Sin búsqueda en modo ASGI no se muestra el formulario de filtros
+    assert 'filter-form' not in html
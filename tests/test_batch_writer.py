@@ -0,0 +1,59 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from batch_writer import BatchWriter  # noqa: E402
+
+
+# /db-test vuelca el buffer antes de contar: flush no puede volver con un lote a medio escribir
+def test_flush_waits_for_batch_in_flight():
+    written = []
+    writing = threading.Event()
+    release = threading.Event()
+
+    def flush_fn(batch):
+        writing.set()
+        release.wait(5)
+        written.extend(batch)
+
+    writer = BatchWriter(flush_fn, max_batch=2, flush_interval=60)
+    writer.start()
+    try:
+        writer.submit(1)
+        writer.submit(2)
+        assert writing.wait(5)
+        writer.submit(3)
+
+        flushed = threading.Thread(target=writer.flush)
+        flushed.start()
+        flushed.join(0.2)
+        assert flushed.is_alive()
+
+        release.set()
+        flushed.join(5)
+        assert not flushed.is_alive()
+        assert written == [1, 2, 3]
+        assert writer.depth == 0
+    finally:
+        release.set()
+        writer.close()
+
+
+def test_partial_batch_is_written_after_interval():
+    done = threading.Event()
+    written = []
+
+    def flush_fn(batch):
+        written.extend(batch)
+        done.set()
+
+    writer = BatchWriter(flush_fn, max_batch=100, flush_interval=0.05)
+    writer.start()
+    try:
+        writer.submit('a')
+        assert done.wait(5)
+        assert written == ['a']
+    finally:
+        writer.close()
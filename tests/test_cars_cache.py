@@ -0,0 +1,141 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+from cars_cache import CarsCache, member_for  # noqa: E402
+from redis_batch import RedisBatch  # noqa: E402
+
+
+def _car(car_id, day=None):
+    return {'id': car_id, 'brand': 'Seat', 'model': 'Ibiza', 'year': 2020,
+            'created_at': datetime(2024, 1, day or car_id)}
+
+
+def _ids(entry):
+    return [car['id'] for car in entry['cars']]
+
+
+@pytest.fixture
+def cache():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    return CarsCache(client, 'test:cars', ttl=100, stale_ttl=1000, lock_ttl=10)
+
+
+def _rebuild(cache, chunks, token='t'):
+    assert cache.acquire_lock(token)
+    cache.start_rebuild(token)
+    for chunk in chunks:
+        assert cache.write_rebuild_chunk(token, chunk)
+    return cache.finish_rebuild(token, 0.5)
+
+
+def test_read_before_rebuild_is_not_built(cache):
+    entry = cache.read()
+    assert not entry['built']
+    assert entry['cars'] == []
+
+
+def test_rebuild_in_chunks_replaces_structure(cache):
+    assert _rebuild(cache, [[_car(1), _car(2)], [_car(3)]])
+
+    entry = cache.read()
+    assert entry['built']
+    assert entry['fresh_ttl'] > 0
+    assert entry['delta'] == 0.5
+    assert _ids(entry) == [3, 2, 1]
+    # Sin claves temporales ni lease tras la sustitución
+    assert not cache.client.keys('test:cars:build:*')
+    assert not cache.client.exists(cache.lock_key)
+
+
+def test_read_pages_by_member(cache):
+    _rebuild(cache, [[_car(i) for i in range(1, 6)]])
+
+    first = cache.read(limit=2)
+    assert _ids(first) == [5, 4]
+    last = first['cars'][-1]
+    assert _ids(cache.read(member_for(last['created_at'], last['id']), limit=2)) == [3, 2]
+
+
+def test_add_and_remove_patch_built_structure(cache):
+    _rebuild(cache, [[_car(1), _car(2)]])
+
+    cache.add(_car(3))
+    cache.remove(1, _car(1)['created_at'])
+    assert _ids(cache.read()) == [3, 2]
+    assert cache.client.get(cache.version_key) == '2'
+
+
+def test_patches_skip_structure_that_is_not_built(cache):
+    cache.add(_car(1))
+    assert not cache.client.exists(cache.index_key)
+    assert cache.client.get(cache.version_key) == '1'
+
+
+def test_patches_during_rebuild_are_applied_on_swap(cache):
+    assert cache.acquire_lock('t')
+    cache.start_rebuild('t')
+    assert cache.write_rebuild_chunk('t', [_car(1), _car(2)])
+    # Escrituras en medio: no se pierden ni hacen fallar la reconstrucción
+    cache.add(_car(3))
+    cache.remove(2, _car(2)['created_at'])
+    assert cache.finish_rebuild('t', 0.1)
+
+    entry = cache.read()
+    assert _ids(entry) == [3, 1]
+    assert entry['fresh_ttl'] > 0
+    assert not cache.client.exists(cache.journal_key)
+
+
+def test_invalidate_during_rebuild_leaves_it_stale(cache):
+    assert cache.acquire_lock('t')
+    cache.start_rebuild('t')
+    cache.invalidate()
+    assert cache.write_rebuild_chunk('t', [_car(1)])
+    assert cache.finish_rebuild('t', 0.1)
+
+    entry = cache.read()
+    assert entry['built']
+    assert _ids(entry) == [1]
+    assert entry['fresh_ttl'] is None
+
+
+def test_rebuild_without_lease_is_abandoned(cache):
+    assert cache.acquire_lock('t')
+    cache.start_rebuild('t')
+    cache.client.delete(cache.lock_key)
+    assert not cache.write_rebuild_chunk('t', [_car(1)])
+    assert not cache.finish_rebuild('t', 0.1)
+    assert not cache.read()['built']
+
+
+def test_rebuild_of_empty_table(cache):
+    _rebuild(cache, [[_car(1)]])
+    assert _rebuild(cache, [], token='u')
+
+    entry = cache.read()
+    assert entry['built']
+    assert entry['cars'] == []
+
+
+def test_versioned_value_is_served_only_for_current_version(cache):
+    def read():
+        batch = RedisBatch(cache.client)
+        pending = cache.queue_versioned_read(batch, 'stats', 'all')
+        batch.execute()
+        return pending.result()
+
+    assert read() == ('0', None)
+    cache.store_versioned('stats', '0', 'all', '{"total": 1}', 60)
+    assert read() == ('0', '{"total": 1}')
+
+    # Un cambio en los datos deja de servir el valor calculado con la versión anterior
+    cache.add(_car(1))
+    assert read() == ('1', None)
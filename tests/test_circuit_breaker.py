@@ -0,0 +1,140 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError  # noqa: E402
+
+
+class Outage(Exception):
+    pass
+
+
+class NotReached(Exception):
+    pass
+
+
+def _is_outage(exc):
+    return isinstance(exc, Outage)
+
+
+def _is_not_reached(exc):
+    return isinstance(exc, NotReached)
+
+
+def _call(breaker, exc=None):
+    with breaker.guard(_is_outage, _is_not_reached):
+        if exc is not None:
+            raise exc
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(Outage):
+            _call(breaker, Outage())
+    assert breaker.state in (CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN)
+
+
+def test_opens_after_consecutive_failures_and_rejects():
+    breaker = CircuitBreaker('db', failure_threshold=2, reset_timeout=60)
+    _open(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_total == 1
+
+    with pytest.raises(CircuitOpenError):
+        _call(breaker)
+    assert breaker.rejected_total == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker('db', failure_threshold=2, reset_timeout=60)
+    with pytest.raises(Outage):
+        _call(breaker, Outage())
+    _call(breaker)
+    with pytest.raises(Outage):
+        _call(breaker, Outage())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker('db', failure_threshold=1, reset_timeout=0)
+    _open(breaker)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    with breaker.guard(_is_outage):
+        # Mientras la prueba está en curso el resto se rechaza
+        with pytest.raises(CircuitOpenError):
+            _call(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker('db', failure_threshold=1, reset_timeout=0)
+    _open(breaker)
+    with pytest.raises(Outage):
+        _call(breaker, Outage())
+    assert breaker.opened_total == 2
+
+
+def test_error_from_the_dependency_closes_half_open():
+    breaker = CircuitBreaker('db', failure_threshold=1, reset_timeout=0)
+    _open(breaker)
+    # La dependencia respondió (p. ej. un error de integridad)
+    with pytest.raises(ValueError):
+        _call(breaker, ValueError('duplicado'))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_that_never_reached_the_dependency_is_neutral():
+    breaker = CircuitBreaker('db', failure_threshold=1, reset_timeout=60)
+    _open(breaker)
+    breaker.reset_timeout = 0
+
+    with pytest.raises(NotReached):
+        _call(breaker, NotReached())
+    # No cierra el circuito, pero libera la prueba para la siguiente llamada
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    _call(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_disconnect_during_trial_releases_it():
+    breaker = CircuitBreaker('db', failure_threshold=1, reset_timeout=0)
+    _open(breaker)
+
+    def stream():
+        with breaker.guard(_is_outage):
+            yield 'primer bloque'
+            yield 'segundo bloque'
+
+    content = stream()
+    next(content)
+    # El cliente corta la descarga: GeneratorExit dentro del guard
+    content.close()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    _call(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_releases_it():
+    breaker = CircuitBreaker('db', failure_threshold=1, reset_timeout=0)
+    _open(breaker)
+
+    async def query():
+        with breaker.guard(_is_outage):
+            await asyncio.sleep(10)
+
+    async def cancel():
+        task = asyncio.create_task(query())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    _call(breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
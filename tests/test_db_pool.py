@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import time
+
+import psycopg2
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import db_pool  # noqa: E402
+from db_pool import ConnectionPool, PoolTimeout  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql):
+        if self.conn.broken:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        self.conn.queries.append(sql)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Conexión de psycopg2 sin servidor: solo lo que usa el pool."""
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.in_transaction = False
+        self.queries = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        if self.in_transaction:
+            return psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        return psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    created = []
+
+    def connect(**kwargs):
+        created.append(FakeConnection())
+        return created[-1]
+
+    monkeypatch.setattr(db_pool.psycopg2, 'connect', connect)
+    return created
+
+
+def test_exhausted_pool_raises_pool_timeout(connections):
+    pool = ConnectionPool(0, 1, timeout=0.05)
+    pool.getconn()
+
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    assert pool.timeouts_total == 1
+    assert len(connections) == 1
+
+
+def test_waiter_gets_the_connection_returned_meanwhile(connections):
+    pool = ConnectionPool(0, 1, timeout=2)
+    conn = pool.getconn()
+    threading.Timer(0.05, pool.putconn, args=(conn,)).start()
+
+    assert pool.getconn() is conn
+    assert pool.timeouts_total == 0
+
+
+def test_connections_are_reused(connections):
+    pool = ConnectionPool(1, 2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert pool.created_total == 1
+
+
+def test_connection_past_max_lifetime_is_recycled(connections):
+    pool = ConnectionPool(0, 1, max_lifetime=0.01)
+    old = pool.getconn()
+    time.sleep(0.02)
+    pool.putconn(old)
+
+    new = pool.getconn()
+    assert new is not old
+    assert old.closed
+    assert pool.recycled_total == 1
+
+
+def test_broken_idle_connection_is_replaced_on_checkout(connections):
+    pool = ConnectionPool(0, 1, validate_after=0)
+    old = pool.getconn()
+    pool.putconn(old)
+    old.broken = True
+
+    new = pool.getconn()
+    assert new is not old
+    assert old.closed
+    assert pool.discarded_total == 1
+    assert old.queries == []
+
+
+def test_recently_used_connection_is_not_validated(connections):
+    pool = ConnectionPool(0, 1, validate_after=30)
+    conn = pool.getconn()
+    pool.putconn(conn)
+
+    assert pool.getconn() is conn
+    assert conn.queries == []
+
+
+def test_connection_returned_with_open_transaction_is_rolled_back(connections):
+    pool = ConnectionPool(0, 1)
+    conn = pool.getconn()
+    conn.in_transaction = True
+    pool.putconn(conn)
+
+    assert conn.rollbacks == 1
+    assert pool.idle == 1
+
+
+def test_discarded_connection_frees_its_slot(connections):
+    pool = ConnectionPool(0, 1, timeout=0.05)
+    conn = pool.getconn()
+    pool.putconn(conn, discard=True)
+
+    assert conn.closed
+    assert pool.getconn() is not conn
+    assert pool.size == 1
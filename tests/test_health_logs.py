@@ -0,0 +1,120 @@
+import os
+import sys
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import health_logs  # noqa: E402
+
+TODAY = date(2024, 3, 10)
+
+
+class FakeCursor:
+    """Cursor que responde a las consultas de catálogo de ``maintain`` y anota el resto."""
+
+    def __init__(self, partitions=(), locked=True):
+        self.partitions = list(partitions)
+        self.locked = locked
+        self.executed = []
+        self._result = []
+
+    def execute(self, query, params=None):
+        text = query if isinstance(query, str) else repr(query)
+        self.executed.append((text, params))
+        if 'pg_try_advisory_xact_lock' in text:
+            self._result = [(self.locked,)]
+        elif 'FROM pg_class' in text:
+            self._result = [('p',)]
+        elif 'FROM pg_inherits' in text:
+            self._result = [(name,) for name in self.partitions + [health_logs.DEFAULT_PARTITION]]
+        else:
+            self._result = []
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def statements(self, word):
+        return [(text, params) for text, params in self.executed if word in text]
+
+
+def test_maintenance_is_skipped_when_another_process_holds_the_lock():
+    cur = FakeCursor(locked=False)
+    assert health_logs.maintain(cur, retention_days=7, premake_days=2, today=TODAY) is None
+    assert len(cur.executed) == 1
+
+
+def test_maintenance_creates_missing_and_drops_expired_partitions():
+    cur = FakeCursor(partitions=['health_logs_p20240301', 'health_logs_p20240303', 'health_logs_p20240310'])
+    result = health_logs.maintain(cur, retention_days=7, premake_days=2, today=TODAY)
+
+    assert result == {
+        'created': ['health_logs_p20240311', 'health_logs_p20240312'],
+        'dropped': ['health_logs_p20240301']
+    }
+    # Cada partición nueva recoge antes las filas de su día que estaban en DEFAULT
+    moves = cur.statements('DELETE FROM')
+    assert (moves[0][1], moves[1][1]) == (
+        (date(2024, 3, 11), date(2024, 3, 12)),
+        (date(2024, 3, 12), date(2024, 3, 13))
+    )
+
+
+# Con Postgres (TEST_DATABASE_URL): todo en un esquema propio que se descarta al final
+@pytest.fixture
+def pg_cursor():
+    dsn = os.getenv('TEST_DATABASE_URL')
+    if not dsn:
+        pytest.skip('TEST_DATABASE_URL no definido')
+    psycopg2 = pytest.importorskip('psycopg2')
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    schema = f'test_health_logs_{uuid.uuid4().hex[:8]}'
+    cur.execute(f'CREATE SCHEMA {schema}')
+    cur.execute(f'SET LOCAL search_path TO {schema}')
+    try:
+        yield cur
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def _rows_in(cur, table):
+    cur.execute(f'SELECT status FROM {table} ORDER BY id')
+    return [row[0] for row in cur.fetchall()]
+
+
+def test_new_partition_takes_rows_out_of_default(pg_cursor):
+    cur = pg_cursor
+    health_logs.ensure_schema(cur)
+    health_logs.insert(cur, [
+        (datetime(2024, 3, 11, 8), 'tomorrow'),
+        (datetime(2024, 3, 20, 8), 'later')
+    ])
+    assert _rows_in(cur, health_logs.DEFAULT_PARTITION) == ['tomorrow', 'later']
+
+    result = health_logs.maintain(cur, retention_days=7, premake_days=2, today=TODAY)
+
+    assert result['created'] == ['health_logs_p20240310', 'health_logs_p20240311', 'health_logs_p20240312']
+    assert _rows_in(cur, 'health_logs_p20240311') == ['tomorrow']
+    assert _rows_in(cur, health_logs.DEFAULT_PARTITION) == ['later']
+    assert health_logs.total_count(cur) == 2
+
+
+def test_expired_partitions_and_counts_are_dropped(pg_cursor):
+    cur = pg_cursor
+    health_logs.ensure_schema(cur)
+    health_logs.maintain(cur, retention_days=30, premake_days=0, today=date(2024, 3, 1))
+    health_logs.insert(cur, [(datetime(2024, 3, 1, 8), 'old'), (datetime(2024, 3, 10, 8), 'new')])
+
+    result = health_logs.maintain(cur, retention_days=7, premake_days=0, today=TODAY)
+
+    assert result['dropped'] == ['health_logs_p20240301']
+    assert _rows_in(cur, 'health_logs') == ['new']
+    assert health_logs.total_count(cur) == 1
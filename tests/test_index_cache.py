@@ -0,0 +1,63 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+for name, value in {'DB_HOST': 'localhost', 'DB_USER': 'test', 'DB_PASSWORD': 'test', 'DB_NAME': 'test'}.items():
+    os.environ.setdefault(name, value)
+os.environ.pop('REDIS_HOST', None)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import app as sync_app  # noqa: E402
+from redis_batch import RedisBatch  # noqa: E402
+
+CARS = [
+    {'id': 1, 'brand': 'Toyota', 'model': 'Corolla', 'year': 2020, 'created_at': datetime(2024, 1, 1)},
+]
+HEALTHY = {'status': 'connected', 'message': 'OK', 'healthy': True}
+
+
+# La página cacheada de una búsqueda no puede mostrar lo que escribió otro usuario
+def test_filter_case_variants_render_their_own_input(monkeypatch):
+    monkeypatch.setattr(sync_app, 'get_health_snapshot', lambda: {'result': {'database': HEALTHY}})
+    # Misma versión de datos para ambas peticiones: la segunda podría salir de la caché de páginas
+    monkeypatch.setattr(sync_app, '_cars_version_step', lambda batch: lambda: '1')
+    monkeypatch.setattr(sync_app, '_load_cars_search_from_db',
+                        lambda filters, after, limit, replica=True: {'cars': CARS, 'next_cursor': None})
+    sync_app._page_cache.clear()
+
+    client = sync_app.app.test_client()
+    first = client.get('/', query_string={'brand': 'Toyota'}).get_data(as_text=True)
+    second = client.get('/', query_string={'brand': 'toyota'}).get_data(as_text=True)
+
+    assert 'value="Toyota"' in first
+    assert 'value="toyota"' in second
+
+
+# Fallo en la caché de páginas: versión, mensaje y coches en un único viaje a Redis
+def test_index_page_cache_miss_costs_one_redis_round_trip(monkeypatch):
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(sync_app, 'REDIS_ENABLED', True)
+    monkeypatch.setattr(sync_app, 'get_redis_client', lambda: client)
+    # Sin hilo de invalidaciones (no hay servidor al que suscribirse)
+    monkeypatch.setattr(sync_app, '_invalidation_listener_pid', os.getpid())
+    monkeypatch.setattr(sync_app, '_refresh_cars_cache_in_background', lambda cache: None)
+    monkeypatch.setattr(sync_app, '_load_cars_page_from_db',
+                        lambda after, limit: {'cars': CARS, 'next_cursor': None})
+    monkeypatch.setattr(sync_app, 'get_health_snapshot', lambda: {'result': {
+        'database': HEALTHY, 'cache': {'status': 'connected', 'message': 'OK', 'healthy': True}}})
+
+    round_trips = []
+    execute = RedisBatch.execute
+    monkeypatch.setattr(RedisBatch, 'execute', lambda batch: round_trips.append(len(batch)) or execute(batch))
+    sync_app._page_cache.clear()
+    sync_app._local_cache.clear()
+
+    response = sync_app.app.test_client().get('/')
+    assert response.status_code == 200
+    assert 'Corolla' in response.get_data(as_text=True)
+    # Un único envío con la versión, el mensaje y la página de coches
+    assert round_trips == [3]
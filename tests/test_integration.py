@@ -47,3 +47,38 @@ def test_redis_status(app_response):
              assert data['services']['cache']['healthy'] is True, "Redis aparece configurado pero con error"
         else:
             pytest.skip("⚠️ Redis no está activo en DEV (esperado)")
+
+# Verifica la API paginada de coches
+def test_cars_api_paginated():
+    response = requests.get(f"{BASE_URL}/api/cars", params={'limit': 1}, timeout=5)
+    assert response.status_code == 200, f"Se esperaba 200, se recibió {response.status_code}"
+
+    data = response.json()
+    assert 'cars' in data, "La respuesta no contiene la clave 'cars'"
+    assert len(data['cars']) <= 1, "No se respeta el tamaño de página"
+
+    if data['next_cursor']:
+        next_page = requests.get(
+            f"{BASE_URL}/api/cars", params={'limit': 1, 'cursor': data['next_cursor']}, timeout=5)
+        assert next_page.status_code == 200
+        ids = {car['id'] for car in data['cars']}
+        assert not ids & {car['id'] for car in next_page.json()['cars']}, "Las páginas se solapan"
+
+# Verifica los endpoints ligeros de liveness y readiness
+def test_liveness_and_readiness():
+    livez = requests.get(f"{BASE_URL}/livez", timeout=5)
+    assert livez.status_code == 200, "El proceso debería estar vivo"
+
+    readyz = requests.get(f"{BASE_URL}/readyz", timeout=5)
+    assert readyz.status_code == 200, f"La app no está lista: {readyz.text}"
+    assert readyz.json()['status'] == 'ready'
+
+# Verifica la revalidación condicional del favicon servido desde MinIO
+def test_favicon_conditional_get():
+    response = requests.get(f"{BASE_URL}/favicon.ico", timeout=5)
+    assert response.status_code == 200, f"Se esperaba 200, se recibió {response.status_code}"
+    assert 'ETag' in response.headers, "La respuesta debería incluir ETag"
+
+    revalidated = requests.get(
+        f"{BASE_URL}/favicon.ico", headers={'If-None-Match': response.headers['ETag']}, timeout=5)
+    assert revalidated.status_code == 304, "Con el mismo ETag se esperaba 304"